@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config  # type: ignore
+from decouple import config, Csv  # type: ignore
 # =========================================================
 # BASE DIRECTORY
 # =========================================================
@@ -99,6 +99,34 @@ DATABASES = {
     }
 }
 # =========================================================
+# CACHE
+# =========================================================
+# Cache dipakai bersama semua worker gunicorn (lock single-flight ongkir,
+# cache dashboard, versi rollup). CACHE_URL ``redis://host:6379/1`` atau
+# ``memcached://host:11211``; kosong = locmem (hanya untuk development,
+# tiap proses punya cache sendiri).
+CACHE_URL = config("CACHE_URL", default="")
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("memcached://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": CACHE_URL.removeprefix("memcached://"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# =========================================================
 # AUTHENTICATION
 # =========================================================
 AUTHENTICATION_BACKENDS = [
@@ -193,6 +221,8 @@ MIDTRANS_IS_PRODUCTION = config(
     "MIDTRANS_IS_PRODUCTION",
     cast=bool
 )
+# kosong = host Snap resmi; diisi oleh core.settings_fake untuk load test
+MIDTRANS_SNAP_BASE_URL = config("MIDTRANS_SNAP_BASE_URL", default="")
 # =========================================================
 # SECURITY (BASIC PRODUCTION READY)
 # =========================================================
@@ -206,7 +236,21 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 FONNTE_TOKEN = config("FONNTE_TOKEN")
+FONNTE_API_URL = config("FONNTE_API_URL", default="https://api.fonnte.com/send")
+FONNTE_RATE_PER_SECOND = config("FONNTE_RATE_PER_SECOND", default=2, cast=float)
+FONNTE_BURST = config("FONNTE_BURST", default=5, cast=int)
+FONNTE_MAX_RETRIES = config("FONNTE_MAX_RETRIES", default=3, cast=int)
+FONNTE_COALESCE_WINDOW = config("FONNTE_COALESCE_WINDOW", default=30, cast=int)
+# Notifikasi update status massal dikirim worker thread setelah commit
+NOTIFICATION_ASYNC = config("NOTIFICATION_ASYNC", default=True, cast=bool)
 RAJAONGKIR_API_KEY = config("RAJAONGKIR_API_KEY")
+RAJAONGKIR_BASE_URL = config("RAJAONGKIR_BASE_URL", default="https://rajaongkir.komerce.id/api/v1")
+# Timeout (detik), retry dan circuit breaker untuk client RajaOngkir
+RAJAONGKIR_CONNECT_TIMEOUT = config("RAJAONGKIR_CONNECT_TIMEOUT", default=3, cast=float)
+RAJAONGKIR_READ_TIMEOUT = config("RAJAONGKIR_READ_TIMEOUT", default=10, cast=float)
+RAJAONGKIR_MAX_RETRIES = config("RAJAONGKIR_MAX_RETRIES", default=2, cast=int)
+RAJAONGKIR_BREAKER_THRESHOLD = config("RAJAONGKIR_BREAKER_THRESHOLD", default=5, cast=int)
+RAJAONGKIR_BREAKER_RESET = config("RAJAONGKIR_BREAKER_RESET", default=30, cast=int)
 ORIGIN_SUBDISTRICT_ID = int(
     config('ORIGIN_SUBDISTRICT_ID', default=0)
 )
@@ -214,7 +258,44 @@ DEFAULT_COURIER = config(
     "DEFAULT_COURIER",
     default="JNE"
 )
+# Cache ongkir (detik) dan pembulatan berat (gram)
+ONGKIR_CACHE_TTL = config("ONGKIR_CACHE_TTL", default=60 * 60 * 6, cast=int)
+ONGKIR_CACHE_STALE = config("ONGKIR_CACHE_STALE", default=60 * 60 * 24, cast=int)
+ONGKIR_WEIGHT_BUCKET = config("ONGKIR_WEIGHT_BUCKET", default=1000, cast=int)
+ONGKIR_LOCK_TIMEOUT = config("ONGKIR_LOCK_TIMEOUT", default=10, cast=int)
+# Kurir yang dibandingkan di checkout + batas waktu per kurir (detik)
+ONGKIR_COURIERS = config("ONGKIR_COURIERS", default="jne,jnt,sicepat", cast=Csv())
+ONGKIR_FANOUT_TIMEOUT = config("ONGKIR_FANOUT_TIMEOUT", default=5, cast=float)
+# matrix precompute (manage.py precompute_ongkir)
+ONGKIR_MATRIX_MAX_AGE = config("ONGKIR_MATRIX_MAX_AGE", default=60 * 60 * 24 * 7, cast=int)
+ONGKIR_MATRIX_REFRESH = config("ONGKIR_MATRIX_REFRESH", default=60 * 60 * 24, cast=int)
+ONGKIR_MATRIX_RATE = config("ONGKIR_MATRIX_RATE", default=5, cast=float)
+ONGKIR_MATRIX_CONCURRENCY = config("ONGKIR_MATRIX_CONCURRENCY", default=4, cast=int)
+# multi-parcel (shop/parcels.py): batas berat per paket (gram) per kurir
+ONGKIR_PARCEL_MAX_WEIGHT = {"default": 30000, "jne": 30000, "jnt": 50000, "sicepat": 50000, "pos": 30000}
+ONGKIR_SPLIT_BUDGET = config("ONGKIR_SPLIT_BUDGET", default=0.5, cast=float)
+ONGKIR_SPLIT_EXTRA_PARCELS = config("ONGKIR_SPLIT_EXTRA_PARCELS", default=2, cast=int)
+# =========================
+# DASHBOARD MANAJEMEN
+# =========================
+DASHBOARD_CACHE_TTL = config("DASHBOARD_CACHE_TTL", default=10, cast=int)
+# Deret omzet per rentang; juga dihapus setiap rollup dibangun ulang
+REVENUE_SERIES_CACHE_TTL = config("REVENUE_SERIES_CACHE_TTL", default=60 * 60, cast=int)
+# Poller tracking resi (detik / request per detik)
+TRACKING_POLL_MIN_INTERVAL = config("TRACKING_POLL_MIN_INTERVAL", default=60 * 30, cast=int)
+TRACKING_POLL_MAX_INTERVAL = config("TRACKING_POLL_MAX_INTERVAL", default=60 * 60 * 12, cast=int)
+TRACKING_RATE_PER_COURIER = config("TRACKING_RATE_PER_COURIER", default=5, cast=float)
+TRACKING_CONCURRENCY = config("TRACKING_CONCURRENCY", default=4, cast=int)
+TRACKING_BATCH_SIZE = config("TRACKING_BATCH_SIZE", default=50, cast=int)
+# =========================
+# SHIPMENT PROVIDER (dummy / komship / fixture)
+# =========================
+SHIPMENT_PROVIDER = config("SHIPMENT_PROVIDER", default="dummy")
+SHIPMENT_FIXTURE_PATH = config("SHIPMENT_FIXTURE_PATH", default="") or None
+KOMSHIP_BASE_URL = config("KOMSHIP_BASE_URL", default="https://api.collaborator.komerce.id")
+KOMSHIP_API_KEY = config("KOMSHIP_API_KEY", default="")
 # =========================
 # DJANGO FORM LIMIT
 # =========================
-DATA_UPLOAD_MAX_NUMBER_FIELDS = 200000
\ No newline at end of file
+# Editor stok varian hanya mengirim sel yang berubah, jadi batas bawaan cukup
+DATA_UPLOAD_MAX_NUMBER_FIELDS = config("DATA_UPLOAD_MAX_NUMBER_FIELDS", default=1000, cast=int)
\ No newline at end of file
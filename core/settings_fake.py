@@ -0,0 +1,21 @@
+"""
+Profil settings untuk load test offline: semua integrasi eksternal diarahkan
+ke ``manage.py run_fake_services``.
+
+    python manage.py run_fake_services --callback-url http://127.0.0.1:8000/payment/notification/
+    DJANGO_SETTINGS_MODULE=core.settings_fake python manage.py runserver
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import config
+
+FAKE_SERVICES_URL = config("FAKE_SERVICES_URL", default="http://127.0.0.1:8765").rstrip("/")
+
+RAJAONGKIR_BASE_URL = f"{FAKE_SERVICES_URL}/rajaongkir"
+KOMSHIP_BASE_URL = f"{FAKE_SERVICES_URL}/komship"
+MIDTRANS_SNAP_BASE_URL = f"{FAKE_SERVICES_URL}/midtrans/snap/v1"
+FONNTE_API_URL = f"{FAKE_SERVICES_URL}/fonnte/send"
+SHIPMENT_PROVIDER = "komship"
+
+# server tiruan tidak membatasi rate seperti API asli
+FONNTE_RATE_PER_SECOND = 50
+FONNTE_BURST = 50
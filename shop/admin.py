@@ -1,12 +1,32 @@
 from django.contrib import admin # type: ignore
+from django.db.models import Q # type: ignore
+from django.urls import reverse # type: ignore
 from django.utils.html import format_html # type: ignore
 from decimal import Decimal
 from .models import (
     Customer, ProductCategory, Product, ProductVariant, 
     Color, Size, Order, OrderItem,
-    CustomService, CustomProduct, CustomProductVariant, Payment
+    CustomService, CustomProduct, CustomProductVariant, Payment, OrderStatusLog,
+    Province, City, District, ShippingQuote, DailySalesRollup
 )
+from .orders import bulk_buat_resi
+from .pagination import EstimatedCountPaginator
 
+# --- 0. ADMIN TABEL BESAR ---
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist tanpa COUNT(*) penuh: jumlah total tidak ditampilkan dan
+    jumlah baris tanpa filter diambil dari estimasi database.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    list_per_page = 50
+# ID integer di MySQL maksimal 10 digit; angka lebih panjang pasti no. HP
+MAX_ID_DIGITS = 10
+def search_digits(search_term):
+    """Term pencarian berupa angka (ID / no. HP) atau None."""
+    term = search_term.strip().lstrip("#+")
+    return term if term.isdigit() else None
 # --- 1. SETTING PRODUK KUSTOM (SABLON/BORDIR) ---
 class CustomProductVariantInline(admin.TabularInline):
     model = CustomProductVariant
@@ -27,18 +47,30 @@ class CustomServiceAdmin(admin.ModelAdmin):
     list_filter = ('service_type',)
     search_fields = ('name',)
 # --- 2. SETTING PRODUK STANDAR (POLOS) ---
-class ProductVariantInline(admin.TabularInline):
-    model = ProductVariant
-    extra = 1
-    fields = ('color', 'size', 'stock', 'price_override')
+# Stok & harga varian diedit lewat matriks warna x ukuran (satu form,
+# satu bulk_update), bukan inline yang membuat satu form per varian.
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     # 'total_stock' dihapus karena sudah tidak ada di models.py
-    list_display = ('name', 'category', 'price', 'is_active')
+    list_display = ('name', 'category', 'price', 'is_active', 'stock_matrix_link')
+    list_select_related = ('category',)
     list_filter = ('category', 'is_active')
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
-    inlines = [ProductVariantInline]
+    readonly_fields = ('stock_matrix_link',)
+    @admin.display(description='Stok varian')
+    def stock_matrix_link(self, obj):
+        if not obj.pk:
+            return "-"
+        url = reverse('shop:management_stock_matrix', args=[obj.pk])
+        return format_html('<a href="{}">Matriks stok</a>', url)
+@admin.register(ProductVariant)
+class ProductVariantAdmin(LargeTableAdmin):
+    list_display = ('product', 'color', 'size', 'stock', 'price_override')
+    list_select_related = ('product', 'color', 'size')
+    list_filter = ('size',)
+    search_fields = ('^product__name',)
+    raw_id_fields = ('product',)
 # --- 3. SETTING TRANSAKSI (ORDER) ---
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -55,20 +87,38 @@ class OrderItemInline(admin.TabularInline):
         'display_custom_image', 'custom_notes', 'line_total'
     )
     can_delete = False
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
     def display_custom_image(self, obj):
         if obj.custom_image:
             return format_html('<a href="{0}" target="_blank"><img src="{0}" width="50" height="50" style="object-fit:cover; border-radius:5px;" /></a>', obj.custom_image.url)
         return "-"
     display_custom_image.short_description = "Desain Custom"
+class OrderStatusLogInline(admin.TabularInline):
+    model = OrderStatusLog
+    extra = 0
+    fields = ('created_at', 'field', 'from_status', 'to_status', 'duration', 'actor', 'source')
+    readonly_fields = fields
+    can_delete = False
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('actor')
+    def has_add_permission(self, request, obj=None):
+        return False
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     # 'shipping_status' dihapus karena tidak ada di models.py
     list_display = ('id', 'customer', 'status', 'total', 'created_at')
-    list_filter = ('status', 'created_at')
+    list_select_related = ('customer__user',)
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
     list_editable = ('status',)
-    search_fields = ('id', 'customer__user__username', 'shipping_name')
-    inlines = [OrderItemInline]
+    # angka: ID order / no. HP persis; selain itu awalan username atau
+    # nama penerima (LIKE 'x%' memakai index, tanpa '%x%')
+    search_fields = ('^customer__user__username', '^shipping_name')
+    search_help_text = 'ID order atau no. HP (persis), atau awalan username / nama penerima.'
+    inlines = [OrderItemInline, OrderStatusLogInline]
     ordering = ('-created_at',)
+    raw_id_fields = ('customer',)
     
     fieldsets = (
         ('Informasi Utama', {
@@ -81,7 +131,25 @@ class OrderAdmin(admin.ModelAdmin):
         ('Ekspedisi & Resi', {
             'fields': ('courier_code', 'courier_service', 'tracking_number')
         }),
-    )  
+    )
+    actions = ['buat_resi']
+    @admin.action(description='Buat resi (AWB) untuk order terpilih')
+    def buat_resi(self, request, queryset):
+        created, failed = bulk_buat_resi(queryset, actor=request.user, source="admin")
+        self.message_user(request, f"{len(created)} resi dibuat, {len(failed)} gagal.")
+    def get_search_results(self, request, queryset, search_term):
+        term = search_digits(search_term)
+        if term is None:
+            return super().get_search_results(request, queryset, search_term)
+        match = Q(shipping_phone=term)
+        if len(term) <= MAX_ID_DIGITS:
+            match |= Q(pk=int(term))
+        return queryset.filter(match), False
+    def save_model(self, request, obj, form, change):
+        # catat siapa yang mengubah status di log transisi
+        obj._transition_actor = request.user
+        obj._transition_source = "admin"
+        super().save_model(request, obj, form, change)
 # --- 4. MASTER DATA LAINNYA ---
 @admin.register(Color)
 class ColorAdmin(admin.ModelAdmin):
@@ -90,9 +158,64 @@ class ColorAdmin(admin.ModelAdmin):
 class SizeAdmin(admin.ModelAdmin):
     list_display = ('name',)
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('user', 'phone', 'city')
+    list_select_related = ('user',)
+    # angka: no. HP persis; selain itu awalan username
+    search_fields = ('^user__username',)
+    search_help_text = 'No. HP (persis) atau awalan username.'
+    raw_id_fields = ('user',)
+    def get_search_results(self, request, queryset, search_term):
+        term = search_digits(search_term)
+        if term is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(phone=term), False
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('order', 'amount', 'status', 'created_at')
-admin.site.register(ProductCategory)
\ No newline at end of file
+    list_select_related = ('order__customer__user',)
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
+    # angka: ID order persis; selain itu external_id persis
+    search_fields = ('=external_id',)
+    search_help_text = 'ID order atau external ID Midtrans (persis).'
+    ordering = ('-created_at',)
+    raw_id_fields = ('order',)
+    def get_search_results(self, request, queryset, search_term):
+        term = search_digits(search_term)
+        if term is None or len(term) > MAX_ID_DIGITS:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(order_id=int(term)), False
+admin.site.register(ProductCategory)
+# --- 5. MASTER DATA WILAYAH (hasil sync_regions) ---
+@admin.register(Province)
+class ProvinceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'synced_at')
+    search_fields = ('name',)
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'province', 'synced_at')
+    list_select_related = ('province',)
+    search_fields = ('name',)
+@admin.register(District)
+class DistrictAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'city', 'zip_code', 'synced_at')
+    list_select_related = ('city',)
+    search_fields = ('name', 'zip_code')
+# --- 6. MATRIX ONGKIR (hasil precompute_ongkir) ---
+@admin.register(ShippingQuote)
+class ShippingQuoteAdmin(admin.ModelAdmin):
+    list_display = ('destination', 'weight_bucket', 'courier', 'fetched_at')
+    list_filter = ('courier',)
+    search_fields = ('=destination',)
+    readonly_fields = ('origin', 'destination', 'weight_bucket', 'courier', 'services', 'fetched_at')
+# --- 7. ROLLUP PENJUALAN (backfill_sales_rollup) ---
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'status', 'product_name', 'variant_label', 'order_count', 'item_quantity', 'revenue')
+    list_filter = ('status',)
+    date_hierarchy = 'date'
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
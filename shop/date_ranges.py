@@ -0,0 +1,42 @@
+from datetime import datetime, time as dtime, timedelta
+from django.db.models import Q  # type: ignore
+from django.utils import timezone  # type: ignore
+from django.utils.dateparse import parse_date  # type: ignore
+# =========================================================
+# RENTANG TANGGAL (WAKTU LOKAL)
+# =========================================================
+# Filter tanggal selalu diubah menjadi rentang setengah terbuka
+# ``created_at >= awal AND created_at < akhir`` pada zona TIME_ZONE
+# (Asia/Pontianak), bukan ``created_at__date``. Lookup __date membungkus
+# kolom dengan fungsi konversi zona waktu sehingga index tidak terpakai.
+def local_zone():
+    return timezone.get_default_timezone()
+def day_bounds(day):
+    """Rentang setengah terbuka [00:00, 00:00 besok) waktu lokal untuk ``day``."""
+    start = timezone.make_aware(datetime.combine(day, dtime.min), local_zone())
+    return start, start + timedelta(days=1)
+def day_range(start_day=None, end_day=None):
+    """
+    ``(awal, akhir)`` aware untuk tanggal ``start_day`` s/d ``end_day``
+    (inklusif); sisi yang None dibiarkan terbuka.
+    """
+    start = day_bounds(start_day)[0] if start_day else None
+    end = day_bounds(end_day)[1] if end_day else None
+    return start, end
+def created_range_q(start_day=None, end_day=None, prefix="", field="created_at"):
+    """Q ``start_day <= field < end_day + 1`` (tanggal lokal, inklusif)."""
+    start, end = day_range(start_day, end_day)
+    q = Q()
+    if start:
+        q &= Q(**{f"{prefix}{field}__gte": start})
+    if end:
+        q &= Q(**{f"{prefix}{field}__lt": end})
+    return q
+def parse_day(value):
+    """Tanggal ISO dari query string; None jika kosong atau tidak valid."""
+    if not value or value == "None":
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
@@ -0,0 +1,177 @@
+import csv
+import io
+from django.db.models import Q  # type: ignore
+from django.utils import timezone  # type: ignore
+from openpyxl import Workbook  # type: ignore
+from openpyxl.cell import WriteOnlyCell  # type: ignore
+from openpyxl.styles import Font  # type: ignore
+from openpyxl.utils import get_column_letter  # type: ignore
+from .date_ranges import created_range_q
+from .models import Order, OrderItem
+from .rollups import sales_summary
+# =========================================================
+# EXPORT LAPORAN
+# =========================================================
+# Semua export membaca tuple values_list per halaman EXPORT_CHUNK_SIZE
+# order dengan keyset ``(created_at, id) < baris terakhir``. Bukan
+# iterator(): mysqlclient tetap menarik seluruh hasil query ke memori
+# klien, sedangkan tiap halaman keyset adalah query terpisah yang kecil.
+EXPORT_CHUNK_SIZE = 2000
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+ORDER_HEADER = ["Order ID", "Tanggal", "Customer", "Status", "Total"]
+ITEM_HEADER = [
+    "Order ID", "Tanggal", "Customer", "Status", "Produk", "Varian",
+    "Custom", "Qty", "Harga Satuan", "Biaya Custom", "Subtotal",
+]
+def local_timestamp(value):
+    return timezone.localtime(value).strftime("%Y-%m-%d %H:%M")
+# =========================
+# BARIS DATA
+# =========================
+def _keyset_pages(queryset, fields, chunk_size):
+    """
+    ``values_list(*fields)`` dari queryset Order per ``chunk_size`` baris,
+    urut ``-created_at, -id`` (index shop_order_created_idx). ``fields``
+    harus diawali ``"id", "created_at"``.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    last = None
+    while True:
+        page = queryset
+        if last:
+            page = page.filter(
+                Q(created_at__lt=last[1]) | Q(created_at=last[1], id__lt=last[0])
+            )
+        rows = list(page.values_list(*fields)[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+def iter_order_rows(start_day=None, end_day=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Tuple (id, created_at, username, status, total) order dalam rentang tanggal."""
+    orders = Order.objects.filter(created_range_q(start_day, end_day))
+    fields = ("id", "created_at", "customer__user__username", "status", "total")
+    for rows in _keyset_pages(orders, fields, chunk_size):
+        yield from rows
+def iter_item_rows(start_day=None, end_day=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Satu tuple per OrderItem beserta data order-nya: satu halaman id order
+    (keyset), lalu item halaman itu dengan satu query JOIN.
+    """
+    orders = Order.objects.filter(created_range_q(start_day, end_day))
+    for keys in _keyset_pages(orders, ("id", "created_at"), chunk_size):
+        yield from (
+            OrderItem.objects
+            .filter(order_id__in=[pk for pk, _ in keys])
+            .order_by("-order__created_at", "-order_id", "id")
+            .values_list(
+                "order_id", "order__created_at", "order__customer__user__username",
+                "order__status", "product_name", "variant_label", "is_custom",
+                "quantity", "unit_price", "custom_price", "line_revenue",
+            )
+        )
+# =========================
+# CSV STREAMING
+# =========================
+def _csv_chunks(header, rows, batch=500):
+    """Tulis baris CSV per ``batch`` agar StreamingHttpResponse tidak mengirim per baris."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+def order_csv_chunks(start_day=None, end_day=None):
+    rows = (
+        (order_id, local_timestamp(created_at), username or "",
+        STATUS_LABELS.get(status, status), total)
+        for order_id, created_at, username, status, total
+        in iter_order_rows(start_day, end_day)
+    )
+    return _csv_chunks(ORDER_HEADER, rows)
+def item_csv_chunks(start_day=None, end_day=None):
+    rows = (
+        (order_id, local_timestamp(created_at), username or "",
+        STATUS_LABELS.get(status, status), product, variant or "",
+        "Ya" if is_custom else "Tidak", quantity, unit_price, custom_price,
+        line_revenue)
+        for (order_id, created_at, username, status, product, variant,
+            is_custom, quantity, unit_price, custom_price, line_revenue)
+        in iter_item_rows(start_day, end_day)
+    )
+    return _csv_chunks(ITEM_HEADER, rows)
+# =========================
+# XLSX (OPENPYXL WRITE-ONLY)
+# =========================
+# Mode write-only menulis baris langsung ke file sementara, jadi memori
+# tidak tumbuh dengan jumlah baris. Tanggal ditulis sebagai datetime
+# lokal dan nominal sebagai angka agar Excel tidak salah membaca format.
+XLSX_DATE_FORMAT = "yyyy-mm-dd hh:mm"
+XLSX_MONEY_FORMAT = "#,##0"
+XLSX_SHEETS = ("orders", "items", "products")
+HEADER_FONT = Font(bold=True)
+def _typed_cell(sheet, value, number_format=None, font=None):
+    cell = WriteOnlyCell(sheet, value=value)
+    if number_format:
+        cell.number_format = number_format
+    if font:
+        cell.font = font
+    return cell
+def _naive_local(value):
+    # Excel tidak mengenal zona waktu
+    return timezone.localtime(value).replace(tzinfo=None)
+def _write_sheet(workbook, title, header, widths, rows, formats):
+    """``formats``: dict index kolom -> number_format."""
+    sheet = workbook.create_sheet(title)
+    for index, width in enumerate(widths, 1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+    sheet.freeze_panes = "A2"
+    sheet.append([_typed_cell(sheet, h, font=HEADER_FONT) for h in header])
+    for row in rows:
+        sheet.append([
+            _typed_cell(sheet, value, formats[i]) if i in formats else value
+            for i, value in enumerate(row)
+        ])
+    return sheet
+def write_sales_xlsx(fileobj, start_day=None, end_day=None, sheets=XLSX_SHEETS):
+    """Tulis workbook laporan penjualan ke ``fileobj`` (file biner yang bisa di-seek)."""
+    workbook = Workbook(write_only=True)
+    if "orders" in sheets:
+        _write_sheet(
+            workbook, "Pesanan", ORDER_HEADER, [10, 18, 20, 22, 16],
+            (
+                (order_id, _naive_local(created_at), username or "",
+                STATUS_LABELS.get(status, status), total)
+                for order_id, created_at, username, status, total
+                in iter_order_rows(start_day, end_day)
+            ),
+            {1: XLSX_DATE_FORMAT, 4: XLSX_MONEY_FORMAT},
+        )
+    if "items" in sheets:
+        _write_sheet(
+            workbook, "Item", ITEM_HEADER, [10, 18, 20, 22, 30, 24, 8, 8, 14, 14, 16],
+            (
+                (order_id, _naive_local(created_at), username or "",
+                STATUS_LABELS.get(status, status), product, variant or "",
+                "Ya" if is_custom else "Tidak", quantity, unit_price, custom_price,
+                line_revenue)
+                for (order_id, created_at, username, status, product, variant,
+                    is_custom, quantity, unit_price, custom_price, line_revenue)
+                in iter_item_rows(start_day, end_day)
+            ),
+            {1: XLSX_DATE_FORMAT, 8: XLSX_MONEY_FORMAT, 9: XLSX_MONEY_FORMAT, 10: XLSX_MONEY_FORMAT},
+        )
+    if "products" in sheets:
+        summary = sales_summary(start_day, end_day, top=None)
+        _write_sheet(
+            workbook, "Produk Terlaris", ["Produk", "Qty Terjual", "Pendapatan"], [40, 14, 18],
+            ((p["product_name"], p["qty"], p["revenue"]) for p in summary["top_products"]),
+            {2: XLSX_MONEY_FORMAT},
+        )
+    workbook.save(fileobj)
+    return fileobj
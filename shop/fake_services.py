@@ -0,0 +1,247 @@
+"""
+Server tiruan lokal untuk RajaOngkir, Komship, Midtrans Snap dan Fonnte.
+
+Semua layanan dilayani satu server HTTP dengan prefix path berbeda
+(``/rajaongkir``, ``/komship``, ``/midtrans``, ``/fonnte``) dan membalas
+dengan bentuk respons yang sama dengan API aslinya, sehingga alur checkout,
+pembayaran dan notifikasi bisa di-load test tanpa memanggil API berbayar.
+Jalankan dengan ``manage.py run_fake_services`` lalu pakai profil
+``DJANGO_SETTINGS_MODULE=core.settings_fake``.
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import requests  # type: ignore
+from .utils import midtrans_signature
+
+SERVICES = ("rajaongkir", "komship", "midtrans", "fonnte")
+# ongkir per kg per kurir
+COURIER_RATES = {"jne": 11000, "jnt": 10500, "sicepat": 10000, "pos": 9500, "tiki": 11500}
+# =========================================================
+# DATA TIRUAN
+# =========================================================
+def fake_provinces(count=34):
+    return [{"id": p, "name": f"PROVINSI {p}"} for p in range(1, count + 1)]
+def fake_cities(province_id, count=10):
+    return [
+        {"id": province_id * 100 + i, "name": f"KOTA {province_id}-{i}"}
+        for i in range(1, count + 1)
+    ]
+def fake_districts(city_id, count=10):
+    return [
+        {"id": city_id * 100 + i, "name": f"KECAMATAN {city_id}-{i}",
+        "zip_code": f"{(city_id * 100 + i) % 100000:05d}"}
+        for i in range(1, count + 1)
+    ]
+def fake_costs(destination, weight, courier):
+    """Ongkir deterministik: tarif kurir x kg, layanan REG dan YES."""
+    kg = max(1, math.ceil(int(weight) / 1000))
+    rate = COURIER_RATES.get(courier, 12000) + (int(destination) % 7) * 500
+    code = courier.upper()
+    return [
+        {"name": code, "code": courier, "service": "REG",
+        "description": "Layanan Reguler", "cost": rate * kg, "etd": "2-3 day"},
+        {"name": code, "code": courier, "service": "YES",
+        "description": "Yakin Esok Sampai", "cost": int(rate * kg * 1.8), "etd": "1 day"},
+    ]
+def build_midtrans_notification(order_id, gross_amount, transaction_status="settlement",
+                                server_key=None):
+    """Body notifikasi Midtrans (HTTP notification) lengkap dengan signature_key."""
+    status_code = "200" if transaction_status in ("capture", "settlement") else "201"
+    gross_amount = f"{int(gross_amount)}.00"
+    return {
+        "transaction_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "transaction_status": transaction_status,
+        "transaction_id": str(uuid.uuid4()),
+        "status_code": status_code,
+        "signature_key": midtrans_signature(order_id, status_code, gross_amount, server_key),
+        "payment_type": "bank_transfer",
+        "order_id": order_id,
+        "gross_amount": gross_amount,
+        "fraud_status": "accept",
+        "currency": "IDR",
+    }
+# =========================================================
+# SERVER
+# =========================================================
+class FakeServices:
+    """
+    ``latency`` (detik), ``jitter`` (detik) dan ``error_rate`` (0..1) berlaku
+    untuk semua layanan; ``overrides`` mengganti nilainya per layanan, mis.
+    ``{"fonnte": {"error_rate": 0.1}}``. Jika ``callback_url`` diisi, setiap
+    transaksi Snap diikuti notifikasi Midtrans bertanda tangan setelah
+    ``callback_delay`` detik (``callback_status`` mis. "settlement"/"expire").
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                overrides=None, callback_url=None, callback_delay=1.0,
+                callback_status="settlement", server_key="", delivered_after=60.0, seed=None):
+        self.defaults = {"latency": latency, "jitter": jitter, "error_rate": error_rate}
+        self.overrides = overrides or {}
+        self.callback_url = callback_url
+        self.callback_delay = callback_delay
+        self.callback_status = callback_status
+        self.server_key = server_key
+        self.delivered_after = delivered_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.hits = {name: 0 for name in SERVICES}
+        self.waybills = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.httpd.block_on_close = False
+        self.url = f"http://{host}:{self.httpd.server_port}"
+        self.thread = None
+    # =========================
+    # LIFECYCLE
+    # =========================
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        return self
+    def serve_forever(self):
+        self.httpd.serve_forever(0.05)
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    def __enter__(self):
+        return self.start()
+    def __exit__(self, *exc):
+        self.close()
+    def settings_for(self):
+        """Settings yang mengarahkan aplikasi ke server ini."""
+        return {
+            "RAJAONGKIR_BASE_URL": f"{self.url}/rajaongkir",
+            "KOMSHIP_BASE_URL": f"{self.url}/komship",
+            "MIDTRANS_SNAP_BASE_URL": f"{self.url}/midtrans/snap/v1",
+            "FONNTE_API_URL": f"{self.url}/fonnte/send",
+        }
+    # =========================
+    # PERILAKU JARINGAN
+    # =========================
+    def _option(self, service, key):
+        return self.overrides.get(service, {}).get(key, self.defaults[key])
+    def _simulate(self, service):
+        """Tidur sesuai latency; return True jika request ini harus gagal."""
+        with self.lock:
+            self.hits[service] += 1
+            jitter = self.random.uniform(0, self._option(service, "jitter"))
+            failed = self.random.random() < self._option(service, "error_rate")
+        delay = self._option(service, "latency") + jitter
+        if delay:
+            time.sleep(delay)
+        return failed
+    # =========================
+    # ROUTES
+    # =========================
+    def route(self, method, service, path, params, body):
+        handler = getattr(self, f"_{service}", None)
+        if handler is None:
+            return 404, {"message": "Not found"}
+        return handler(method, path, params, body)
+    def _rajaongkir(self, method, path, params, body):
+        meta = {"message": "Success", "code": 200, "status": "success"}
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts[:2] == ["destination", "province"]:
+            return 200, {"meta": meta, "data": fake_provinces()}
+        if method == "GET" and parts[:2] == ["destination", "city"] and len(parts) == 3:
+            return 200, {"meta": meta, "data": fake_cities(int(parts[2]))}
+        if method == "GET" and parts[:2] == ["destination", "district"] and len(parts) == 3:
+            return 200, {"meta": meta, "data": fake_districts(int(parts[2]))}
+        if method == "POST" and parts == ["calculate", "domestic-cost"]:
+            data = fake_costs(body.get("destination", 0), body.get("weight", 1000),
+                            str(body.get("courier", "jne")).lower())
+            return 200, {"meta": meta, "data": data}
+        return 404, {"meta": {"message": "Not found", "code": 404, "status": "error"}}
+    def _komship(self, method, path, params, body):
+        meta = {"message": "Success", "code": 200, "status": "success"}
+        if method == "POST" and path.endswith("/orders/store"):
+            awb = f"FAKE{uuid.uuid4().hex[:10].upper()}"
+            with self.lock:
+                self.waybills[awb] = time.monotonic()
+            return 200, {"meta": meta, "data": {"order_no": f"KOM-{body.get('order_id')}", "awb": awb}}
+        if method == "GET" and path.endswith("/history-airway-bill"):
+            awb = params.get("airway_bill", "")
+            with self.lock:
+                created = self.waybills.setdefault(awb, time.monotonic())
+            delivered = time.monotonic() - created >= self.delivered_after
+            status = "DELIVERED" if delivered else "IN_TRANSIT"
+            return 200, {"meta": meta, "data": {"airway_bill": awb, "last_status": status}}
+        return 404, {"meta": {"message": "Not found", "code": 404, "status": "error"}}
+    def _midtrans(self, method, path, params, body):
+        if method == "POST" and path.endswith("/transactions"):
+            details = body.get("transaction_details") or {}
+            token = str(uuid.uuid4())
+            if self.callback_url:
+                threading.Timer(
+                    self.callback_delay, self._send_callback,
+                    args=(details.get("order_id"), details.get("gross_amount", 0)),
+                ).start()
+            return 201, {
+                "token": token,
+                "redirect_url": f"{self.url}/midtrans/snap/v2/vtweb/{token}",
+            }
+        return 404, {"status_code": "404", "status_message": "Not found"}
+    def _send_callback(self, order_id, gross_amount):
+        notification = build_midtrans_notification(
+            order_id, gross_amount, self.callback_status, self.server_key
+        )
+        try:
+            requests.post(self.callback_url, json=notification, timeout=10)
+        except requests.RequestException:
+            pass  # aplikasi sedang tidak bisa dihubungi, sama seperti Midtrans asli
+    def _fonnte(self, method, path, params, body):
+        if method == "POST" and path.strip("/") == "send":
+            targets = str(body.get("target", "")).split(",")
+            return 200, {
+                "detail": "success! message in queue",
+                "id": [self.random.randint(10 ** 8, 10 ** 9) for _ in targets],
+                "process": "pending",
+                "status": True,
+                "target": targets,
+            }
+        return 404, {"status": False, "reason": "Not found"}
+    # =========================
+    # HTTP HANDLER
+    # =========================
+    def _handler_class(self):
+        fake = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length).decode() if length else ""
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    return json.loads(raw or "{}")
+                return {k: v[0] for k, v in parse_qs(raw).items()}
+            def _handle(self):
+                url = urlsplit(self.path)
+                service, _, path = url.path.lstrip("/").partition("/")
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = self._body() if self.command == "POST" else {}
+                if service not in SERVICES:
+                    status, payload = 404, {"message": "Unknown service"}
+                elif fake._simulate(service):
+                    status = 429 if service == "fonnte" else 503
+                    payload = {"message": "Injected error"}
+                else:
+                    status, payload = fake.route(self.command, service, "/" + path, params, body)
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client sudah timeout
+            do_GET = do_POST = _handle
+            def log_message(self, *args):
+                pass
+        return Handler
@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+
+logger = logging.getLogger(__name__)
+# Semua 5xx dihitung gagal oleh breaker; hanya status ini yang di-retry
+RETRY_STATUS = {502, 503, 504}
+# =========================================================
+# RATE LIMITER
+# =========================================================
+class TokenBucket:
+    """Token bucket thread-safe: ``rate`` token per detik, maksimal ``capacity``."""
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+# =========================================================
+# CIRCUIT BREAKER
+# =========================================================
+class CircuitOpenError(requests.ConnectionError):
+    """Dilempar tanpa menghubungi upstream saat breaker sedang terbuka."""
+class CircuitBreaker:
+    """
+    ``closed`` -> ``open`` setelah ``failure_threshold`` kegagalan beruntun.
+    Setelah ``reset_timeout`` detik satu request percobaan diizinkan
+    (``half_open``); sukses menutup breaker, gagal membukanya lagi.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probe_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probe_in_flight:
+                    self.open_count += 1
+                self.opened_at = self.clock()
+            self.probe_in_flight = False
+    def release_probe(self):
+        """Lepas probe half-open tanpa mengubah status (error bukan dari upstream)."""
+        with self.lock:
+            self.probe_in_flight = False
+# =========================================================
+# HTTP CLIENT
+# =========================================================
+class ResilientClient:
+    """
+    ``requests.Session`` bersama (keep-alive, connection pool) dengan
+    timeout connect/read terpisah, retry ber-backoff untuk request
+    idempotent, circuit breaker, dan metrik latency per client.
+    """
+    def __init__(self, name, base_url, headers=None, connect_timeout=3, read_timeout=10,
+                max_retries=2, backoff=0.3, breaker=None, pool_size=10):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(headers or {})
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "requests": 0,
+            "failures": 0,
+            "retries": 0,
+            "short_circuited": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        }
+    def _record(self, **changes):
+        with self._metrics_lock:
+            for key, value in changes.items():
+                if key == "latency_ms":
+                    self.metrics["latency_ms_total"] += value
+                    self.metrics["latency_ms_max"] = max(self.metrics["latency_ms_max"], value)
+                else:
+                    self.metrics[key] += value
+    def get_metrics(self):
+        with self._metrics_lock:
+            data = dict(self.metrics)
+        data["latency_ms_avg"] = (
+            round(data["latency_ms_total"] / data["requests"], 1) if data["requests"] else 0
+        )
+        data["breaker_state"] = self.breaker.state
+        data["breaker_open_count"] = self.breaker.open_count
+        return data
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Kirim request ke ``base_url + path``. Respons 5xx dilempar sebagai
+        ``HTTPError`` dan dihitung gagal oleh breaker. Retry hanya untuk
+        request idempotent (default: GET/HEAD) yang gagal koneksi/timeout
+        atau mendapat 502/503/504; error dilempar sebagai
+        ``requests.RequestException`` seperti ``requests`` biasa.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self._record(short_circuited=1)
+                raise CircuitOpenError(f"{self.name}: circuit breaker terbuka")
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except requests.RequestException as e:
+                self._record(requests=1, failures=1,
+                            latency_ms=(time.perf_counter() - started) * 1000)
+                self.breaker.record_failure()
+                logger.warning("%s %s %s gagal (percobaan %s): %s",
+                            self.name, method, path, attempt + 1, e)
+                if attempt + 1 >= attempts or not self._retryable(e):
+                    raise
+                self._record(retries=1)
+                time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+                continue
+            except BaseException:
+                # bukan kegagalan upstream; jangan biarkan probe half-open tertahan
+                self.breaker.release_probe()
+                raise
+            self._record(requests=1, latency_ms=(time.perf_counter() - started) * 1000)
+            self.breaker.record_success()
+            return response
+    @staticmethod
+    def _retryable(error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        response = getattr(error, "response", None)
+        return response is not None and response.status_code in RETRY_STATUS
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
@@ -0,0 +1,133 @@
+from decimal import Decimal, InvalidOperation
+from django.db import transaction  # type: ignore
+from django.db.models import F  # type: ignore
+from .models import Color, ProductVariant, Size
+# =========================================================
+# STOK VARIAN
+# =========================================================
+class InsufficientStock(Exception):
+    pass
+def decrement_stock(variant, quantity):
+    """
+    Kurangi stok ``variant`` (ProductVariant / CustomProductVariant) dengan
+    satu UPDATE bersyarat, jadi tidak menimpa perubahan stok dari editor
+    matriks atau checkout lain. Raise InsufficientStock bila stok kurang.
+    """
+    updated = type(variant).objects.filter(
+        pk=variant.pk, stock__gte=quantity
+    ).update(stock=F("stock") - quantity)
+    if not updated:
+        raise InsufficientStock(f"Stok {variant} tidak cukup.")
+    variant.stock -= quantity
+# =========================
+# MATRIKS WARNA x UKURAN
+# =========================
+def stock_matrix(product, include_all=False):
+    """
+    ``(colors, sizes, rows)`` untuk editor stok. ``rows`` berisi
+    ``(color, [(size, variant atau None), ...])``. Default hanya warna/ukuran
+    yang sudah dipakai produk; ``include_all`` menampilkan semua master data
+    agar kombinasi baru bisa diisi.
+    """
+    variants = {
+        (v.color_id, v.size_id): v
+        for v in product.variants.select_related("color", "size")
+    }
+    if include_all:
+        colors = list(Color.objects.order_by("name"))
+        sizes = list(Size.objects.order_by("id"))
+    else:
+        colors = sorted({v.color for v in variants.values()}, key=lambda c: c.name)
+        sizes = sorted({v.size for v in variants.values()}, key=lambda s: s.pk)
+    rows = [
+        (color, [(size, variants.get((color.pk, size.pk))) for size in sizes])
+        for color in colors
+    ]
+    return colors, sizes, rows
+def parse_matrix_changes(data):
+    """
+    Baca sel yang berubah dari POST: ``stock-<warna>-<ukuran>`` (angka, atau
+    ``+N`` untuk menambah), ``price-<warna>-<ukuran>`` (kosong = harga produk)
+    dan ``version-<warna>-<ukuran>`` (stok saat halaman dibuka).
+    Return ``(changes, errors)``.
+    """
+    changes = {}
+    errors = []
+    for name, value in data.items():
+        field, _, key = name.partition("-")
+        if field not in ("stock", "price", "version"):
+            continue
+        try:
+            color_id, size_id = (int(part) for part in key.split("-"))
+        except ValueError:
+            continue
+        cell = changes.setdefault((color_id, size_id), {})
+        value = value.strip()
+        try:
+            if field == "stock":
+                cell["delta"] = value.startswith("+")
+                cell["stock"] = int(value)
+                if cell["stock"] < 0:
+                    raise ValueError
+            elif field == "price":
+                cell["price"] = Decimal(value) if value else None
+                if cell["price"] is not None and cell["price"] < 0:
+                    raise ValueError
+            else:
+                cell["version"] = int(value) if value else None
+        except (ValueError, InvalidOperation):
+            errors.append(f"Nilai {field} tidak valid: {value}")
+    return {k: v for k, v in changes.items() if "stock" in v or "price" in v}, errors
+def apply_matrix_changes(product, changes):
+    """
+    Terapkan ``changes`` dalam satu transaksi: satu SELECT ... FOR UPDATE,
+    satu bulk_update dan satu bulk_create. Sel dengan ``version`` yang tidak
+    sama dengan stok sekarang (mis. sudah dikurangi checkout) dianggap
+    konflik; bila ada konflik tidak ada yang disimpan.
+    Return ``{"updated", "created", "conflicts"}``.
+    """
+    result = {"updated": 0, "created": 0, "conflicts": []}
+    if not changes:
+        return result
+    with transaction.atomic():
+        current = {
+            (v.color_id, v.size_id): v
+            for v in product.variants.select_for_update(of=("self",)).select_related("color", "size")
+        }
+        to_update, to_create = [], []
+        for (color_id, size_id), cell in changes.items():
+            variant = current.get((color_id, size_id))
+            if variant is None:
+                to_create.append(ProductVariant(
+                    product=product, color_id=color_id, size_id=size_id,
+                    stock=cell.get("stock", 0), price_override=cell.get("price"),
+                ))
+                continue
+            if "stock" in cell:
+                if cell["delta"]:
+                    variant.stock += cell["stock"]
+                elif cell.get("version") is not None and cell["version"] != variant.stock:
+                    result["conflicts"].append((variant, cell["version"]))
+                    continue
+                else:
+                    variant.stock = cell["stock"]
+            if "price" in cell:
+                variant.price_override = cell["price"]
+            to_update.append(variant)
+        if result["conflicts"]:
+            return result
+        if to_create:
+            known_colors = set(Color.objects.filter(
+                pk__in={v.color_id for v in to_create}
+            ).values_list("pk", flat=True))
+            known_sizes = set(Size.objects.filter(
+                pk__in={v.size_id for v in to_create}
+            ).values_list("pk", flat=True))
+            to_create = [
+                v for v in to_create
+                if v.color_id in known_colors and v.size_id in known_sizes
+            ]
+        ProductVariant.objects.bulk_update(to_update, ["stock", "price_override"])
+        ProductVariant.objects.bulk_create(to_create)
+    result["updated"], result["created"] = len(to_update), len(to_create)
+    return result
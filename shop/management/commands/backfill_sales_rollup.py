@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError  # type: ignore
+from django.utils import timezone  # type: ignore
+from django.utils.dateparse import parse_date  # type: ignore
+from shop.models import Order
+from shop.rollups import rebuild_rollup_days
+class Command(BaseCommand):
+    help = (
+        "Bangun ulang tabel DailySalesRollup dari data order. Tanpa argumen: "
+        "seluruh riwayat sampai hari ini."
+    )
+    def add_arguments(self, parser):
+        parser.add_argument("--start", default=None, help="Tanggal awal (YYYY-MM-DD)")
+        parser.add_argument("--end", default=None, help="Tanggal akhir (YYYY-MM-DD)")
+        parser.add_argument("--days", type=int, default=None, help="Hanya N hari terakhir")
+    def handle(self, *args, **opts):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== AF PROMOTION — Backfill Rollup Penjualan ===\n"))
+        today = timezone.localdate()
+        end = parse_date(opts["end"]) if opts["end"] else today
+        if opts["days"]:
+            start = today - timedelta(days=opts["days"] - 1)
+        elif opts["start"]:
+            start = parse_date(opts["start"])
+        else:
+            first = Order.objects.order_by("created_at").values_list("created_at", flat=True).first()
+            start = timezone.localdate(first) if first else today
+        if not start or not end or start > end:
+            raise CommandError("Rentang tanggal tidak valid.")
+        started = time.perf_counter()
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        rebuild_rollup_days(days)
+        self.stdout.write(f"  Rentang      : {start} s/d {end}")
+        self.stdout.write(f"  Hari         : {self.style.SUCCESS(str(len(days)))}")
+        self.stdout.write(f"  Durasi       : {time.perf_counter() - started:.2f} detik\n")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand     # type: ignore
+from shop.whatsapp import FonnteClient
+class Command(BaseCommand):
+    help = "Ukur throughput pengiriman WA (pesan/detik) ke FONNTE_API_URL, mis. server Fonnte lokal"
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50)
+        parser.add_argument("--phone", default="081200000000")
+        parser.add_argument("--url", default=None, help="Override FONNTE_API_URL")
+        parser.add_argument("--rate", type=float, default=None, help="Override FONNTE_RATE_PER_SECOND")
+    def handle(self, *args, **opts):
+        client = FonnteClient(url=opts["url"], rate=opts["rate"], burst=opts["rate"])
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n=== Benchmark WA — {opts['count']} pesan ke {client.url} ===\n"
+        ))
+        ok = 0
+        started = time.perf_counter()
+        for i in range(opts["count"]):
+            result = client.send(opts["phone"], f"Benchmark pesan #{i}")
+            if result and result.get("status"):
+                ok += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  Terkirim : {self.style.SUCCESS(str(ok))} / {opts['count']}")
+        self.stdout.write(f"  Durasi   : {elapsed:.2f} detik")
+        rate = opts["count"] / elapsed if elapsed else 0
+        self.stdout.write(f"  Throughput : {self.style.SUCCESS(f'{rate:.1f}')} pesan/detik\n")
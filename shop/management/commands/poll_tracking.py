@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand     # type: ignore
+from shop.tracking import poll_tracking
+class Command(BaseCommand):
+    help = (
+        "Poll status resi order SHIPPED yang sudah jatuh tempo dan perbarui shipping_status. "
+        "Jalankan berkala (cron), mis. tiap 5 menit."
+    )
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Maksimal order per run")
+        parser.add_argument("--concurrency", type=int, default=None, help="Request paralel per kurir")
+        parser.add_argument("--rate", type=float, default=None, help="Request per detik per kurir")
+    def handle(self, *args, **opts):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== AF PROMOTION — Poll Tracking Resi ===\n"))
+        started = time.perf_counter()
+        summary = poll_tracking(
+            limit=opts["limit"],
+            concurrency=opts["concurrency"],
+            rate=opts["rate"],
+        )
+        self.stdout.write(f"  Resi dicek   : {summary['polled']}")
+        self.stdout.write(f"  Status baru  : {self.style.SUCCESS(str(summary['changed']))}")
+        self.stdout.write(f"  Gagal        : {self.style.WARNING(str(summary['failed']))}")
+        self.stdout.write(f"  Durasi       : {time.perf_counter() - started:.2f} detik\n")
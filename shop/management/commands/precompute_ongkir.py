@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand  # type: ignore
+from django.conf import settings  # type: ignore
+from shop.ongkir_matrix import precompute_matrix, top_destinations, top_weight_buckets
+class Command(BaseCommand):
+    help = (
+        "Hitung matrix ongkir (tujuan teratas x bucket berat x kurir) dari riwayat order "
+        "dan simpan ke tabel ShippingQuote. Jalankan berkala (cron), mis. tiap malam."
+    )
+    def add_arguments(self, parser):
+        parser.add_argument("--destinations", type=int, default=300, help="Jumlah kecamatan tujuan teratas")
+        parser.add_argument("--weights", type=int, default=5, help="Jumlah bucket berat teratas")
+        parser.add_argument("--days", type=int, default=180, help="Rentang riwayat order (hari)")
+        parser.add_argument("--couriers", default=None, help="Daftar kurir dipisah koma")
+        parser.add_argument("--rate", type=float, default=None, help="Request per detik ke RajaOngkir")
+        parser.add_argument("--concurrency", type=int, default=None, help="Request paralel")
+        parser.add_argument(
+            "--max-age", type=float, default=None,
+            help="Lewati quote yang lebih muda dari N jam (default ONGKIR_MATRIX_REFRESH)",
+        )
+    def handle(self, *args, **opts):
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== AF PROMOTION — Precompute Matrix Ongkir ===\n"))
+        started = time.perf_counter()
+        destinations = top_destinations(opts["destinations"], opts["days"])
+        weights = top_weight_buckets(opts["weights"], opts["days"])
+        couriers = (
+            [c.strip() for c in opts["couriers"].split(",") if c.strip()]
+            if opts["couriers"] else getattr(settings, "ONGKIR_COURIERS", None)
+        )
+        if not destinations or not weights:
+            self.stdout.write(self.style.WARNING("  Belum ada riwayat order dengan tujuan.\n"))
+            return
+        summary = precompute_matrix(
+            destinations,
+            weights,
+            couriers=couriers,
+            rate=opts["rate"],
+            concurrency=opts["concurrency"],
+            max_age=opts["max_age"] * 3600 if opts["max_age"] is not None else None,
+        )
+        self.stdout.write(f"  Tujuan       : {len(destinations)}")
+        self.stdout.write(f"  Bucket berat : {', '.join(f'{w}g' for w in weights)}")
+        self.stdout.write(f"  Kombinasi    : {summary['total']}")
+        self.stdout.write(f"  Masih segar  : {summary['skipped']}")
+        self.stdout.write(f"  Disimpan     : {self.style.SUCCESS(str(summary['stored']))}")
+        self.stdout.write(f"  Gagal        : {self.style.WARNING(str(summary['failed']))}")
+        self.stdout.write(f"  Durasi       : {time.perf_counter() - started:.2f} detik\n")
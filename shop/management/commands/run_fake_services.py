@@ -0,0 +1,53 @@
+import json
+from django.conf import settings  # type: ignore
+from django.core.management.base import BaseCommand  # type: ignore
+from shop.fake_services import FakeServices
+class Command(BaseCommand):
+    help = (
+        "Jalankan server tiruan RajaOngkir/Komship/Midtrans/Fonnte untuk load test. "
+        "Pasangkan dengan DJANGO_SETTINGS_MODULE=core.settings_fake."
+    )
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.15, help="Latency dasar (detik)")
+        parser.add_argument("--jitter", type=float, default=0.05, help="Tambahan latency acak (detik)")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang error 0..1")
+        parser.add_argument(
+            "--override", default="{}",
+            help='JSON per layanan, mis. \'{"fonnte": {"error_rate": 0.1}}\'',
+        )
+        parser.add_argument(
+            "--callback-url", default=None,
+            help="URL midtrans_callback aplikasi; kosong = tanpa notifikasi",
+        )
+        parser.add_argument("--callback-delay", type=float, default=1.0)
+        parser.add_argument("--callback-status", default="settlement")
+        parser.add_argument("--delivered-after", type=float, default=60.0,
+                            help="Detik sampai resi dilaporkan DELIVERED")
+        parser.add_argument("--seed", type=int, default=None)
+    def handle(self, *args, **opts):
+        fake = FakeServices(
+            host=opts["host"],
+            port=opts["port"],
+            latency=opts["latency"],
+            jitter=opts["jitter"],
+            error_rate=opts["error_rate"],
+            overrides=json.loads(opts["override"]),
+            callback_url=opts["callback_url"],
+            callback_delay=opts["callback_delay"],
+            callback_status=opts["callback_status"],
+            server_key=settings.MIDTRANS_SERVER_KEY.strip(),
+            delivered_after=opts["delivered_after"],
+            seed=opts["seed"],
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== AF PROMOTION — Fake External Services ===\n"))
+        for name, value in fake.settings_for().items():
+            self.stdout.write(f"  {name:<24}: {value}")
+        self.stdout.write("\n  Ctrl+C untuk berhenti.\n")
+        try:
+            fake.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.httpd.server_close()
@@ -0,0 +1,110 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand     # type: ignore
+from django.db import transaction                 # type: ignore
+from django.utils import timezone                 # type: ignore
+from shop.models import Province, City, District
+from shop.shipping import get_provinces, get_cities, get_subdistricts
+class Command(BaseCommand):
+    help = (
+        "Sinkron master data wilayah (provinsi, kota, kecamatan) dari RajaOngkir. "
+        "Incremental: wilayah yang disinkron kurang dari --max-age hari dilewati."
+    )
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=30, help="Umur data (hari) sebelum disinkron ulang")
+        parser.add_argument("--full", action="store_true", help="Abaikan --max-age, sinkron semua")
+        parser.add_argument("--province", type=int, action="append", help="Batasi ke ID provinsi tertentu")
+        parser.add_argument("--skip-districts", action="store_true", help="Hanya provinsi & kota")
+    def handle(self, *args, **opts):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            "\n=== AF PROMOTION — Sinkron Wilayah RajaOngkir ===\n"
+        ))
+        self.now = timezone.now()
+        self.cutoff = None if opts["full"] else self.now - timedelta(days=opts["max_age"])
+        self.calls = 0
+        # ── 1. PROVINSI ─────────────────────────────────────────────────
+        self.stdout.write(self.style.MIGRATE_LABEL("» Provinsi..."))
+        rows = self.fetch(get_provinces)
+        if rows is None:
+            self.stdout.write(self.style.ERROR("✗ Gagal mengambil provinsi, sinkron dibatalkan."))
+            return
+        self.upsert(Province, [Province(id=int(r["id"]), name=r["name"], synced_at=self.now) for r in rows])
+        provinces = Province.objects.all()
+        if opts["province"]:
+            provinces = provinces.filter(id__in=opts["province"])
+        # ── 2. KOTA ─────────────────────────────────────────────────────
+        self.stdout.write(self.style.MIGRATE_LABEL("\n» Kota..."))
+        for province in provinces:
+            if self.is_fresh(province.cities):
+                continue
+            rows = self.fetch(get_cities, province.id)
+            if rows is None:
+                self.stdout.write(self.style.WARNING(f"  ⚠ {province.name} dilewati (API gagal, stale atau kosong)"))
+                continue
+            n = self.replace_children(
+                City, province.cities,
+                [City(id=int(r["id"]), province=province, name=r["name"], synced_at=self.now) for r in rows],
+            )
+            self.stdout.write(f"  {self.style.SUCCESS('✓')} {province.name:<30} {n} kota")
+        # ── 3. KECAMATAN ────────────────────────────────────────────────
+        if not opts["skip_districts"]:
+            self.stdout.write(self.style.MIGRATE_LABEL("\n» Kecamatan..."))
+            for city in City.objects.filter(province__in=provinces).select_related("province"):
+                if self.is_fresh(city.districts):
+                    continue
+                rows = self.fetch(get_subdistricts, city.id)
+                if rows is None:
+                    self.stdout.write(self.style.WARNING(f"  ⚠ {city.name} dilewati (API gagal, stale atau kosong)"))
+                    continue
+                n = self.replace_children(
+                    District, city.districts,
+                    [
+                        District(
+                            id=int(r["id"]), city=city, name=r["name"],
+                            zip_code=str(r.get("zip_code") or "")[:10], synced_at=self.now,
+                        )
+                        for r in rows
+                    ],
+                )
+                self.stdout.write(f"  {self.style.SUCCESS('✓')} {city.name:<30} {n} kecamatan")
+        # ── SUMMARY ─────────────────────────────────────────────────────
+        self.stdout.write(self.style.MIGRATE_HEADING("\n─────────────────────────────────────"))
+        self.stdout.write(f"  Panggilan API : {self.calls}")
+        self.stdout.write(f"  Provinsi      : {Province.objects.count()}")
+        self.stdout.write(f"  Kota          : {City.objects.count()}")
+        self.stdout.write(f"  Kecamatan     : {District.objects.count()}")
+        self.stdout.write(self.style.SUCCESS("\n=== Selesai! ===\n"))
+    # =========================
+    # HELPER
+    # =========================
+    def fetch(self, func, *args):
+        """
+        Data dari API, atau None bila gagal, kosong, atau ``stale`` (payload
+        last-good saat RajaOngkir down): data lama tidak boleh ditandai
+        segar, dan respons kosong tidak boleh menghapus wilayah.
+        """
+        self.calls += 1
+        result = func(*args)
+        if result.get("success") is False or result.get("stale"):
+            return None
+        return result.get("data") or None
+    def is_fresh(self, children):
+        if self.cutoff is None:
+            return False
+        oldest = children.order_by("synced_at").values_list("synced_at", flat=True).first()
+        return oldest is not None and oldest >= self.cutoff
+    def upsert(self, model, objs):
+        update_fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+        model.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=update_fields,
+        )
+    def replace_children(self, model, children, objs):
+        if not objs:
+            return 0
+        with transaction.atomic():
+            self.upsert(model, objs)
+            # wilayah yang sudah tidak ada di RajaOngkir dihapus
+            children.exclude(id__in=[o.id for o in objs]).delete()
+        return len(objs)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0024_alter_order_shipping_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='OrderStatusLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('status', 'Status Order'), ('shipping_status', 'Status Pengiriman')], default='status', max_length=20)),
+                ('from_status', models.CharField(blank=True, max_length=20, null=True)),
+                ('to_status', models.CharField(max_length=20)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('source', models.CharField(blank=True, max_length=30)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_logs', to='shop.order')),
+            ],
+            options={
+                'ordering': ('created_at', 'id'),
+                'indexes': [models.Index(fields=['order', 'created_at'], name='shop_statuslog_order_idx'), models.Index(fields=['field', 'from_status', 'created_at'], name='shop_statuslog_from_idx'), models.Index(fields=['field', 'to_status', 'created_at'], name='shop_statuslog_to_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0026_province_city_district'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='next_tracking_poll_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tracking_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tracking_poll_interval',
+            field=models.PositiveIntegerField(default=0, help_text='Detik'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tracking_status',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'next_tracking_poll_at'], name='shop_order_tracking_poll_idx'),
+        ),
+    ]
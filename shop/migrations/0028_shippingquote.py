@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0027_order_tracking_poll'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.PositiveIntegerField()),
+                ('destination', models.PositiveIntegerField()),
+                ('weight_bucket', models.PositiveIntegerField()),
+                ('courier', models.CharField(max_length=20)),
+                ('services', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fetched_at'], name='shop_quote_fetched_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination', 'weight_bucket', 'courier'), name='shop_quote_lookup_uniq')],
+            },
+        ),
+    ]
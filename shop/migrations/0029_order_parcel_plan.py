@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0028_shippingquote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='parcel_plan',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
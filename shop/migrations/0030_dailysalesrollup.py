@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:23
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0029_order_parcel_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('product_key', models.PositiveIntegerField(default=0)),
+                ('product_name', models.CharField(blank=True, max_length=200)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('item_quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_key', 'date'], name='shop_rollup_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'status', 'product_key'), name='shop_rollup_day_uniq')],
+            },
+        ),
+    ]
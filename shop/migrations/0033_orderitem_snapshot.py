@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:35
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+
+def backfill_snapshot(apps, schema_editor):
+    # satu UPDATE per kolom, bukan save() per baris
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    Product = apps.get_model('shop', 'Product')
+    OrderItem.objects.update(
+        line_revenue=(F('unit_price') + F('custom_price')) * F('quantity'),
+        variant_key=Concat(Value('P'), Cast('product_id', output_field=CharField())),
+    )
+    OrderItem.objects.filter(product_name='').update(
+        product_name=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('name')[:1]),
+    )
+    # rollup dibangun ulang dengan kunci varian di 0035_build_sales_rollup
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0032_order_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailysalesrollup',
+            name='shop_rollup_day_uniq',
+        ),
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='variant_key',
+            field=models.CharField(blank=True, default='', max_length=60),
+        ),
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='variant_label',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_revenue',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='variant_key',
+            field=models.CharField(blank=True, max_length=60),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'status', 'product_key', 'variant_key'), name='shop_rollup_day_variant_uniq'),
+        ),
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:10
+
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+
+def build_sales_rollup(apps, schema_editor, batch_size=2000):
+    # isi rollup untuk riwayat yang sudah ada; tanpa ini dashboard (yang
+    # hanya membaca rollup) menampilkan nol sampai backfill dijalankan
+    Order = apps.get_model('shop', 'Order')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    DailySalesRollup = apps.get_model('shop', 'DailySalesRollup')
+    zone = timezone.get_default_timezone()
+    rows = {}
+
+    def add(key, quantity, revenue, product_name='', variant_label=''):
+        row = rows.setdefault(key, {
+            'order_count': 0, 'item_quantity': 0, 'revenue': Decimal('0'),
+            'product_name': (product_name or '')[:200],
+            'variant_label': (variant_label or '')[:200],
+        })
+        row['order_count'] += 1
+        row['item_quantity'] += quantity or 0
+        row['revenue'] += revenue or 0
+
+    # order dibaca per halaman keyset id (iterator() di mysqlclient tetap
+    # memuat seluruh hasil); item digrup per (order, produk, varian) di DB
+    # sehingga tiap baris grup = satu order, tanpa menyimpan set id order.
+    # Tanggal lokal dihitung di Python: CONVERT_TZ MySQL butuh tabel zona waktu.
+    orders = Order.objects.order_by('id').values_list('id', 'created_at', 'status', 'total')
+    last_id = 0
+    while True:
+        page = list(orders.filter(id__gt=last_id)[:batch_size])
+        if not page:
+            break
+        last_id = page[-1][0]
+        day_status = {}
+        for order_id, created_at, status, total in page:
+            day_status[order_id] = (timezone.localdate(created_at, zone), status)
+            add((*day_status[order_id], 0, ''), 0, total)
+        groups = (
+            OrderItem.objects
+            .filter(order_id__in=list(day_status))
+            .values('order_id', 'product_id', 'variant_key')
+            .annotate(
+                name=Max('product_name'), label=Max('variant_label'),
+                qty=Sum('quantity'), line_revenue=Sum('line_revenue'),
+            )
+            .order_by()
+        )
+        for group in groups:
+            add(
+                (*day_status[group['order_id']], group['product_id'], group['variant_key'] or ''),
+                group['qty'], group['line_revenue'], group['name'], group['label'],
+            )
+    DailySalesRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create(
+        [
+            DailySalesRollup(
+                date=day, status=status, product_key=product_key, variant_key=variant_key,
+                product_name=row['product_name'], variant_label=row['variant_label'],
+                order_count=row['order_count'], item_quantity=row['item_quantity'],
+                revenue=row['revenue'],
+            )
+            for (day, status, product_key, variant_key), row in rows.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0034_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_sales_rollup, migrations.RunPython.noop),
+    ]
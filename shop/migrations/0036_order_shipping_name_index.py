@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0035_build_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shipping_name'], name='shop_order_ship_name_idx'),
+        ),
+    ]
@@ -1,8 +1,13 @@
 from django.db import models # type: ignore
 from django.contrib.auth.models import User # type: ignore
+from django.core.exceptions import ValidationError  # type: ignore
+from django.utils import timezone  # type: ignore
 from django.utils.text import slugify   # type: ignore
 from decimal import Decimal
 
+class InvalidStatusTransition(ValidationError):
+    """Transisi status order yang tidak ada di tabel transisi."""
+
 # --- MASTER DATA PENGGUNA ---
 class Customer(models.Model):
     user         = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -15,8 +20,68 @@ class Customer(models.Model):
     province_id    = models.CharField(max_length=50, blank=True, null=True)
     city_id        = models.CharField(max_length=50, blank=True, null=True)
     subdistrict_id = models.CharField(max_length=50, blank=True, null=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['phone'], name='shop_customer_phone_idx'),
+        ]
     def __str__(self):
         return self.user.get_full_name() or self.user.username
+# --- MASTER DATA WILAYAH (SINKRON DARI RAJAONGKIR) ---
+# Primary key memakai ID dari RajaOngkir agar province_id / city_id /
+# subdistrict_id di Customer & Order tetap cocok.
+class Province(models.Model):
+    id = models.PositiveIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    synced_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        ordering = ('name',)
+    def __str__(self):
+        return self.name
+class City(models.Model):
+    id = models.PositiveIntegerField(primary_key=True)
+    province = models.ForeignKey(Province, on_delete=models.CASCADE, related_name='cities')
+    name = models.CharField(max_length=100)
+    synced_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        ordering = ('name',)
+        verbose_name_plural = 'cities'
+    def __str__(self):
+        return self.name
+class District(models.Model):
+    id = models.PositiveIntegerField(primary_key=True)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='districts')
+    name = models.CharField(max_length=100)
+    zip_code = models.CharField(max_length=10, blank=True)
+    synced_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        ordering = ('name',)
+    def __str__(self):
+        return self.name
+# --- MATRIX ONGKIR (hasil precompute_ongkir) ---
+class ShippingQuote(models.Model):
+    """
+    Quote ongkir yang sudah dihitung sebelumnya per (origin, kecamatan
+    tujuan, bucket berat, kurir). ``services`` berisi list layanan dalam
+    format RajaOngkir; ``fetched_at`` menentukan kesegaran data.
+    """
+    origin = models.PositiveIntegerField()
+    destination = models.PositiveIntegerField()
+    weight_bucket = models.PositiveIntegerField()
+    courier = models.CharField(max_length=20)
+    services = models.JSONField(default=list)
+    fetched_at = models.DateTimeField(default=timezone.now)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origin', 'destination', 'weight_bucket', 'courier'],
+                name='shop_quote_lookup_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fetched_at'], name='shop_quote_fetched_idx'),
+        ]
+    def __str__(self):
+        return f"{self.origin}->{self.destination} {self.weight_bucket}g {self.courier}"
 # --- MASTER DATA VARIASI (UKURAN & WARNA) ---
 class Color(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -127,6 +192,76 @@ class Order(models.Model):
         ('CANCELLED', 'Dibatalkan'),
     ]
     # =========================
+    # STATE MACHINE
+    # =========================
+    # Tabel transisi: status lama -> status baru yang diizinkan.
+    STATUS_TRANSITIONS = {
+        'PENDING': ('PAID', 'CANCELLED'),
+        'PAID': ('PROCESSING', 'SHIPPED', 'CANCELLED'),
+        'PROCESSING': ('SHIPPED', 'CANCELLED'),
+        'SHIPPED': ('COMPLETED',),
+        'COMPLETED': (),
+        'CANCELLED': (),
+    }
+    # Hanya order dengan status ini yang boleh dibuatkan resi/dikirim
+    SHIPPABLE_STATUSES = ('PAID', 'PROCESSING', 'SHIPPED')
+    # Status pengiriman hanya boleh maju (boleh melompati tahap),
+    # atau dibatalkan selama belum selesai.
+    SHIPPING_STATUS_TRANSITIONS = {
+        'PENDING': ('PAID', 'PROCESSING', 'SHIPPED', 'COMPLETED', 'CANCELLED'),
+        'PAID': ('PROCESSING', 'SHIPPED', 'COMPLETED', 'CANCELLED'),
+        'PROCESSING': ('SHIPPED', 'COMPLETED', 'CANCELLED'),
+        'SHIPPED': ('COMPLETED', 'CANCELLED'),
+        'COMPLETED': (),
+        'CANCELLED': (),
+    }
+    TRANSITION_TABLES = {
+        'status': STATUS_TRANSITIONS,
+        'shipping_status': SHIPPING_STATUS_TRANSITIONS,
+    }
+    @classmethod
+    def allowed_sources(cls, new_status, field='status'):
+        table = cls.TRANSITION_TABLES[field]
+        return [old for old, targets in table.items() if new_status in targets]
+    @classmethod
+    def is_valid_transition(cls, old_status, new_status, field='status'):
+        if old_status == new_status:
+            return True
+        return new_status in cls.TRANSITION_TABLES[field].get(old_status, ())
+    def can_transition_to(self, new_status, field='status'):
+        return self.is_valid_transition(self.get_original(field, getattr(self, field)), new_status, field)
+    def validate_transitions(self):
+        # Cek di memori terhadap nilai asli dari DB; tanpa query tambahan.
+        for field, table in self.TRANSITION_TABLES.items():
+            new_value = getattr(self, field)
+            if new_value not in table:
+                raise InvalidStatusTransition(
+                    f"{field} '{new_value}' tidak dikenal.", code='unknown_status'
+                )
+            if self._state.adding or not self.is_tracked(field):
+                continue
+            old_value = self.get_original(field)
+            if not self.is_valid_transition(old_value, new_value, field):
+                raise InvalidStatusTransition(
+                    f"Order #{self.pk}: {field} tidak bisa berubah dari {old_value} ke {new_value}.",
+                    code='invalid_transition',
+                )
+    def transition_to(self, new_status, actor=None, source='', field='status'):
+        """Set status baru setelah divalidasi; ``actor``/``source`` dicatat di log saat save."""
+        if not self.can_transition_to(new_status, field):
+            raise InvalidStatusTransition(
+                f"Order #{self.pk}: {field} tidak bisa berubah dari "
+                f"{getattr(self, field)} ke {new_status}.",
+                code='invalid_transition',
+            )
+        setattr(self, field, new_status)
+        self._transition_actor = actor
+        self._transition_source = source
+        return self
+    def clean(self):
+        super().clean()
+        self.validate_transitions()
+    # =========================
     # RELATION
     # =========================
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name='orders')
@@ -141,6 +276,7 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     shipped_at = models.DateTimeField(blank=True, null=True)
+    status_changed_at = models.DateTimeField(blank=True, null=True)
     # =========================
     # SHIPPING CUSTOMER DATA
     # =========================
@@ -152,6 +288,8 @@ class Order(models.Model):
     shipping_postal_code = models.CharField(max_length=10)
     destination_subdistrict_id = models.CharField(max_length=50,blank=True,null=True)
     total_weight = models.PositiveIntegerField(default=1000)
+    # rencana paket dari shop.parcels: [{"weight", "items": [{"key", "name", "quantity"}]}]
+    parcel_plan = models.JSONField(blank=True, null=True)
     # =========================
     # SHIPPING LOCATION
     # =========================
@@ -169,12 +307,98 @@ class Order(models.Model):
     # =========================
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
     shipment_id = models.CharField(max_length=150, blank=True, null=True)
+    # diisi oleh poller tracking (manage.py poll_tracking)
+    tracking_status = models.CharField(max_length=50, blank=True, null=True)
+    tracking_checked_at = models.DateTimeField(blank=True, null=True)
+    next_tracking_poll_at = models.DateTimeField(blank=True, null=True)
+    tracking_poll_interval = models.PositiveIntegerField(default=0, help_text="Detik")
     # =========================
     # PRICE
     # =========================
     shipping_cost = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
     total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_tracking_poll_at'], name='shop_order_tracking_poll_idx'),
+            # daftar order manajemen: keyset (created_at, id) + filter
+            models.Index(fields=['created_at', 'id'], name='shop_order_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='shop_order_status_created_idx'),
+            models.Index(fields=['courier_code', 'created_at'], name='shop_order_courier_idx'),
+            models.Index(fields=['shipping_city', 'created_at'], name='shop_order_city_idx'),
+            # riwayat order pelanggan
+            models.Index(fields=['customer', 'created_at'], name='shop_order_customer_idx'),
+            # pencarian admin persis per no. HP / awalan nama penerima
+            models.Index(fields=['shipping_phone'], name='shop_order_phone_idx'),
+            models.Index(fields=['shipping_name'], name='shop_order_ship_name_idx'),
+        ]
+    # =========================
+    # DIRTY FIELD TRACKING
+    # =========================
+    # Nilai asli field ini disimpan saat order dimuat dari DB, sehingga
+    # signal bisa tahu status lama tanpa SELECT tambahan.
+    TRACKED_FIELDS = ('status', 'shipping_status', 'tracking_number', 'total')
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+    def _snapshot_tracked_fields(self, fields=None):
+        if not hasattr(self, '_original_state'):
+            self._original_state = {}
+        deferred = self.get_deferred_fields()
+        for name in fields or self.TRACKED_FIELDS:
+            if name in self.TRACKED_FIELDS and name not in deferred:
+                self._original_state[name] = getattr(self, name)
+    def is_tracked(self, field):
+        return field in getattr(self, '_original_state', {})
+    def get_original(self, field, default=None):
+        return getattr(self, '_original_state', {}).get(field, default)
+    def has_changed(self, field):
+        if not self.is_tracked(field):
+            return self._state.adding
+        return self._original_state[field] != getattr(self, field)
+    def get_changed_fields(self):
+        return {
+            name: (self.get_original(name), getattr(self, name))
+            for name in self.TRACKED_FIELDS
+            if self.is_tracked(name) and self.has_changed(name)
+        }
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding:
+            self.validate_transitions()
+            self._pending_transitions = self._collect_transitions(update_fields)
+            if any(t['field'] == 'status' for t in self._pending_transitions):
+                self.status_changed_at = self._pending_transitions[0]['created_at']
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | {'status_changed_at'}
+        super().save(*args, **kwargs)
+        self._pending_transitions = []
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+    def _collect_transitions(self, update_fields=None):
+        now = timezone.now()
+        transitions = []
+        for field in self.TRANSITION_TABLES:
+            if update_fields is not None and field not in update_fields:
+                continue
+            if not self.is_tracked(field) or not self.has_changed(field):
+                continue
+            entered_at = (
+                self.status_changed_at or self.created_at
+                if field == 'status' else None
+            )
+            transitions.append({
+                'field': field,
+                'from_status': self.get_original(field),
+                'to_status': getattr(self, field),
+                'created_at': now,
+                'duration': now - entered_at if entered_at else None,
+            })
+        return transitions
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_tracked_fields(fields)
     # =========================
     # STRING
     # =========================
@@ -191,9 +415,33 @@ class OrderItem(models.Model):
     custom_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
     custom_image = models.ImageField(upload_to='custom_products/', blank=True, null=True)
     custom_notes = models.TextField(blank=True, null=True)
+    # =========================
+    # SNAPSHOT SAAT CHECKOUT
+    # =========================
+    # Disalin agar laporan/analitik tidak perlu JOIN ke Product dan tidak
+    # berubah ketika nama atau harga produk diganti belakangan.
+    product_name = models.CharField(max_length=200, blank=True)
+    variant_key = models.CharField(max_length=60, blank=True)
+    line_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    @staticmethod
+    def build_variant_key(product, variant=None, custom_variant=None):
+        """Kunci varian stabil: ``P<produk>``, ``P<produk>-V<varian>`` atau ``P<produk>-C<varian kustom>``."""
+        key = f"P{product.pk}"
+        if custom_variant is not None:
+            return f"{key}-C{custom_variant.pk}"
+        if variant is not None:
+            return f"{key}-V{variant.pk}"
+        return key
     @property
     def line_total(self):
         return (self.unit_price + self.custom_price) * self.quantity
+    def save(self, *args, **kwargs):
+        if not self.product_name:
+            self.product_name = self.product.name[:200]
+        if not self.variant_key:
+            self.variant_key = f"P{self.product_id}"
+        self.line_revenue = self.line_total
+        super().save(*args, **kwargs)
     @property
     def safe_image_url(self):
         if self.custom_image and hasattr(self.custom_image, 'url'):
@@ -208,8 +456,72 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True) 
     paid_at = models.DateTimeField(null=True, blank=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='shop_payment_status_idx'),
+            models.Index(fields=['external_id'], name='shop_payment_external_idx'),
+            models.Index(fields=['created_at'], name='shop_payment_created_idx'),
+        ]
     def __str__(self):
         return f"Payment for Order {self.order.id} - {self.status}" 
+class OrderStatusLog(models.Model):
+    """Log transisi status order (append-only)."""
+    FIELD_CHOICES = [
+        ('status', 'Status Order'),
+        ('shipping_status', 'Status Pengiriman'),
+    ]
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_logs')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES, default='status')
+    from_status = models.CharField(max_length=20, blank=True, null=True)
+    to_status = models.CharField(max_length=20)
+    # lama order berada di from_status sebelum transisi ini
+    duration = models.DurationField(blank=True, null=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=30, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    class Meta:
+        ordering = ('created_at', 'id')
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='shop_statuslog_order_idx'),
+            models.Index(fields=['field', 'from_status', 'created_at'], name='shop_statuslog_from_idx'),
+            models.Index(fields=['field', 'to_status', 'created_at'], name='shop_statuslog_to_idx'),
+        ]
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("OrderStatusLog bersifat append-only.")
+        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} → {self.to_status}"
+# --- ROLLUP PENJUALAN HARIAN (lihat shop/rollups.py) ---
+class DailySalesRollup(models.Model):
+    """
+    Ringkasan order per hari (tanggal lokal ``created_at``), status dan
+    varian produk. ``product_key`` 0 berisi total per order (jumlah order
+    dan ``Order.total``); baris lain berisi jumlah item dan pendapatan
+    baris untuk satu varian (``OrderItem.variant_key``) dari satu produk.
+    """
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    product_key = models.PositiveIntegerField(default=0)
+    product_name = models.CharField(max_length=200, blank=True)
+    variant_key = models.CharField(max_length=60, blank=True, default='')
+    variant_label = models.CharField(max_length=200, blank=True, default='')
+    order_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'status', 'product_key', 'variant_key'],
+                name='shop_rollup_day_variant_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product_key', 'date'], name='shop_rollup_product_idx'),
+        ]
+    def __str__(self):
+        return f"{self.date} {self.status} #{self.product_key}"
 # --- KERANJANG BELANJA ---
 class CartItem(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='cart_items')
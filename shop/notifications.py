@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings  # type: ignore
+from django.db import connections, transaction  # type: ignore
+from .models import Order
+from .signals import kirim_notifikasi_status
+from .utils import EmailDispatcher
+from .whatsapp import WhatsAppBatch
+# =========================================================
+# NOTIFIKASI MASSAL DI LUAR REQUEST
+# =========================================================
+# Update status massal bisa menyentuh puluhan order; mengirim email/WA
+# langsung di request berarti menunggu token bucket Fonnte (2 pesan/detik)
+# plus retry, melewati timeout worker. Setelah commit, id order diserahkan
+# ke satu worker thread; NOTIFICATION_ASYNC=False mengirim langsung
+# (dipakai test dan command).
+_executor = None
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notifikasi")
+    return _executor
+def kirim_notifikasi_massal(order_ids, status):
+    """
+    Kirim notifikasi ``status`` untuk ``order_ids`` dalam satu batch (satu
+    koneksi SMTP, pesan WA digabung per nomor). Order yang statusnya sudah
+    berubah lagi dilewati.
+    """
+    orders = (
+        Order.objects
+        .filter(id__in=order_ids, status=status)
+        .select_related("customer__user")
+    )
+    with EmailDispatcher(), WhatsAppBatch():
+        for order in orders:
+            kirim_notifikasi_status(order)
+def _jalankan_di_worker(order_ids, status):
+    try:
+        kirim_notifikasi_massal(order_ids, status)
+    except Exception as e:
+        print(f"❌ NOTIFIKASI MASSAL GAGAL: {e}")
+    finally:
+        # koneksi DB milik thread worker
+        connections.close_all()
+def antre_notifikasi_massal(order_ids, status):
+    """Jadwalkan notifikasi setelah transaksi yang sedang berjalan di-commit."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    def kirim():
+        if getattr(settings, "NOTIFICATION_ASYNC", True):
+            get_executor().submit(_jalankan_di_worker, order_ids, status)
+        else:
+            kirim_notifikasi_massal(order_ids, status)
+    transaction.on_commit(kirim, robust=True)
@@ -0,0 +1,129 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings  # type: ignore
+from django.db.models import Count  # type: ignore
+from django.utils import timezone  # type: ignore
+from .http_client import TokenBucket
+from .models import Order, ShippingQuote
+from .shipping import get_shipping_cost
+from .shipping_quotes import extract_services, get_weight_bucket, store_quote_entry
+
+logger = logging.getLogger(__name__)
+# field layanan yang disimpan di tabel (sisanya tidak dipakai checkout)
+SERVICE_FIELDS = ("service", "description", "cost", "etd")
+# =========================================================
+# TUJUAN & BERAT TERATAS
+# =========================================================
+def _history(days):
+    return (
+        Order.objects
+        .filter(created_at__gte=timezone.now() - timedelta(days=days))
+        .exclude(destination_subdistrict_id__isnull=True)
+        .exclude(destination_subdistrict_id="")
+    )
+def top_destinations(limit=300, days=180):
+    """Kecamatan tujuan dengan order terbanyak dalam ``days`` hari terakhir."""
+    rows = (
+        _history(days)
+        .values("destination_subdistrict_id")
+        .annotate(total=Count("id"))
+        .order_by("-total")[:limit]
+    )
+    return [
+        int(r["destination_subdistrict_id"]) for r in rows
+        if str(r["destination_subdistrict_id"]).isdigit()
+    ]
+def top_weight_buckets(limit=5, days=180, batch_size=2000):
+    """Bucket berat (lihat get_weight_bucket) yang paling sering dipesan."""
+    # dibaca per halaman keyset id: iterator() di mysqlclient tetap memuat
+    # seluruh hasil ke memori
+    history = _history(days).order_by("id").values_list("id", "total_weight")
+    counts = Counter()
+    last_id = 0
+    while True:
+        page = list(history.filter(id__gt=last_id)[:batch_size])
+        if not page:
+            break
+        counts.update(get_weight_bucket(weight) for _, weight in page)
+        last_id = page[-1][0]
+    return [bucket for bucket, _ in counts.most_common(limit)]
+# =========================================================
+# CRAWLER
+# =========================================================
+def compact_services(result):
+    return [
+        {field: service.get(field) for field in SERVICE_FIELDS}
+        for service in extract_services(result)
+    ]
+def precompute_matrix(destinations, weights, couriers=None, rate=None, concurrency=None,
+                    max_age=None, batch_size=200):
+    """
+    Hitung ongkir untuk setiap (tujuan, bucket berat, kurir) dan simpan ke
+    ShippingQuote. Kombinasi yang masih lebih segar dari ``max_age`` detik
+    dilewati. Request dibatasi token bucket ``rate`` per detik dengan
+    ``concurrency`` worker. Return ringkasan hitungan.
+    """
+    couriers = couriers or getattr(settings, "ONGKIR_COURIERS", ["jne", "jnt", "sicepat"])
+    rate = rate or getattr(settings, "ONGKIR_MATRIX_RATE", 5)
+    concurrency = concurrency or getattr(settings, "ONGKIR_MATRIX_CONCURRENCY", 4)
+    max_age = max_age if max_age is not None else getattr(settings, "ONGKIR_MATRIX_REFRESH", 60 * 60 * 24)
+    origin = int(settings.ORIGIN_SUBDISTRICT_ID)
+    buckets = sorted({get_weight_bucket(w) for w in weights})
+    couriers = [c.lower() for c in couriers]
+    fresh = set(
+        ShippingQuote.objects
+        .filter(
+            origin=origin,
+            destination__in=destinations,
+            weight_bucket__in=buckets,
+            courier__in=couriers,
+            fetched_at__gte=timezone.now() - timedelta(seconds=max_age),
+        )
+        .values_list("destination", "weight_bucket", "courier")
+    )
+    todo = [
+        (dest, bucket, courier)
+        for dest in destinations
+        for bucket in buckets
+        for courier in couriers
+        if (dest, bucket, courier) not in fresh
+    ]
+    limiter = TokenBucket(rate, capacity=rate)
+    def fetch(item):
+        dest, bucket, courier = item
+        limiter.acquire()
+        try:
+            result = get_shipping_cost(destination=dest, weight=bucket, courier=courier)
+        except Exception as e:
+            logger.warning("Ongkir %s/%s/%s gagal: %s", dest, bucket, courier, e)
+            return item, None
+        return item, result if result.get("success") else None
+    summary = {"total": len(todo) + len(fresh), "skipped": len(fresh), "stored": 0, "failed": 0}
+    pending = []
+    def flush():
+        ShippingQuote.objects.bulk_create(
+            pending,
+            update_conflicts=True,
+            unique_fields=["origin", "destination", "weight_bucket", "courier"],
+            update_fields=["services", "fetched_at"],
+        )
+        summary["stored"] += len(pending)
+        pending.clear()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ongkir-matrix") as pool:
+        for (dest, bucket, courier), result in pool.map(fetch, todo):
+            if result is None:
+                summary["failed"] += 1
+                continue
+            services = compact_services(result)
+            pending.append(ShippingQuote(
+                origin=origin, destination=dest, weight_bucket=bucket,
+                courier=courier, services=services, fetched_at=timezone.now(),
+            ))
+            store_quote_entry(dest, bucket, courier, {"success": True, "data": {"data": services}})
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+    return summary
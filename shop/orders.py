@@ -0,0 +1,132 @@
+from django.db import transaction  # type: ignore
+from django.utils import timezone  # type: ignore
+from .models import Order, OrderStatusLog
+from .notifications import antre_notifikasi_massal
+from .rollups import queue_rollup_delta, status_change_delta
+from .shipping import create_shipments
+# =========================================================
+# UPDATE STATUS MASSAL
+# =========================================================
+def bulk_ubah_status(order_ids, new_status, actor=None, source="bulk"):
+    """
+    Ubah status banyak order sekaligus dengan satu UPDATE.
+
+    Order yang transisinya tidak diizinkan dilewati. Karena ``update()``
+    tidak memicu signal, log transisi ditulis dengan satu bulk_create dan
+    notifikasi diantrekan ke worker setelah commit (lihat notifications).
+    Return ``(updated, skipped)`` berupa list order.
+    """
+    if new_status not in dict(Order.STATUS_CHOICES):
+        raise ValueError(f"Status tidak dikenal: {new_status}")
+    orders = list(
+        Order.objects
+        .filter(id__in=order_ids)
+        .select_related("customer__user")
+    )
+    candidates = [
+        o for o in orders
+        if o.status != new_status and o.can_transition_to(new_status)
+    ]
+    skipped = [o for o in orders if o not in candidates]
+    if not candidates:
+        return [], skipped
+    now = timezone.now()
+    with transaction.atomic():
+        # kunci order yang masih di status asal yang sah; order yang diubah
+        # proses lain sejak dibaca (termasuk ke status tujuan yang sama)
+        # tidak ikut, jadi tidak ada log/notifikasi ganda
+        locked = {
+            row["id"]: row
+            for row in (
+                Order.objects
+                .select_for_update()
+                .filter(
+                    id__in=[o.id for o in candidates],
+                    status__in=Order.allowed_sources(new_status),
+                )
+                .values("id", "status", "status_changed_at", "created_at", "total")
+            )
+        }
+        valid = [o for o in candidates if o.id in locked]
+        skipped += [o for o in candidates if o.id not in locked]
+        if not valid:
+            return [], skipped
+        Order.objects.filter(id__in=list(locked)).update(
+            status=new_status, status_changed_at=now, updated_at=now
+        )
+        OrderStatusLog.objects.bulk_create([
+            OrderStatusLog(
+                order=order,
+                field="status",
+                from_status=locked[order.id]["status"],
+                to_status=new_status,
+                duration=now - (locked[order.id]["status_changed_at"] or order.created_at),
+                actor=actor,
+                source=source,
+                created_at=now,
+            )
+            for order in valid
+        ])
+        queue_rollup_delta(status_change_delta(
+            {
+                pk: (timezone.localdate(row["created_at"]), row["status"], row["total"])
+                for pk, row in locked.items()
+            },
+            new_status,
+        ))
+        antre_notifikasi_massal([order.id for order in valid], new_status)
+    for order in valid:
+        order.status = new_status
+        order.status_changed_at = now
+        order.updated_at = now
+        order._snapshot_tracked_fields(["status"])
+    return valid, skipped
+# =========================================================
+# BUAT RESI MASSAL
+# =========================================================
+def bulk_buat_resi(orders, actor=None, source="bulk"):
+    """
+    Buat AWB untuk banyak order dengan satu panggilan ``create_shipments``
+    provider, lalu simpan resi + shipping_status dengan satu bulk_update.
+
+    Order yang sudah punya resi atau tidak boleh pindah ke PROCESSING
+    dilewati. Return ``(created, failed)`` berupa list order.
+    """
+    orders = [
+        o for o in orders
+        if not o.tracking_number
+        and o.can_transition_to("PROCESSING", field="shipping_status")
+    ]
+    if not orders:
+        return [], []
+    results = create_shipments(orders)
+    now = timezone.now()
+    created, failed, logs = [], [], []
+    for order, result in zip(orders, results):
+        if not (result.get("success") and result.get("awb")):
+            failed.append(order)
+            continue
+        logs.append(OrderStatusLog(
+            order=order,
+            field="shipping_status",
+            from_status=order.shipping_status,
+            to_status="PROCESSING",
+            actor=actor,
+            source=source,
+            created_at=now,
+        ))
+        order.tracking_number = result["awb"]
+        order.shipment_id = result.get("shipment_id") or order.shipment_id
+        order.shipping_status = "PROCESSING"
+        order.updated_at = now
+        created.append(order)
+    with transaction.atomic():
+        Order.objects.bulk_update(
+            created,
+            ["tracking_number", "shipment_id", "shipping_status", "updated_at"],
+            batch_size=500,
+        )
+        OrderStatusLog.objects.bulk_create(logs)
+    for order in created:
+        order._snapshot_tracked_fields(["shipping_status", "tracking_number"])
+    return created, failed
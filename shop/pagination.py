@@ -0,0 +1,110 @@
+import base64
+from django.core.paginator import Paginator  # type: ignore
+from django.db import connections  # type: ignore
+from django.db.models import Q  # type: ignore
+from django.utils.dateparse import parse_datetime  # type: ignore
+from django.utils.functional import cached_property  # type: ignore
+# =========================================================
+# KEYSET (CURSOR) PAGINATION
+# =========================================================
+# Halaman diambil dengan WHERE (created_at, id) < cursor alih-alih OFFSET,
+# jadi biaya satu halaman tidak bergantung pada posisi halaman maupun
+# ukuran tabel (memakai index yang diawali/diakhiri created_at, id).
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` atau ``None`` jika cursor tidak valid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        value = parse_datetime(created_at)
+        return (value, int(pk)) if value else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+class KeysetPage:
+    """
+    Satu halaman dari ``queryset`` urut ``-created_at, -id``.
+
+    ``after``: cursor item terakhir halaman sebelumnya (halaman berikut);
+    ``before``: cursor item pertama halaman berikutnya (kembali ke halaman
+    sebelumnya).
+    """
+    def __init__(self, queryset, after=None, before=None, size=50):
+        self.size = size
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before)
+        if before_key:
+            created_at, pk = before_key
+            rows = list(
+                queryset
+                .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+                .order_by("created_at", "id")[:size + 1]
+            )
+            more_before = len(rows) > size
+            self.items = rows[:size][::-1]
+            self.has_previous, self.has_next = more_before, True
+        else:
+            if after_key:
+                created_at, pk = after_key
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            rows = list(queryset.order_by("-created_at", "-id")[:size + 1])
+            self.items = rows[:size]
+            self.has_next = len(rows) > size
+            self.has_previous = after_key is not None
+    def __iter__(self):
+        return iter(self.items)
+    def __len__(self):
+        return len(self.items)
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            last = self.items[-1]
+            return encode_cursor(last.created_at, last.pk)
+        return None
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.items:
+            first = self.items[0]
+            return encode_cursor(first.created_at, first.pk)
+        return None
+# =========================================================
+# ESTIMASI JUMLAH BARIS (ADMIN)
+# =========================================================
+# COUNT(*) tanpa filter membaca seluruh tabel/index. Untuk tabel besar
+# jumlah baris diambil dari statistik database (cukup untuk paginasi admin).
+def estimated_row_count(model, using="default"):
+    """Estimasi jumlah baris tabel ``model`` atau None jika backend tidak mendukung."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "mysql":
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator yang memakai estimasi untuk queryset tanpa filter bila tabel
+    sudah besar (>= ``exact_below`` baris); selain itu COUNT(*) biasa.
+    """
+    exact_below = 10000
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, "query") and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import math
+import time
+from concurrent.futures import wait
+from decimal import Decimal, InvalidOperation
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from .shipping_quotes import (
+    _submit_quote, extract_services, get_cached_quote, get_weight_bucket,
+)
+# =========================================================
+# PEMECAHAN PAKET (MULTI-PARCEL)
+# =========================================================
+# Kurir membatasi berat per paket dan tarifnya naik per bucket berat, jadi
+# order besar dipecah menjadi beberapa paket. Kandidat pembagian dinilai
+# dengan quote dari cache/tabel matrix; pencarian berhenti saat
+# ONGKIR_SPLIT_BUDGET detik habis dan memakai hasil terbaik sejauh itu.
+DEFAULT_PARCEL_MAX_WEIGHT = 30000
+def parcel_max_weight(courier):
+    limits = getattr(settings, "ONGKIR_PARCEL_MAX_WEIGHT", {})
+    return int(limits.get(str(courier).lower(), limits.get("default", DEFAULT_PARCEL_MAX_WEIGHT)))
+def needs_split(total_weight, courier):
+    return int(total_weight or 0) > parcel_max_weight(courier)
+def cart_parcel_lines(cart_items):
+    """Baris keranjang -> ``[{"key", "name", "weight", "quantity"}]`` (berat per unit, gram)."""
+    lines = []
+    for item in cart_items:
+        variant_id = item.custom_variant_id if item.is_custom else item.variant_id
+        lines.append({
+            "key": f"{item.product_id}:{'c' if item.is_custom else 'v'}{variant_id or 0}",
+            "name": item.product.name,
+            "weight": getattr(item.product, "weight", 1000) or 1000,
+            "quantity": item.quantity,
+        })
+    return lines
+# =========================
+# KANDIDAT PEMBAGIAN
+# =========================
+def _units(lines):
+    """Unit identik digabung: ``[(key, berat, jumlah)]``, terberat dulu."""
+    units = [
+        (line["key"], int(line["weight"]), int(line["quantity"]))
+        for line in lines
+        if int(line["quantity"]) > 0
+    ]
+    units.sort(key=lambda u: u[1], reverse=True)
+    return units
+# Paket: [berat total, {key: jumlah}]
+def _add(parcel, key, weight, count):
+    parcel[0] += weight * count
+    parcel[1][key] = parcel[1].get(key, 0) + count
+def _spread(loads, weight, count):
+    """
+    Jumlah unit per paket agar paket terberat seringan mungkin, sama seperti
+    menaruh unit satu per satu ke paket paling ringan, tapi dihitung langsung.
+    """
+    def fits(level):
+        return [max(0, (level - load) // weight) for load in loads]
+    low = min(loads)
+    high = max(loads) + weight * -(-count // len(loads))
+    while low < high:
+        middle = (low + high) // 2
+        if sum(fits(middle)) >= count:
+            high = middle
+        else:
+            low = middle + 1
+    counts = fits(low - 1)
+    remaining = count - sum(counts)
+    for i, n in enumerate(fits(low)):
+        if remaining and n > counts[i]:
+            counts[i] += 1
+            remaining -= 1
+    return counts
+def _balanced(units, count, capacity):
+    """Unit terberat dulu ke paket paling ringan (LPT); None jika tidak muat."""
+    parcels = [[0, {}] for _ in range(count)]
+    for key, weight, quantity in units:
+        spread = _spread([p[0] for p in parcels], weight, quantity)
+        for parcel, n in zip(parcels, spread):
+            if not n:
+                continue
+            if parcel[0] + weight * n > capacity:
+                return None
+            _add(parcel, key, weight, n)
+    return parcels
+def _first_fit(units, capacity, deadline=None):
+    """
+    First-fit decreasing: penuhi paket sampai ``capacity`` sebelum membuka
+    paket baru. None jika ``deadline`` (monotonic) lewat di tengah jalan.
+    """
+    parcels = []
+    for key, weight, quantity in units:
+        for parcel in parcels:
+            if not quantity:
+                break
+            n = min(quantity, (capacity - parcel[0]) // weight)
+            if n > 0:
+                _add(parcel, key, weight, n)
+                quantity -= n
+        per_parcel = capacity // weight
+        while quantity:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            parcel = [0, {}]
+            _add(parcel, key, weight, min(quantity, per_parcel))
+            quantity -= parcel[1][key]
+            parcels.append(parcel)
+    return parcels
+def candidate_splits(units, max_weight, extra_parcels=2, deadline=None):
+    total = sum(weight * quantity for _, weight, quantity in units)
+    minimum = max(1, math.ceil(total / max_weight))
+    for count in range(minimum, minimum + extra_parcels + 1):
+        yield _balanced(units, count, max_weight)
+    # kapasitas diturunkan per bucket agar paket pas di batas tarif
+    step = getattr(settings, "ONGKIR_WEIGHT_BUCKET", 1000)
+    capacity = max_weight
+    heaviest = units[0][1] if units else 0
+    while capacity >= max(step, heaviest):
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        yield _first_fit(units, capacity, deadline)
+        capacity -= step
+# =========================
+# QUOTE PER BUCKET
+# =========================
+def _service_map(result):
+    return {
+        str(s.get("service")): s
+        for s in extract_services(result or {})
+        if s.get("cost") is not None
+    }
+def _quote(destination, bucket, courier, deadline):
+    result = get_cached_quote(destination, bucket, courier)
+    if result is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        future = _submit_quote(destination, bucket, courier)
+        done, _ = wait([future], timeout=remaining)
+        if not done:
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            return None
+        if not result.get("success"):
+            return {}
+    return _service_map(result)
+# =========================
+# MAIN
+# =========================
+def plan_shipping(lines, destination, courier, budget=None):
+    """
+    Cari pembagian paket termurah per layanan kurir.
+
+    Return ``{"success", "timed_out", "evaluated", "data"}`` dengan ``data``
+    berupa list layanan (format RajaOngkir) ditambah ``parcels``:
+    ``[{"weight", "items": [{"key", "name", "quantity"}]}]``.
+    """
+    budget = budget if budget is not None else getattr(settings, "ONGKIR_SPLIT_BUDGET", 0.5)
+    deadline = time.monotonic() + budget
+    max_weight = parcel_max_weight(courier)
+    units = _units(lines)
+    if not units:
+        return {"success": False, "message": "Keranjang kosong."}
+    if units[0][1] > max_weight:
+        return {"success": False, "message": "Ada barang yang melebihi batas berat per paket kurir."}
+    quotes = {}
+    best = {}
+    seen = set()
+    evaluated = 0
+    timed_out = False
+    extra = getattr(settings, "ONGKIR_SPLIT_EXTRA_PARCELS", 2)
+    for parcels in candidate_splits(units, max_weight, extra, deadline):
+        if time.monotonic() > deadline:
+            timed_out = True
+            break
+        if parcels is None:
+            continue
+        buckets = tuple(sorted(get_weight_bucket(weight) for weight, _ in parcels))
+        if buckets in seen:
+            continue
+        seen.add(buckets)
+        for bucket in set(buckets):
+            if bucket not in quotes:
+                quotes[bucket] = _quote(destination, bucket, courier, deadline)
+        if any(quotes[b] is None for b in buckets):
+            timed_out = True
+            continue
+        evaluated += 1
+        common = set.intersection(*(set(quotes[b]) for b in buckets))
+        for service in common:
+            cost = sum(int(quotes[b][service]["cost"]) for b in buckets)
+            if service not in best or cost < best[service][0]:
+                best[service] = (cost, parcels)
+    # candidate_splits berhenti sendiri begitu deadline lewat
+    timed_out = timed_out or time.monotonic() > deadline
+    data = []
+    for service, (cost, parcels) in best.items():
+        info = next(quotes[b][service] for b in quotes if quotes[b] and service in quotes[b])
+        data.append({
+            "service": service,
+            "description": info.get("description", ""),
+            "etd": info.get("etd", ""),
+            "cost": cost,
+            "parcels": _describe(parcels, lines),
+        })
+    data.sort(key=lambda s: s["cost"])
+    return {
+        "success": bool(data),
+        "timed_out": timed_out,
+        "evaluated": evaluated,
+        "data": data,
+    }
+def _describe(parcels, lines):
+    names = {line["key"]: line["name"] for line in lines}
+    described = []
+    for weight, counts in sorted(parcels, key=lambda p: p[0], reverse=True):
+        described.append({
+            "weight": weight,
+            "items": [
+                {"key": key, "name": names.get(key, key), "quantity": qty}
+                for key, qty in counts.items()
+            ],
+        })
+    return described
+# =========================
+# CACHE RENCANA (API -> CHECKOUT)
+# =========================
+def _plan_cache_key(lines, destination, courier):
+    signature = json.dumps(
+        sorted((line["key"], line["weight"], line["quantity"]) for line in lines)
+    )
+    digest = hashlib.sha1(signature.encode()).hexdigest()
+    return f"ongkir:split:{int(destination)}:{str(courier).lower()}:{digest}"
+def get_split_quote(lines, destination, courier):
+    """``plan_shipping`` yang hasilnya disimpan agar checkout memverifikasi rencana yang sama."""
+    key = _plan_cache_key(lines, destination, courier)
+    plan = cache.get(key)
+    if plan is None:
+        plan = plan_shipping(lines, destination, courier)
+        if plan.get("success"):
+            cache.set(key, plan, timeout=getattr(settings, "ONGKIR_CACHE_TTL", 60 * 60 * 6))
+    return plan
+def single_parcel_plan(lines, total_weight):
+    return [{
+        "weight": total_weight,
+        "items": [
+            {"key": line["key"], "name": line["name"], "quantity": line["quantity"]}
+            for line in lines
+        ],
+    }]
+def verify_split_shipping_cost(lines, destination, courier, service, posted_cost):
+    """Versi multi-parcel ``verify_shipping_cost``; menambah ``parcels`` pada hasil sukses."""
+    try:
+        posted = Decimal(str(posted_cost).replace(",", ""))
+    except (InvalidOperation, ValueError):
+        return {"success": False, "message": "Ongkir tidak valid."}
+    plan = get_split_quote(lines, destination, courier)
+    if not plan.get("success"):
+        return {
+            "success": False,
+            "message": plan.get("message") or "Ongkir tidak dapat diverifikasi, silakan coba lagi.",
+        }
+    match = next((s for s in plan["data"] if s["service"] == str(service)), None)
+    if match is None:
+        return {"success": False, "message": "Layanan kurir tidak tersedia, silakan pilih ulang."}
+    cost = Decimal(match["cost"])
+    if cost != posted:
+        return {
+            "success": False,
+            "message": "Ongkir sudah berubah, silakan pilih ulang layanan pengiriman.",
+            "cost": cost,
+        }
+    return {"success": True, "cost": cost, "etd": match["etd"], "parcels": match["parcels"]}
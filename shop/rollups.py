@@ -0,0 +1,522 @@
+import time
+import weakref
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.db import IntegrityError, transaction  # type: ignore
+from django.db.models import Count, DateField, F, Max, Q, Sum  # type: ignore
+from django.db.models.functions import Trunc  # type: ignore
+from django.utils import timezone  # type: ignore
+from .date_ranges import day_bounds
+from .models import DailySalesRollup, Order, OrderItem
+# =========================================================
+# ROLLUP PENJUALAN HARIAN
+# =========================================================
+# Laporan & dashboard membaca DailySalesRollup untuk hari yang sudah
+# lewat dan hanya menghitung order mentah untuk hari ini. Order/item yang
+# dibuat, berubah status/total atau dihapus menambah delta F() ke baris
+# (tanggal, status, produk, varian) yang terkena setelah commit; hitung
+# ulang satu hari penuh hanya dipakai backfill_sales_rollup.
+VALID_REVENUE_STATUSES = ["PAID", "PROCESSING", "SHIPPED", "COMPLETED"]
+def order_day(order):
+    return timezone.localdate(order.created_at)
+# =========================
+# AGREGASI MENTAH
+# =========================
+def aggregate_orders(start, end):
+    """
+    Agregasi order dengan ``start <= created_at < end``.
+    Return ``(order_rows, product_rows)`` berupa dict per status /
+    (status, produk, varian). Item dibaca dari kolom snapshot OrderItem,
+    tanpa JOIN ke Product.
+    """
+    return order_rows(start, end), item_rows(
+        OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+    )
+def order_rows(start, end):
+    """Jumlah order dan total per status untuk ``start <= created_at < end``."""
+    return {
+        row["status"]: row
+        for row in (
+            Order.objects
+            .filter(created_at__gte=start, created_at__lt=end)
+            .values("status")
+            .annotate(order_count=Count("id"), revenue=Sum("total"))
+        )
+    }
+def item_rows(items):
+    """Agregasi ``items`` per (status, produk, varian) dari kolom snapshot."""
+    return {
+        (row["order__status"], row["product_id"], row["variant_key"]): row
+        for row in (
+            items
+            .values("order__status", "product_id", "variant_key")
+            .annotate(
+                product_name=Max("product_name"),
+                variant_label=Max("variant_label"),
+                order_count=Count("order_id", distinct=True),
+                item_quantity=Sum("quantity"),
+                revenue=Sum("line_revenue"),
+            )
+        )
+    }
+def rebuild_rollup_days(days):
+    """Hitung ulang rollup untuk setiap tanggal di ``days`` (backfill)."""
+    days = sorted(set(days))
+    for day in days:
+        order_rows, product_rows = aggregate_orders(*day_bounds(day))
+        rows = [
+            DailySalesRollup(
+                date=day, status=status, product_key=0,
+                order_count=row["order_count"], revenue=row["revenue"] or 0,
+            )
+            for status, row in order_rows.items()
+        ] + [
+            DailySalesRollup(
+                date=day, status=status, product_key=product_id,
+                product_name=(row["product_name"] or "")[:200],
+                variant_key=row["variant_key"], variant_label=(row["variant_label"] or "")[:200],
+                order_count=row["order_count"], item_quantity=row["item_quantity"] or 0,
+                revenue=row["revenue"] or 0,
+            )
+            for (status, product_id, _variant), row in product_rows.items()
+        ]
+        with transaction.atomic():
+            DailySalesRollup.objects.filter(date=day).delete()
+            DailySalesRollup.objects.bulk_create(rows)
+    invalidate_rollup_cache(days)
+def invalidate_rollup_cache(days, series_days=None):
+    """
+    ``series_days``: tanggal yang angka deret omzetnya berubah (default
+    semua ``days``). Deret omzet hanya meng-cache hari lalu (hari ini
+    dihitung langsung), jadi versi baru hanya perlu bila ada hari lalu
+    di antaranya.
+    """
+    cache.delete(DASHBOARD_CACHE_KEY)
+    today = timezone.localdate()
+    if any(day < today for day in (days if series_days is None else series_days)):
+        cache.set(ROLLUP_VERSION_KEY, time.time_ns(), timeout=None)
+# =========================
+# DELTA INKREMENTAL
+# =========================
+def order_item_groups(order_ids):
+    """Item per (order, produk, varian) dari kolom snapshot, untuk delta rollup."""
+    return (
+        OrderItem.objects
+        .filter(order_id__in=list(order_ids))
+        .values("order_id", "product_id", "variant_key")
+        .annotate(
+            product_name=Max("product_name"),
+            variant_label=Max("variant_label"),
+            qty=Sum("quantity"),
+            revenue=Sum("line_revenue"),
+        )
+    )
+class RollupDelta:
+    """
+    Perubahan rollup per (tanggal, status, produk, varian): jumlah order,
+    jumlah item dan pendapatan. ``apply`` menambahkannya dengan UPDATE F()
+    dan membuat baris yang belum ada.
+    """
+    def __init__(self):
+        self.rows = {}
+        # order yang pindah status: baris item dibaca saat apply (setelah
+        # commit), jadi save status tetap satu UPDATE tanpa SELECT item
+        self.moves = {}
+        self.applied = False
+    def add(self, day, status, product_key=0, variant_key="", orders=0, quantity=0,
+            revenue=0, product_name="", variant_label=""):
+        row = self.rows.setdefault((day, status, product_key, variant_key or ""), {
+            "order_count": 0,
+            "item_quantity": 0,
+            "revenue": Decimal("0"),
+            "product_name": "",
+            "variant_label": "",
+        })
+        row["order_count"] += orders
+        row["item_quantity"] += quantity
+        row["revenue"] += revenue or 0
+        row["product_name"] = row["product_name"] or (product_name or "")[:200]
+        row["variant_label"] = row["variant_label"] or (variant_label or "")[:200]
+    def add_order(self, day, status, total, sign=1):
+        self.add(day, status, orders=sign, revenue=sign * (total or 0))
+    def add_items(self, day, status, groups, sign=1):
+        for group in groups:
+            self.add(
+                day, status, group["product_id"], group["variant_key"],
+                orders=sign,
+                quantity=sign * (group["qty"] or 0),
+                revenue=sign * (group["revenue"] or 0),
+                product_name=group["product_name"],
+                variant_label=group["variant_label"],
+            )
+    def move_items(self, order_id, day, old_status, new_status):
+        if order_id in self.moves:
+            day, old_status, _ = self.moves[order_id]
+        self.moves[order_id] = (day, old_status, new_status)
+    def merge(self, other):
+        for order_id, (day, old_status, new_status) in other.moves.items():
+            self.move_items(order_id, day, old_status, new_status)
+        for key, row in other.rows.items():
+            self.add(
+                *key, orders=row["order_count"], quantity=row["item_quantity"],
+                revenue=row["revenue"], product_name=row["product_name"],
+                variant_label=row["variant_label"],
+            )
+    def apply(self):
+        self.applied = True
+        for group in order_item_groups(self.moves) if self.moves else ():
+            day, old_status, new_status = self.moves[group["order_id"]]
+            if old_status != new_status:
+                self.add_items(day, old_status, [group], sign=-1)
+                self.add_items(day, new_status, [group])
+        changed = {
+            key: row for key, row in self.rows.items()
+            if row["order_count"] or row["item_quantity"] or row["revenue"]
+        }
+        if not changed:
+            return
+        now = timezone.now()
+        with transaction.atomic():
+            for (day, status, product_key, variant_key), row in changed.items():
+                lookup = {
+                    "date": day, "status": status,
+                    "product_key": product_key, "variant_key": variant_key,
+                }
+                def add_to_row():
+                    return DailySalesRollup.objects.filter(**lookup).update(
+                        order_count=F("order_count") + row["order_count"],
+                        item_quantity=F("item_quantity") + row["item_quantity"],
+                        revenue=F("revenue") + row["revenue"],
+                        updated_at=now,
+                    )
+                if not add_to_row():
+                    try:
+                        with transaction.atomic():
+                            DailySalesRollup.objects.create(
+                                **lookup,
+                                product_name=row["product_name"],
+                                variant_label=row["variant_label"],
+                                # kolom unsigned; baris baru tidak bisa negatif
+                                order_count=max(row["order_count"], 0),
+                                item_quantity=max(row["item_quantity"], 0),
+                                revenue=row["revenue"],
+                            )
+                    except IntegrityError:
+                        # transaksi lain membuat baris yang sama di antara
+                        # UPDATE dan INSERT: tambahkan ke baris itu
+                        add_to_row()
+                elif row["order_count"] < 0:
+                    DailySalesRollup.objects.filter(**lookup, order_count=0).delete()
+        # deret omzet hanya membaca baris tingkat order berstatus omzet:
+        # pindah antar status omzet (PAID -> PROCESSING) saling meniadakan
+        series = {}
+        for (day, status, product_key, _variant), row in changed.items():
+            if product_key == 0 and status in VALID_REVENUE_STATUSES:
+                net = series.setdefault(day, [0, Decimal("0")])
+                net[0] += row["order_count"]
+                net[1] += row["revenue"]
+        invalidate_rollup_cache(
+            {key[0] for key in changed},
+            series_days={day for day, (orders, revenue) in series.items() if orders or revenue},
+        )
+def status_change_delta(changes, new_status):
+    """
+    Delta untuk order yang pindah ke ``new_status``. ``changes``: dict
+    ``order_id -> (tanggal, status lama, total)``.
+    """
+    delta = RollupDelta()
+    for order_id, (day, old_status, total) in changes.items():
+        delta.add_order(day, old_status, total, sign=-1)
+        delta.add_order(day, new_status, total)
+        delta.move_items(order_id, day, old_status, new_status)
+    return delta
+# Delta yang menunggu commit, satu per koneksi (koneksi Django per thread).
+# Referensi kuat satu-satunya ada di callback on_commit: bila transaksi
+# di-rollback Django membuang callback itu, delta ikut hilang dan
+# transaksi berikutnya mulai dengan delta baru.
+_pending_deltas = weakref.WeakValueDictionary()
+def queue_rollup_delta(delta):
+    """
+    Terapkan ``delta`` setelah transaksi berjalan di-commit (on_commit
+    robust: gagal memperbarui rollup tidak menggagalkan order yang sudah
+    tersimpan). Semua delta dalam satu transaksi digabung ke satu delta
+    yang didaftarkan sekali, sehingga satu checkout hanya menulis tiap
+    baris rollup sekali.
+    """
+    if not delta.rows and not delta.moves:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        delta.apply()
+        return
+    pending = _pending_deltas.get(connection)
+    if pending is not None and not pending.applied:
+        pending.merge(delta)
+        return
+    _pending_deltas[connection] = delta
+    transaction.on_commit(delta.apply, robust=True)
+# =========================
+# BACA UNTUK LAPORAN
+# =========================
+def status_totals(start_day=None, end_day=None):
+    """
+    ``{status: {"count", "revenue"}}`` order ``start_day`` s/d ``end_day``
+    (inklusif; None = tanpa batas). Hari sebelum hari ini dibaca dari
+    rollup tingkat order, hari ini dari order mentah; tanpa baris produk.
+    """
+    today = timezone.localdate()
+    end_day = min(end_day or today, today)
+    per_status = {}
+    def add(status, count, revenue):
+        entry = per_status.setdefault(status, {"count": 0, "revenue": Decimal("0")})
+        entry["count"] += count or 0
+        entry["revenue"] += revenue or 0
+    if start_day is None or start_day < today:
+        rollups = DailySalesRollup.objects.filter(
+            product_key=0, date__lt=min(end_day + timedelta(days=1), today),
+        )
+        if start_day:
+            rollups = rollups.filter(date__gte=start_day)
+        for row in rollups.values("status").annotate(count=Sum("order_count"), total=Sum("revenue")):
+            add(row["status"], row["count"], row["total"])
+    if end_day >= today and (start_day is None or start_day <= today):
+        for status, row in order_rows(*day_bounds(today)).items():
+            add(status, row["order_count"], row["revenue"])
+    return per_status
+def sales_summary(start_day=None, end_day=None, top=5):
+    """
+    Ringkasan penjualan ``start_day`` s/d ``end_day`` (inklusif; None = tanpa batas):
+    ``status_totals`` ditambah produk terlaris.
+    """
+    per_status = status_totals(start_day, end_day)
+    revenue_count = sum(per_status.get(s, {}).get("count", 0) for s in VALID_REVENUE_STATUSES)
+    revenue = sum(
+        (per_status.get(s, {}).get("revenue", Decimal("0")) for s in VALID_REVENUE_STATUSES),
+        Decimal("0"),
+    )
+    return {
+        "total_orders": sum(v["count"] for v in per_status.values()),
+        "total_revenue": revenue,
+        "paid_orders_count": revenue_count,
+        "avg_order_value": revenue / revenue_count if revenue_count else 0,
+        "by_status": [
+            {"status": status, "count": v["count"]}
+            for status, v in sorted(per_status.items()) if v["count"]
+        ],
+        "top_products": product_analytics(start_day, end_day, top=top),
+    }
+# =========================
+# ANALITIK PRODUK / VARIAN
+# =========================
+ANALYTICS_GROUPS = ("product", "variant")
+ANALYTICS_SORTS = {"units": "qty", "revenue": "revenue"}
+def product_analytics(start_day=None, end_day=None, by="product", sort="units", top=20):
+    """
+    Top-N produk (``by="product"``) atau varian (``by="variant"``) dari
+    order berstatus valid, urut ``units`` atau ``revenue``.
+    Hari lalu dibaca dari rollup, hari ini dari kolom snapshot OrderItem.
+    """
+    today = timezone.localdate()
+    end_day = min(end_day or today, today)
+    per_variant = by == "variant"
+    rows = {}
+    def add(product_id, row):
+        key = (product_id, row["variant_key"] if per_variant else "")
+        entry = rows.setdefault(key, {
+            "product_id": product_id,
+            "product_name": row["product_name"],
+            "variant_key": key[1],
+            "variant_label": row["variant_label"] if per_variant else "",
+            "qty": 0,
+            "revenue": Decimal("0"),
+        })
+        entry["qty"] += row["qty"] or 0
+        entry["revenue"] += row["revenue"] or 0
+    summary_fields = {
+        "product_name": Max("product_name"),
+        "variant_label": Max("variant_label"),
+    }
+    if start_day is None or start_day < today:
+        rollups = DailySalesRollup.objects.filter(
+            status__in=VALID_REVENUE_STATUSES,
+            product_key__gt=0,
+            date__lt=min(end_day + timedelta(days=1), today),
+        )
+        if start_day:
+            rollups = rollups.filter(date__gte=start_day)
+        group = ["product_key", "variant_key"] if per_variant else ["product_key"]
+        for row in rollups.values(*group).annotate(
+            qty=Sum("item_quantity"), revenue=Sum("revenue"), **summary_fields,
+        ):
+            row.setdefault("variant_key", "")
+            add(row["product_key"], row)
+    if end_day >= today and (start_day is None or start_day <= today):
+        start, end = day_bounds(today)
+        items = OrderItem.objects.filter(
+            order__created_at__gte=start,
+            order__created_at__lt=end,
+            order__status__in=VALID_REVENUE_STATUSES,
+        )
+        group = ["product_id", "variant_key"] if per_variant else ["product_id"]
+        for row in items.values(*group).annotate(
+            qty=Sum("quantity"), revenue=Sum("line_revenue"), **summary_fields,
+        ):
+            row.setdefault("variant_key", "")
+            add(row["product_id"], row)
+    metric = ANALYTICS_SORTS.get(sort, "qty")
+    ranked = sorted(rows.values(), key=lambda r: (-r[metric], r["product_name"], r["variant_key"]))
+    return ranked[:top] if top else ranked
+# =========================
+# DASHBOARD
+# =========================
+DASHBOARD_CACHE_KEY = "dashboard:stats"
+def dashboard_stats():
+    """
+    Statistik dashboard dalam satu query agregasi bersyarat atas baris
+    rollup tingkat order (termasuk hari ini, yang diperbarui setiap commit).
+    Di-cache DASHBOARD_CACHE_TTL detik dan dihapus setiap rollup berubah.
+    """
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is not None:
+        return stats
+    statuses = [code for code, _ in Order.STATUS_CHOICES]
+    valid = Q(status__in=VALID_REVENUE_STATUSES)
+    row = DailySalesRollup.objects.filter(product_key=0).aggregate(
+        total_orders=Sum("order_count"),
+        total_revenue=Sum("revenue", filter=valid),
+        paid_orders_count=Sum("order_count", filter=valid),
+        **{
+            f"count_{status}": Sum("order_count", filter=Q(status=status))
+            for status in statuses
+        },
+    )
+    stats = {
+        "total_orders": row["total_orders"] or 0,
+        "total_revenue": row["total_revenue"] or Decimal("0"),
+        "paid_orders_count": row["paid_orders_count"] or 0,
+        "pending_orders_count": row["count_PENDING"] or 0,
+        "cancelled_orders_count": row["count_CANCELLED"] or 0,
+        "by_status": [
+            {"status": status, "count": row[f"count_{status}"]}
+            for status in statuses if row[f"count_{status}"]
+        ],
+    }
+    cache.set(DASHBOARD_CACHE_KEY, stats, timeout=getattr(settings, "DASHBOARD_CACHE_TTL", 10))
+    return stats
+# =========================
+# DERET WAKTU OMZET
+# =========================
+SERIES_BUCKETS = ("day", "week", "month")
+SERIES_MAX_POINTS = 400
+ROLLUP_VERSION_KEY = "rollup:version"
+def bucket_start(day, bucket):
+    """Awal bucket untuk ``day``: hari itu, Senin minggu ISO-nya, atau tanggal 1."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+def next_bucket(start, bucket):
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+def bucket_label(start, bucket):
+    if bucket == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if bucket == "month":
+        return start.strftime("%Y-%m")
+    return start.isoformat()
+def rollup_version():
+    return cache.get_or_set(ROLLUP_VERSION_KEY, time.time_ns, timeout=None)
+def revenue_series(start_day, end_day, bucket="day"):
+    """
+    Omzet, jumlah order dan rata-rata nilai order (status valid) per
+    ``bucket`` dari ``start_day`` s/d ``end_day``, termasuk bucket kosong.
+    Bagian hari lalu di-cache per rentang sampai ada rollup hari lalu yang
+    berubah; hari ini selalu dihitung langsung, jadi order baru hari ini
+    tidak mengosongkan cache.
+    Raise ValueError jika bucket tidak dikenal atau titik melebihi SERIES_MAX_POINTS.
+    """
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"Bucket tidak dikenal: {bucket}")
+    today = timezone.localdate()
+    # ``today`` ikut di key: batas hari lalu/hari ini bergeser tiap tengah malam
+    key = f"revenue_series:{rollup_version()}:{bucket}:{start_day}:{end_day}:{today}"
+    series = cache.get(key)
+    if series is None:
+        series = build_revenue_series(start_day, end_day, bucket, include_today=False)
+        cache.set(key, series, timeout=getattr(settings, "REVENUE_SERIES_CACHE_TTL", 3600))
+    if start_day <= today <= end_day:
+        series = add_today_revenue(series, bucket)
+    return series
+def add_today_revenue(series, bucket):
+    """Salinan ``series`` dengan order hari ini ditambahkan ke bucket-nya."""
+    rows = order_rows(*day_bounds(timezone.localdate()))
+    count = sum(rows[s]["order_count"] for s in VALID_REVENUE_STATUSES if s in rows)
+    revenue = sum((rows[s]["revenue"] or 0 for s in VALID_REVENUE_STATUSES if s in rows), Decimal("0"))
+    period = bucket_start(timezone.localdate(), bucket)
+    result = []
+    for point in series:
+        if point["period"] == period:
+            orders = point["orders"] + count
+            total = point["revenue"] + revenue
+            point = {
+                **point,
+                "orders": orders,
+                "revenue": total,
+                "avg_order_value": total / orders if orders else Decimal("0"),
+            }
+        result.append(point)
+    return result
+def build_revenue_series(start_day, end_day, bucket, include_today=True):
+    periods = []
+    current = bucket_start(start_day, bucket)
+    while current <= end_day:
+        periods.append(current)
+        if len(periods) > SERIES_MAX_POINTS:
+            raise ValueError(f"Rentang terlalu panjang (maks {SERIES_MAX_POINTS} titik)")
+        current = next_bucket(current, bucket)
+    totals = {period: {"orders": 0, "revenue": Decimal("0")} for period in periods}
+    def add(period, count, revenue):
+        totals[period]["orders"] += count or 0
+        totals[period]["revenue"] += revenue or 0
+    # hari yang sudah lewat: rollup tingkat order, dikelompokkan di database
+    # (kolom date sudah tanggal lokal, jadi Trunc tidak perlu konversi zona)
+    today = timezone.localdate()
+    if start_day < today:
+        rows = (
+            DailySalesRollup.objects
+            .filter(
+                product_key=0,
+                status__in=VALID_REVENUE_STATUSES,
+                date__gte=start_day,
+                date__lt=min(end_day + timedelta(days=1), today),
+            )
+            .annotate(period=Trunc("date", bucket, output_field=DateField()))
+            .values("period")
+            .annotate(count=Sum("order_count"), revenue=Sum("revenue"))
+        )
+        for row in rows:
+            add(row["period"], row["count"], row["revenue"])
+    if include_today and start_day <= today <= end_day:
+        for status, row in order_rows(*day_bounds(today)).items():
+            if status in VALID_REVENUE_STATUSES:
+                add(bucket_start(today, bucket), row["order_count"], row["revenue"])
+    return [
+        {
+            "period": period,
+            "label": bucket_label(period, bucket),
+            "orders": totals[period]["orders"],
+            "revenue": totals[period]["revenue"],
+            "avg_order_value": (
+                totals[period]["revenue"] / totals[period]["orders"]
+                if totals[period]["orders"] else Decimal("0")
+            ),
+        }
+        for period in periods
+    ]
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import time
+from functools import lru_cache
+import requests  # type: ignore
+from django.conf import settings  # type: ignore
+from django.core.signals import setting_changed  # type: ignore
+from django.dispatch import receiver  # type: ignore
+from django.utils.module_loading import import_string  # type: ignore
+from .http_client import CircuitBreaker, ResilientClient
+# =========================================================
+# INTERFACE PROVIDER
+# =========================================================
+# Semua provider mengembalikan bentuk yang sama:
+#   create  -> {"success", "awb", "shipment_id", "message"}
+#   track   -> {"success", "awb", "status", "message"}
+# sehingga view / poller tidak perlu tahu format masing-masing API.
+class BaseShipmentProvider:
+    name = "base"
+    # batas paralel untuk implementasi async default
+    async_concurrency = 8
+    def create_shipment(self, order):
+        raise NotImplementedError
+    def track_waybill(self, courier, waybill):
+        raise NotImplementedError
+    def create_shipments(self, orders):
+        """Buat AWB untuk banyak order; hasil berurutan sama dengan ``orders``."""
+        return [self.create_shipment(order) for order in orders]
+    def track_many(self, waybills):
+        """``waybills``: iterable ``(courier, awb)``; return dict ``awb -> hasil``."""
+        return {awb: self.track_waybill(courier, awb) for courier, awb in waybills}
+    # =========================
+    # ASYNC
+    # =========================
+    # Default: jalankan versi sync di thread dengan concurrency terbatas.
+    async def _gather_limited(self, func, items):
+        semaphore = asyncio.Semaphore(self.async_concurrency)
+        async def run(item):
+            async with semaphore:
+                return await asyncio.to_thread(func, *item)
+        return await asyncio.gather(*(run(item) for item in items))
+    async def acreate_shipments(self, orders):
+        return await self._gather_limited(self.create_shipment, [(o,) for o in orders])
+    async def atrack_many(self, waybills):
+        waybills = list(waybills)
+        results = await self._gather_limited(self.track_waybill, waybills)
+        return {awb: result for (_, awb), result in zip(waybills, results)}
+# =========================================================
+# 🔵 DUMMY (DEFAULT)
+# =========================================================
+class DummyShipmentProvider(BaseShipmentProvider):
+    name = "dummy"
+    def create_shipment(self, order):
+        # simulasi AWB
+        return {
+            "success": True,
+            "awb": f"DUMMY-AWB-{order.id}",
+            "shipment_id": f"DUMMY-{order.id}",
+            "message": "Dummy shipment created",
+        }
+    def track_waybill(self, courier, waybill):
+        return {
+            "success": True,
+            "awb": waybill,
+            "status": "IN_TRANSIT",
+            "message": "Dummy tracking response",
+        }
+# =========================================================
+# 🟢 KOMSHIP
+# =========================================================
+class KomshipShipmentProvider(BaseShipmentProvider):
+    """
+    Provider Komship (Komerce). Path endpoint dapat diubah lewat settings
+    agar sandbox, produksi maupun server fake lokal bisa dipakai.
+    """
+    name = "komship"
+    def __init__(self):
+        self.client = ResilientClient(
+            "komship",
+            getattr(settings, "KOMSHIP_BASE_URL", "https://api.collaborator.komerce.id"),
+            headers={
+                "accept": "application/json",
+                "x-api-key": getattr(settings, "KOMSHIP_API_KEY", ""),
+            },
+            connect_timeout=getattr(settings, "RAJAONGKIR_CONNECT_TIMEOUT", 3),
+            read_timeout=getattr(settings, "RAJAONGKIR_READ_TIMEOUT", 10),
+            breaker=CircuitBreaker(
+                failure_threshold=getattr(settings, "RAJAONGKIR_BREAKER_THRESHOLD", 5),
+                reset_timeout=getattr(settings, "RAJAONGKIR_BREAKER_RESET", 30),
+            ),
+        )
+        self.store_path = getattr(settings, "KOMSHIP_STORE_PATH", "/order/api/v1/orders/store")
+        self.track_path = getattr(
+            settings, "KOMSHIP_TRACK_PATH", "/order/api/v1/orders/history-airway-bill"
+        )
+    def _order_payload(self, order):
+        return {
+            "order_id": order.id,
+            "shipper_destination_id": settings.ORIGIN_SUBDISTRICT_ID,
+            "receiver_destination_id": order.destination_subdistrict_id,
+            "receiver_name": order.shipping_name,
+            "receiver_phone": order.shipping_phone,
+            "receiver_address": order.shipping_address,
+            "shipping": (order.courier_code or "").upper(),
+            "shipping_type": order.courier_service,
+            "shipping_cost": int(order.shipping_cost),
+            "grand_total": int(order.total),
+            "weight": order.total_weight,
+        }
+    def create_shipment(self, order):
+        # POST membuat order di Komship, jadi tidak di-retry
+        try:
+            response = self.client.post(self.store_path, json=self._order_payload(order))
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+        except (requests.RequestException, ValueError) as e:
+            return {"success": False, "awb": None, "shipment_id": None, "message": str(e)}
+        return {
+            "success": bool(data.get("awb") or data.get("order_no")),
+            "awb": data.get("awb"),
+            "shipment_id": data.get("order_no"),
+            "message": "",
+        }
+    def track_waybill(self, courier, waybill):
+        try:
+            response = self.client.get(
+                self.track_path,
+                params={"shipping": (courier or "").upper(), "airway_bill": waybill},
+            )
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+        except (requests.RequestException, ValueError) as e:
+            return {"success": False, "awb": waybill, "status": None, "message": str(e)}
+        return {
+            "success": True,
+            "awb": waybill,
+            "status": (data.get("last_status") or "").upper(),
+            "message": "",
+        }
+# =========================================================
+# 🟡 RECORDED FIXTURE (BENCHMARK / TEST)
+# =========================================================
+class RecordedFixtureShipmentProvider(BaseShipmentProvider):
+    """
+    Putar ulang respons yang direkam dari file JSON::
+
+        {"create": {"<order_id>": {...}}, "track": {"<awb>": {...}},
+        "latency_ms": 150}
+
+    Order/resi yang tidak ada di fixture mendapat respons default sukses.
+    """
+    name = "fixture"
+    def __init__(self, path=None, latency_ms=None):
+        path = path or getattr(settings, "SHIPMENT_FIXTURE_PATH", None)
+        self.fixture = {}
+        if path:
+            with open(path, encoding="utf-8") as fp:
+                self.fixture = json.load(fp)
+        self.latency = (
+            latency_ms if latency_ms is not None else self.fixture.get("latency_ms", 0)
+        ) / 1000
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+    # Instance ini di-cache load_provider dan dipakai bersama thread pool,
+    # jadi latency batch tidak boleh diatur dengan mengubah atribut.
+    def _created(self, order):
+        return self.fixture.get("create", {}).get(str(order.id)) or {
+            "success": True,
+            "awb": f"FIXTURE-AWB-{order.id}",
+            "shipment_id": f"FIXTURE-{order.id}",
+            "message": "",
+        }
+    def _tracked(self, waybill):
+        return self.fixture.get("track", {}).get(waybill) or {
+            "success": True, "awb": waybill, "status": "IN_TRANSIT", "message": "",
+        }
+    def create_shipment(self, order):
+        self._wait()
+        return self._created(order)
+    def track_waybill(self, courier, waybill):
+        self._wait()
+        return self._tracked(waybill)
+    def create_shipments(self, orders):
+        # satu "panggilan" untuk seluruh batch, seperti API batch sungguhan
+        self._wait()
+        return [self._created(order) for order in orders]
+    def track_many(self, waybills):
+        self._wait()
+        return {awb: self._tracked(awb) for _, awb in waybills}
+# =========================================================
+# REGISTRY
+# =========================================================
+DEFAULT_PROVIDERS = {
+    "dummy": "shop.shipment_providers.DummyShipmentProvider",
+    "komship": "shop.shipment_providers.KomshipShipmentProvider",
+    "fixture": "shop.shipment_providers.RecordedFixtureShipmentProvider",
+}
+def get_provider_registry():
+    return {**DEFAULT_PROVIDERS, **getattr(settings, "SHIPMENT_PROVIDERS", {})}
+@lru_cache(maxsize=None)
+def load_provider(name):
+    registry = get_provider_registry()
+    if name not in registry:
+        raise ValueError(
+            f"SHIPMENT_PROVIDER '{name}' tidak terdaftar. Pilihan: {', '.join(sorted(registry))}"
+        )
+    return import_string(registry[name])()
+def get_shipment_provider(name=None):
+    return load_provider(name or getattr(settings, "SHIPMENT_PROVIDER", "dummy"))
+@receiver(setting_changed)
+def reset_provider_cache(setting, **kwargs):
+    if setting.startswith("SHIPMENT_") or setting.startswith("KOMSHIP_"):
+        load_provider.cache_clear()
@@ -1,7 +1,10 @@
 import requests  # type: ignore
 from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from .http_client import CircuitBreaker, ResilientClient
+from .shipment_providers import get_shipment_provider
 
-BASE_URL = "https://rajaongkir.komerce.id/api/v1"
+BASE_URL = getattr(settings, "RAJAONGKIR_BASE_URL", "https://rajaongkir.komerce.id/api/v1")
 # =========================
 # DEFAULT HEADERS
 # =========================
@@ -9,11 +12,33 @@ HEADERS = {
     "accept": "application/json",
     "key": settings.RAJAONGKIR_API_KEY,
 }
+# =========================
+# SHARED HTTP CLIENT
+# =========================
+# Satu session (keep-alive) untuk semua panggilan RajaOngkir. Saat
+# RajaOngkir bermasalah breaker terbuka dan panggilan langsung gagal
+# tanpa menahan worker selama timeout.
+rajaongkir = ResilientClient(
+    "rajaongkir",
+    BASE_URL,
+    headers=HEADERS,
+    connect_timeout=getattr(settings, "RAJAONGKIR_CONNECT_TIMEOUT", 3),
+    read_timeout=getattr(settings, "RAJAONGKIR_READ_TIMEOUT", 10),
+    max_retries=getattr(settings, "RAJAONGKIR_MAX_RETRIES", 2),
+    breaker=CircuitBreaker(
+        failure_threshold=getattr(settings, "RAJAONGKIR_BREAKER_THRESHOLD", 5),
+        reset_timeout=getattr(settings, "RAJAONGKIR_BREAKER_RESET", 30),
+    ),
+)
+# Respons terakhir yang berhasil, dipakai saat RajaOngkir gagal
+LAST_GOOD_TIMEOUT = 60 * 60 * 24 * 7
+def _error_result(e, **extra):
+    message = "Request timeout" if isinstance(e, requests.Timeout) else str(e)
+    return {"success": False, "message": message, **extra}
 # =========================================================
 # 🟢 RAJAONGKIR - SHIPPING COST
 # =========================================================
 def get_shipping_cost(destination, weight, courier="jne"):
-    url = f"{BASE_URL}/calculate/domestic-cost"
     payload = {
         "origin": int(settings.ORIGIN_SUBDISTRICT_ID),
         "destination": int(destination),
@@ -21,154 +46,51 @@ def get_shipping_cost(destination, weight, courier="jne"):
         "courier": courier,
     }
     try:
-        response = requests.post(
-            url,
-            headers=HEADERS,
+        # hitung ongkir tidak mengubah data, jadi aman di-retry
+        response = rajaongkir.post(
+            "/calculate/domestic-cost",
             data=payload,
-            timeout=30
+            idempotent=True
         )
         response.raise_for_status()
         return {
             "success": True,
             "data": response.json()
         }
-    except requests.Timeout:
-        return {
-            "success": False,
-            "message": "Request timeout"
-        }
     except requests.RequestException as e:
-        return {
-            "success": False,
-            "message": str(e)
-        }
+        return _error_result(e)
 # =========================================================
-# 🔵 SHIPMENT LAYER (DUMMY - READY FOR KOMSHIP)
+# 🔵 SHIPMENT LAYER (lihat shop/shipment_providers.py)
 # =========================================================
-class DummyShipmentProvider:
-    def create_shipment(self, order):
-        # simulasi AWB
-        awb = f"DUMMY-AWB-{order.id}"
-        return {
-            "success": True,
-            "awb": awb,
-            "courier": order.courier_code,
-            "message": "Dummy shipment created"
-        }
-    def track_waybill(self, courier, waybill):
-        return {
-            "success": True,
-            "awb": waybill,
-            "status": "IN_TRANSIT",
-            "message": "Dummy tracking response"
-        }
-# =========================
-# PROVIDER SELECTOR
-# =========================
-def get_shipment_provider():
-    provider = getattr(settings, "SHIPMENT_PROVIDER", "dummy")
-    if provider == "dummy":
-        return DummyShipmentProvider()
-    return DummyShipmentProvider()
-# =========================
-# CREATE SHIPMENT (MAIN)
-# =========================
+# Provider dipilih lewat settings.SHIPMENT_PROVIDER ("dummy", "komship",
+# "fixture" atau nama tambahan di settings.SHIPMENT_PROVIDERS).
 def create_shipment(order):
-    provider = get_shipment_provider()
-    result = provider.create_shipment(order)
-    return normalize_shipment_result(result)
-def normalize_shipment_result(result):
-    return {
-        "success": result.get("success", False),
-        "awb":
-            result.get("awb")
-            or result.get("data", {}).get("awb")
-            or result.get("data", {}).get("data", {}).get("awb"),
-    }
-# =========================
-# TRACK WAYBILL (MAIN)
-# =========================
+    return get_shipment_provider().create_shipments([order])[0]
+def create_shipments(orders):
+    return get_shipment_provider().create_shipments(list(orders))
 def track_waybill(courier, waybill):
-    provider = get_shipment_provider()
-    return provider.track_waybill(courier, waybill)
+    return get_shipment_provider().track_waybill(courier, waybill)
+def track_many(waybills):
+    return get_shipment_provider().track_many(list(waybills))
 # =========================================================
 # 🟢 PROVINCE / CITY / SUBDISTRICT (JANGAN DIUBAH)
 # =========================================================
-def get_provinces():
-    url = f"{BASE_URL}/destination/province"
-    headers = {
-        "accept": "application/json",
-        "key": settings.RAJAONGKIR_API_KEY,
-    }
+def _get_destination(path):
+    cache_key = f"rajaongkir:last-good:{path}"
     try:
-        response = requests.get(
-            url,
-            headers=headers,
-            timeout=30
-        )
+        response = rajaongkir.get(path)
         response.raise_for_status()
-        return response.json()
-    except requests.Timeout:
-        return {
-            "success": False,
-            "message": "Request timeout",
-            "data": []
-        }
+        data = response.json()
+        cache.set(cache_key, data, timeout=LAST_GOOD_TIMEOUT)
+        return data
     except requests.RequestException as e:
-        return {
-            "success": False,
-            "message": str(e),
-            "data": []
-        }
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "stale": True}
+        return _error_result(e, data=[])
+def get_provinces():
+    return _get_destination("/destination/province")
 def get_cities(province_id):
-    url = f"{BASE_URL}/destination/city/{province_id}"
-    headers = {
-        "accept": "application/json",
-        "key": settings.RAJAONGKIR_API_KEY,
-    }
-    try:
-        response = requests.get(
-            url,
-            headers=headers,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.Timeout:
-        return {
-            "success": False,
-            "message": "Request timeout",
-            "data": []
-        }
-    except requests.RequestException as e:
-        return {
-            "success": False,
-            "message": str(e),
-            "data": []
-        }
+    return _get_destination(f"/destination/city/{province_id}")
 def get_subdistricts(city_id):
-    url = f"{BASE_URL}/destination/district/{city_id}"
-    headers = {
-        "accept": "application/json",
-        "key": settings.RAJAONGKIR_API_KEY,
-    }
-    try:
-        response = requests.get(
-            url,
-            headers=headers,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.Timeout:
-        return {
-            "success": False,
-            "message": "Request timeout",
-            "data": []
-        }
-    except requests.RequestException as e:
-        return {
-            "success": False,
-            "message": str(e),
-            "data": []
-        }
\ No newline at end of file
+    return _get_destination(f"/destination/district/{city_id}")
@@ -0,0 +1,314 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.db import close_old_connections  # type: ignore
+from django.utils import timezone  # type: ignore
+from .models import ShippingQuote
+from .shipping import get_shipping_cost
+# =========================================================
+# CACHE ONGKIR
+# =========================================================
+# Key: (origin, destination, bucket berat, kurir). Entry dianggap segar
+# selama ONGKIR_CACHE_TTL detik, lalu masih boleh dipakai (stale) selama
+# ONGKIR_CACHE_STALE detik sambil di-refresh di background.
+CACHE_PREFIX = "ongkir"
+METRIC_NAMES = (
+    "hit",
+    "stale_hit",
+    "table_hit",
+    "miss",
+    "upstream_call",
+    "upstream_error",
+    "upstream_ms_total",
+)
+def get_weight_bucket(weight):
+    """Bulatkan berat (gram) ke atas ke kelipatan ONGKIR_WEIGHT_BUCKET."""
+    size = getattr(settings, "ONGKIR_WEIGHT_BUCKET", 1000)
+    weight = max(int(weight or 0), 1)
+    return -(-weight // size) * size
+def quote_cache_key(destination, weight, courier):
+    return (
+        f"{CACHE_PREFIX}:{settings.ORIGIN_SUBDISTRICT_ID}:{int(destination)}:"
+        f"{get_weight_bucket(weight)}:{str(courier).lower()}"
+    )
+def _ttl():
+    return getattr(settings, "ONGKIR_CACHE_TTL", 60 * 60 * 6)
+def _stale_ttl():
+    return getattr(settings, "ONGKIR_CACHE_STALE", 60 * 60 * 24)
+# =========================
+# METRICS
+# =========================
+def _metric_key(name):
+    return f"{CACHE_PREFIX}:metric:{name}"
+def incr_metric(name, amount=1):
+    key = _metric_key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
+def get_quote_metrics():
+    values = cache.get_many([_metric_key(n) for n in METRIC_NAMES])
+    data = {n: values.get(_metric_key(n), 0) for n in METRIC_NAMES}
+    hits = data["hit"] + data["stale_hit"] + data["table_hit"]
+    lookups = hits + data["miss"]
+    data["hit_ratio"] = round(hits / lookups, 4) if lookups else 0
+    data["upstream_avg_ms"] = (
+        round(data["upstream_ms_total"] / data["upstream_call"], 1)
+        if data["upstream_call"] else 0
+    )
+    return data
+def reset_quote_metrics():
+    cache.delete_many([_metric_key(n) for n in METRIC_NAMES])
+# =========================
+# UPSTREAM + SINGLE FLIGHT
+# =========================
+# Lock per proses dibagi ke sejumlah stripe tetap (bukan satu lock per key)
+# supaya jumlahnya tidak terus bertambah mengikuti kombinasi tujuan/berat.
+LOCK_STRIPES = 64
+_local_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+def _local_lock(key):
+    return _local_locks[hash(key) % LOCK_STRIPES]
+def _fetch_and_store(key, destination, weight, courier):
+    started = time.perf_counter()
+    result = get_shipping_cost(
+        destination=destination,
+        weight=get_weight_bucket(weight),
+        courier=courier,
+    )
+    incr_metric("upstream_call")
+    incr_metric("upstream_ms_total", int((time.perf_counter() - started) * 1000))
+    if result.get("success"):
+        cache.set(
+            key,
+            {"result": result, "fetched_at": time.time()},
+            timeout=_ttl() + _stale_ttl(),
+        )
+    else:
+        incr_metric("upstream_error")
+    return result
+def _single_flight(key, destination, weight, courier):
+    """
+    Hanya satu pemanggil per key yang menembak RajaOngkir. Thread lain di
+    proses yang sama menunggu lock stripe lalu membaca hasilnya dari cache.
+    Antar worker gunicorn dikoordinasi lewat lock ``cache.add``, yang hanya
+    berlaku lintas proses bila CACHE_URL menunjuk Redis/Memcached; dengan
+    locmem tiap proses bisa menembak upstream sekali.
+    """
+    lock_key = f"{key}:lock"
+    wait = getattr(settings, "ONGKIR_LOCK_TIMEOUT", 10)
+    with _local_lock(key):
+        entry = cache.get(key)
+        if entry and time.time() - entry["fetched_at"] < _ttl():
+            return entry["result"]
+        deadline = time.monotonic() + wait
+        while not cache.add(lock_key, 1, timeout=wait):
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry and time.time() - entry["fetched_at"] < _ttl():
+                return entry["result"]
+        try:
+            return _fetch_and_store(key, destination, weight, courier)
+        finally:
+            cache.delete(lock_key)
+def _refresh_in_background(key, destination, weight, courier):
+    lock_key = f"{key}:refresh"
+    if not cache.add(lock_key, 1, timeout=getattr(settings, "ONGKIR_LOCK_TIMEOUT", 10)):
+        return
+    def run():
+        try:
+            _single_flight(key, destination, weight, courier)
+        finally:
+            cache.delete(lock_key)
+    threading.Thread(target=run, daemon=True).start()
+# =========================
+# MATRIX PRECOMPUTE
+# =========================
+def _matrix_max_age():
+    return getattr(settings, "ONGKIR_MATRIX_MAX_AGE", 60 * 60 * 24 * 7)
+def store_quote_entry(destination, weight, courier, result):
+    """Simpan hasil ke cache dengan format yang sama seperti _fetch_and_store."""
+    cache.set(
+        quote_cache_key(destination, weight, courier),
+        {"result": result, "fetched_at": time.time()},
+        timeout=_ttl() + _stale_ttl(),
+    )
+def lookup_precomputed_quote(destination, weight, courier):
+    """
+    Quote dari tabel ShippingQuote jika masih dalam ONGKIR_MATRIX_MAX_AGE.
+    Hasil ditulis ke cache agar lookup berikutnya tidak perlu query.
+    """
+    try:
+        row = (
+            ShippingQuote.objects
+            .filter(
+                origin=int(settings.ORIGIN_SUBDISTRICT_ID),
+                destination=int(destination),
+                weight_bucket=get_weight_bucket(weight),
+                courier=str(courier).lower(),
+                fetched_at__gte=timezone.now() - timedelta(seconds=_matrix_max_age()),
+            )
+            .values_list("services", flat=True)
+            .first()
+        )
+    except (TypeError, ValueError):
+        return None
+    if row is None:
+        return None
+    result = {"success": True, "data": {"data": row}}
+    # kesegaran baris sudah dijaga ONGKIR_MATRIX_MAX_AGE
+    store_quote_entry(destination, weight, courier, result)
+    return result
+# =========================
+# MAIN
+# =========================
+def get_cached_shipping_cost(destination, weight, courier="jne"):
+    """
+    Sama seperti ``get_shipping_cost`` tetapi lewat cache.
+    Urutan: cache, tabel ShippingQuote (matrix precompute), lalu RajaOngkir.
+    Hasil diberi key ``cache``: ``hit``, ``stale``, ``table`` atau ``miss``.
+    """
+    key = quote_cache_key(destination, weight, courier)
+    entry = cache.get(key)
+    if entry:
+        age = time.time() - entry["fetched_at"]
+        if age < _ttl():
+            incr_metric("hit")
+            return {**entry["result"], "cache": "hit"}
+        incr_metric("stale_hit")
+        _refresh_in_background(key, destination, weight, courier)
+        return {**entry["result"], "cache": "stale"}
+    table_result = lookup_precomputed_quote(destination, weight, courier)
+    if table_result is not None:
+        incr_metric("table_hit")
+        return {**table_result, "cache": "table"}
+    incr_metric("miss")
+    return {**_single_flight(key, destination, weight, courier), "cache": "miss"}
+
+# =========================================================
+# FAN-OUT SEMUA KURIR
+# =========================================================
+_executor = None
+_executor_guard = threading.Lock()
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_guard:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "ONGKIR_FANOUT_WORKERS", 8),
+                    thread_name_prefix="ongkir",
+                )
+    return _executor
+def _quote_in_worker(destination, weight, courier):
+    # Thread executor hidup lama dan tidak melewati siklus request; koneksi DB
+    # (lookup tabel ShippingQuote) dicek/ditutup di sini supaya tidak basi
+    # setelah wait_timeout MySQL lalu terbaca sebagai error kurir.
+    close_old_connections()
+    try:
+        return get_cached_shipping_cost(destination, weight, courier)
+    finally:
+        close_old_connections()
+def _submit_quote(destination, weight, courier):
+    return _get_executor().submit(_quote_in_worker, destination, weight, courier)
+def parse_etd_days(etd):
+    """'2-3 day' -> 2; tidak terbaca -> 99 (diurutkan paling akhir)."""
+    match = re.search(r"\d+", str(etd or ""))
+    return int(match.group()) if match else 99
+def extract_services(result):
+    # Komerce membungkus list layanan di result["data"]["data"]
+    data = result.get("data") or {}
+    services = data.get("data", []) if isinstance(data, dict) else data
+    return services or []
+def get_all_courier_quotes(destination, weight, couriers=None, timeout=None):
+    """
+    Ambil ongkir semua kurir secara paralel (lewat cache), gabungkan dan
+    urutkan per harga lalu estimasi. Kurir yang melewati ``timeout`` detik
+    dilaporkan ``timeout`` dan hasil kurir lain tetap dikembalikan; request
+    yang lambat tetap berjalan dan mengisi cache untuk pemanggilan berikutnya.
+    """
+    couriers = couriers or getattr(settings, "ONGKIR_COURIERS", ["jne", "jnt", "sicepat"])
+    timeout = timeout if timeout is not None else getattr(settings, "ONGKIR_FANOUT_TIMEOUT", 5)
+    futures = {
+        _submit_quote(destination, weight, courier): courier
+        for courier in couriers
+    }
+    done, _ = wait(futures, timeout=timeout)
+    services = []
+    status = {}
+    for future, courier in futures.items():
+        if future not in done:
+            status[courier] = "timeout"
+            continue
+        try:
+            result = future.result()
+        except Exception:
+            status[courier] = "error"
+            continue
+        if not result.get("success"):
+            status[courier] = "error"
+            continue
+        status[courier] = "ok"
+        for service in extract_services(result):
+            services.append({**service, "courier": courier})
+    services.sort(key=lambda s: (int(s.get("cost") or 0), parse_etd_days(s.get("etd"))))
+    return {
+        "success": any(v == "ok" for v in status.values()),
+        "partial": any(v != "ok" for v in status.values()),
+        "couriers": status,
+        "data": services,
+    }
+# =========================================================
+# VERIFIKASI ONGKIR DI CHECKOUT
+# =========================================================
+def get_cached_quote(destination, weight, courier):
+    """Baca quote dari cache (segar maupun stale) atau tabel matrix, tanpa upstream."""
+    entry = cache.get(quote_cache_key(destination, weight, courier))
+    if entry:
+        return entry["result"]
+    return lookup_precomputed_quote(destination, weight, courier)
+def verify_shipping_cost(destination, weight, courier, service, posted_cost):
+    """
+    Cocokkan kurir/layanan/ongkir yang dikirim browser dengan quote yang
+    di-cache saat customer memilihnya. Jika cache sudah kedaluwarsa, lakukan
+    satu re-quote dengan batas ONGKIR_VERIFY_TIMEOUT detik.
+    Return dict ``success``, ``cost`` (Decimal), ``etd`` atau ``message``.
+    """
+    try:
+        posted = Decimal(str(posted_cost).replace(",", ""))
+    except (InvalidOperation, ValueError):
+        return {"success": False, "message": "Ongkir tidak valid."}
+    result = get_cached_quote(destination, weight, courier)
+    if result is None:
+        future = _submit_quote(destination, weight, courier)
+        done, _ = wait([future], timeout=getattr(settings, "ONGKIR_VERIFY_TIMEOUT", 5))
+        try:
+            result = future.result() if done else None
+        except Exception:
+            result = None
+        if not result or not result.get("success"):
+            return {
+                "success": False,
+                "message": "Ongkir tidak dapat diverifikasi, silakan coba lagi.",
+            }
+    match = next(
+        (s for s in extract_services(result) if str(s.get("service")) == str(service)),
+        None,
+    )
+    if match is None:
+        return {"success": False, "message": "Layanan kurir tidak tersedia, silakan pilih ulang."}
+    cost = Decimal(str(match.get("cost") or 0))
+    if cost != posted:
+        return {
+            "success": False,
+            "message": "Ongkir sudah berubah, silakan pilih ulang layanan pengiriman.",
+            "cost": cost,
+        }
+    return {"success": True, "cost": cost, "etd": match.get("etd") or ""}
@@ -1,6 +1,14 @@
-from django.db.models.signals import (post_save,pre_save)  # type: ignore
+from django.db.models.signals import (post_delete,post_save,pre_delete,pre_save)  # type: ignore
 from django.dispatch import receiver  # type: ignore
-from .models import Order
+from django.utils import timezone  # type: ignore
+from .models import Order, OrderItem, OrderStatusLog
+from .rollups import (
+    RollupDelta,
+    order_day,
+    order_item_groups,
+    queue_rollup_delta,
+    status_change_delta,
+)
 from .utils import (
     kirim_wa_otomatis,
     kirim_email_notifikasi
@@ -11,16 +19,184 @@ def simpan_status_lama(
     instance,
     **kwargs
 ):
+    # =========================
+    # STATUS LAMA DARI MEMORI
+    # =========================
+    # Order yang dimuat dari DB sudah menyimpan nilai aslinya
+    # (lihat Order.from_db), jadi tidak perlu SELECT ulang.
+    if instance.is_tracked("status"):
+        instance._old_status = instance.get_original("status")
+        return
+    # =========================
+    # FALLBACK (status di-defer)
+    # =========================
+    instance._old_status = None
     if instance.pk:
-        try:
-            old_instance = Order.objects.get(
-                pk=instance.pk
-            )
-            instance._old_status = (
-                old_instance.status
-            )
-        except Order.DoesNotExist:
-            instance._old_status = None
+        instance._old_status = (
+            Order.objects
+            .filter(pk=instance.pk)
+            .values_list("status", flat=True)
+            .first()
+        )
+# ==================================================
+# LOG TRANSISI STATUS
+# ==================================================
+@receiver(post_save, sender=Order)
+def catat_transisi_status(
+    sender,
+    instance,
+    created,
+    **kwargs
+):
+    transitions = getattr(
+        instance,
+        "_pending_transitions",
+        None
+    )
+    if created or not transitions:
+        return
+    actor = getattr(instance, "_transition_actor", None)
+    source = getattr(instance, "_transition_source", "")
+    OrderStatusLog.objects.bulk_create([
+        OrderStatusLog(
+            order=instance,
+            actor=actor,
+            source=source,
+            **transition
+        )
+        for transition in transitions
+    ])
+    instance._transition_actor = None
+    instance._transition_source = ""
+# ==================================================
+# ROLLUP PENJUALAN HARIAN
+# ==================================================
+@receiver(post_save, sender=Order)
+def perbarui_rollup_penjualan(
+    sender,
+    instance,
+    created,
+    **kwargs
+):
+    # hanya order baru, perubahan status atau total yang
+    # mengubah angka laporan
+    day = order_day(instance)
+    if created:
+        delta = RollupDelta()
+        delta.add_order(day, instance.status, instance.total)
+        queue_rollup_delta(delta)
+        return
+    status_change = next(
+        (
+            t for t in getattr(instance, "_pending_transitions", None) or []
+            if t["field"] == "status"
+        ),
+        None
+    )
+    total_changed = (
+        instance.is_tracked("total")
+        and instance.has_changed("total")
+    )
+    if not status_change and not total_changed:
+        return
+    old_total = instance.get_original("total", instance.total)
+    if status_change:
+        delta = status_change_delta(
+            {instance.pk: (day, status_change["from_status"], old_total)},
+            instance.status
+        )
+    else:
+        delta = RollupDelta()
+    if total_changed:
+        delta.add(day, instance.status, revenue=instance.total - old_total)
+    queue_rollup_delta(delta)
+@receiver(pre_delete, sender=Order)
+def hapus_dari_rollup(sender, instance, **kwargs):
+    # item masih ada di pre_delete; saat cascade item dihapus lebih dulu
+    day = order_day(instance)
+    status = instance.get_original("status", instance.status)
+    delta = RollupDelta()
+    delta.add_order(day, status, instance.get_original("total", instance.total), sign=-1)
+    delta.add_items(day, status, order_item_groups([instance.pk]), sign=-1)
+    queue_rollup_delta(delta)
+# ==================================================
+# ROLLUP PER ITEM
+# ==================================================
+# Item checkout dibuat setelah order-nya; item yang diubah/dihapus
+# (mis. lewat admin) mengoreksi baris produk/varian rollup.
+def _item_key_shared(order_id, product_id, variant_key, exclude_pk=None):
+    # order_count baris varian = order berbeda, bukan jumlah item
+    return (
+        OrderItem.objects
+        .filter(order_id=order_id, product_id=product_id, variant_key=variant_key)
+        .exclude(pk=exclude_pk)
+        .exists()
+    )
+@receiver(pre_save, sender=OrderItem)
+def simpan_item_lama(sender, instance, **kwargs):
+    instance._rollup_old = None
+    if instance.pk and not instance._state.adding:
+        instance._rollup_old = (
+            OrderItem.objects
+            .filter(pk=instance.pk)
+            .values("product_id", "variant_key", "quantity", "line_revenue")
+            .first()
+        )
+@receiver(post_save, sender=OrderItem)
+def perbarui_rollup_item(sender, instance, created, **kwargs):
+    order = instance.order
+    day = order_day(order)
+    status = order.get_original("status", order.status)
+    delta = RollupDelta()
+    old = None if created else getattr(instance, "_rollup_old", None)
+    if old:
+        delta.add(
+            day, status, old["product_id"], old["variant_key"],
+            orders=-int(not _item_key_shared(
+                order.pk, old["product_id"], old["variant_key"], instance.pk
+            )),
+            quantity=-old["quantity"],
+            revenue=-old["line_revenue"],
+        )
+    delta.add(
+        day, status, instance.product_id, instance.variant_key,
+        orders=int(not _item_key_shared(
+            order.pk, instance.product_id, instance.variant_key, instance.pk
+        )),
+        quantity=instance.quantity,
+        revenue=instance.line_revenue,
+        product_name=instance.product_name,
+        variant_label=instance.variant_label,
+    )
+    queue_rollup_delta(delta)
+@receiver(post_delete, sender=OrderItem)
+def hapus_item_dari_rollup(sender, instance, origin=None, **kwargs):
+    # item yang ikut terhapus bersama order-nya (cascade dari Order atau
+    # Customer) sudah dikurangi hapus_dari_rollup
+    if not (
+        isinstance(origin, OrderItem)
+        or getattr(origin, "model", None) is OrderItem
+    ):
+        return
+    order = (
+        Order.objects
+        .filter(pk=instance.order_id)
+        .values("status", "created_at")
+        .first()
+    )
+    if order is None:
+        return
+    delta = RollupDelta()
+    delta.add(
+        timezone.localdate(order["created_at"]), order["status"],
+        instance.product_id, instance.variant_key,
+        orders=-int(not _item_key_shared(
+            instance.order_id, instance.product_id, instance.variant_key
+        )),
+        quantity=-instance.quantity,
+        revenue=-instance.line_revenue,
+    )
+    queue_rollup_delta(delta)
 # ==================================================
 # NOTIFIKASI MULTI CHANNEL
 # ==================================================
@@ -36,21 +212,30 @@ def notifikasi_order_multi_channel(
     # =========================
     if created:
         return
-    try:
-        # =========================
-        # CEGAH NOTIF GANDA
-        # =========================
-        old_status = getattr(
-            instance,
-            "_old_status",
-            None
+    # =========================
+    # CEGAH NOTIF GANDA
+    # =========================
+    old_status = getattr(
+        instance,
+        "_old_status",
+        None
+    )
+    if old_status == instance.status:
+        print(
+            f"SKIP NOTIFICATION "
+            f"(status tetap {instance.status})"
         )
-        if old_status == instance.status:
-            print(
-                f"SKIP NOTIFICATION "
-                f"(status tetap {instance.status})"
-            )
-            return
+        return
+    kirim_notifikasi_status(instance)
+# ==================================================
+# ISI NOTIFIKASI PER STATUS
+# ==================================================
+def kirim_notifikasi_status(instance):
+    """
+    Kirim email + WA untuk status ``instance`` saat ini. Dipanggil oleh
+    signal post_save dan oleh update massal (yang tidak memicu signal).
+    """
+    try:
         # =========================
         # CUSTOMER DATA
         # =========================
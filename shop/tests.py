@@ -1 +1,1531 @@
-from django.test import TestCase # type: ignore
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import openpyxl  # type: ignore
+import requests  # type: ignore
+from django.apps import apps as django_apps  # type: ignore
+from django.conf import settings  # type: ignore
+from django.contrib.auth.models import User  # type: ignore
+from django.core import mail  # type: ignore
+from django.core.cache import cache  # type: ignore
+from django.core.management import call_command  # type: ignore
+from django.db import connection, transaction  # type: ignore
+from django.db.models import Avg, QuerySet  # type: ignore
+from django.test import TestCase, override_settings  # type: ignore
+from django.test.utils import CaptureQueriesContext  # type: ignore
+from django.urls import reverse  # type: ignore
+from django.utils import timezone  # type: ignore
+from .date_ranges import created_range_q, day_bounds
+from .exports import iter_item_rows, iter_order_rows
+from .fake_services import COURIER_RATES, FakeServices, build_midtrans_notification
+from .http_client import CircuitBreaker, CircuitOpenError, ResilientClient, TokenBucket
+from .inventory import InsufficientStock, decrement_stock
+from .models import (
+    CartItem, City, Color, Customer, DailySalesRollup, District, InvalidStatusTransition, Order,
+    OrderItem, OrderStatusLog, Payment, Product, ProductCategory, ProductVariant, ShippingQuote,
+    Size,
+)
+from .ongkir_matrix import precompute_matrix, top_destinations, top_weight_buckets
+from .orders import bulk_buat_resi, bulk_ubah_status
+from .parcels import plan_shipping
+from .rollups import RollupDelta, dashboard_stats, product_analytics, revenue_series, sales_summary
+from .shipment_providers import (
+    DummyShipmentProvider, RecordedFixtureShipmentProvider, get_shipment_provider,
+)
+from .shipping_quotes import (
+    extract_services, get_all_courier_quotes, get_cached_shipping_cost, get_quote_metrics,
+    get_weight_bucket, verify_shipping_cost,
+)
+from .tracking import due_orders, next_interval, poll_tracking, shipping_status_changed
+from .utils import EmailDispatcher, kirim_email_notifikasi, kirim_wa_otomatis
+from .whatsapp import FonnteClient, WhatsAppBatch, format_nomor_wa
+
+
+def buat_order(username="budi", **kwargs):
+    user = User.objects.create_user(username=username, email=f"{username}@mail.com")
+    customer = Customer.objects.create(user=user, phone="08123456789")
+    data = {
+        "customer": customer,
+        "shipping_name": "Budi",
+        "shipping_phone": "08123456789",
+        "shipping_address": "Jl. Gajah Mada 1",
+        "shipping_city": "Pontianak",
+        "shipping_province": "Kalimantan Barat",
+        "shipping_postal_code": "78111",
+    }
+    data.update(kwargs)
+    return Order.objects.create(**data)
+
+
+# =========================
+# DIRTY FIELD TRACKING
+# =========================
+class OrderDirtyFieldTests(TestCase):
+    def setUp(self):
+        self.order = buat_order()
+
+    def test_from_db_captures_original_state(self):
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual(order.get_original("status"), "PENDING")
+        self.assertFalse(order.has_changed("status"))
+        order.status = "PAID"
+        self.assertTrue(order.has_changed("status"))
+        self.assertEqual(order.get_changed_fields(), {"status": ("PENDING", "PAID")})
+
+    def test_deferred_field_is_not_tracked(self):
+        order = Order.objects.only("id").get(pk=self.order.pk)
+        self.assertFalse(order.is_tracked("status"))
+
+    def test_save_resets_original_state(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.tracking_number = "JNE123"
+        order.save(update_fields=["tracking_number"])
+        self.assertFalse(order.has_changed("tracking_number"))
+
+    def test_save_without_status_change_is_single_update(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.tracking_number = "JNE123"
+        with CaptureQueriesContext(connection) as ctx:
+            order.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(ctx.captured_queries[0]["sql"].startswith("UPDATE"))
+
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    @mock.patch("shop.signals.kirim_email_notifikasi")
+    def test_status_change_is_single_update(self, mock_email, mock_wa):
+        order = Order.objects.select_related("customer__user").get(pk=self.order.pk)
+        order.status = "PAID"
+        with CaptureQueriesContext(connection) as ctx:
+            order.save()
+        # satu UPDATE order + satu INSERT log transisi, tanpa SELECT
+        sqls = [q["sql"].split()[0] for q in ctx.captured_queries]
+        self.assertEqual(sqls, ["UPDATE", "INSERT"])
+        mock_email.assert_called_once()
+        mock_wa.assert_called_once()
+
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    @mock.patch("shop.signals.kirim_email_notifikasi")
+    def test_unchanged_status_skips_notification(self, mock_email, mock_wa):
+        order = Order.objects.get(pk=self.order.pk)
+        order.save()
+        mock_email.assert_not_called()
+        mock_wa.assert_not_called()
+
+
+# =========================
+# EMAIL BATCH
+# =========================
+class EmailDispatcherTests(TestCase):
+    def setUp(self):
+        self.order = buat_order()
+        self.context = {"order": self.order, "user": self.order.customer.user}
+
+    def test_single_email_sends_html_alternative(self):
+        self.assertTrue(kirim_email_notifikasi(
+            "Pesanan Selesai", "emails/order_completed.html",
+            self.context, "budi@mail.com",
+        ))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+
+    def test_batch_uses_one_connection(self):
+        with mock.patch("shop.utils.get_connection", wraps=mail.get_connection) as get_conn:
+            with EmailDispatcher():
+                for i in range(5):
+                    kirim_email_notifikasi(
+                        f"Pesanan #{i}", "emails/order_shipped.html",
+                        self.context, f"user{i}@mail.com",
+                    )
+                self.assertEqual(len(mail.outbox), 0)
+        get_conn.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_missing_template_is_skipped(self):
+        with EmailDispatcher() as dispatcher:
+            self.assertFalse(dispatcher.add("x", "emails/tidak_ada.html", {}, "a@mail.com"))
+        self.assertEqual(len(mail.outbox), 0)
+
+
+# =========================
+# WHATSAPP CLIENT
+# =========================
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class WhatsAppClientTests(TestCase):
+    def fake_response(self, status_code=200, body=None):
+        response = mock.Mock(status_code=status_code)
+        response.json.return_value = body if body is not None else {"status": True}
+        return response
+
+    def test_format_nomor(self):
+        self.assertEqual(format_nomor_wa("0812-3456 789"), "628123456789")
+        self.assertEqual(format_nomor_wa("+62812"), "62812")
+        self.assertEqual(format_nomor_wa("812"), "62812")
+
+    def test_token_bucket_limits_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # 2 token awal gratis, 4 sisanya menunggu 0.5 detik per token
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    @mock.patch("shop.whatsapp.time.sleep")
+    def test_retry_on_throttle_then_success(self, _sleep):
+        session = mock.Mock()
+        session.post.side_effect = [self.fake_response(429), self.fake_response()]
+        client = FonnteClient(token="t", rate=100, max_retries=2, session=session)
+        self.assertEqual(client.send("0812", "halo"), {"status": True})
+        self.assertEqual(session.post.call_count, 2)
+
+    @mock.patch("shop.whatsapp.time.sleep")
+    def test_gives_up_after_max_retries(self, _sleep):
+        session = mock.Mock()
+        session.post.side_effect = requests.ConnectionError("down")
+        client = FonnteClient(token="t", rate=100, max_retries=2, session=session)
+        self.assertIsNone(client.send("0812", "halo"))
+        self.assertEqual(session.post.call_count, 3)
+
+    def test_batch_coalesces_messages_per_phone(self):
+        client = mock.Mock()
+        with WhatsAppBatch(client=client):
+            kirim_wa_otomatis("08123", "Pesanan #1 dikirim")
+            kirim_wa_otomatis("+628123", "Pesanan #2 dikirim")
+            kirim_wa_otomatis("0899", "Pesanan #3 dikirim")
+            client.send.assert_not_called()
+        self.assertEqual(client.send.call_count, 2)
+        merged = {c.args[0]: c.args[1] for c in client.send.call_args_list}
+        self.assertIn("Pesanan #1", merged["628123"])
+        self.assertIn("Pesanan #2", merged["628123"])
+
+    def test_batch_window_splits_old_messages(self):
+        client, clock = mock.Mock(), FakeClock()
+        batch = WhatsAppBatch(client=client, window=10, clock=clock)
+        batch.add("0812", "satu")
+        clock.now = 11
+        batch.add("0812", "dua")
+        self.assertEqual(client.send.call_count, 1)
+        batch.flush()
+        self.assertEqual(client.send.call_count, 2)
+
+
+# =========================
+# BULK STATUS
+# =========================
+@mock.patch("shop.signals.kirim_wa_otomatis")
+@mock.patch("shop.signals.kirim_email_notifikasi")
+class BulkStatusTests(TestCase):
+    def setUp(self):
+        self.orders = [buat_order(f"user{i}", status="PROCESSING") for i in range(4)]
+        self.pending = buat_order("pending", status="PENDING")
+
+    @override_settings(NOTIFICATION_ASYNC=False)
+    def test_bulk_transition_is_one_update(self, mock_email, mock_wa):
+        ids = [o.id for o in self.orders] + [self.pending.id]
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as ctx:
+                updated, skipped = bulk_ubah_status(ids, "SHIPPED")
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(len(updated), 4)
+        self.assertEqual([o.id for o in skipped], [self.pending.id])
+        self.assertEqual(Order.objects.filter(status="SHIPPED").count(), 4)
+        # notifikasi baru dikirim setelah commit, tidak di dalam request
+        self.assertEqual(mock_email.call_count, 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(mock_email.call_count, 4)
+        self.assertEqual(mock_wa.call_count, 4)
+
+    @override_settings(NOTIFICATION_ASYNC=False)
+    def test_rows_changed_concurrently_are_skipped(self, mock_email, mock_wa):
+        ids = [o.id for o in self.orders]
+        can_transition = Order.can_transition_to
+
+        def moved_by_other_process(order, new_status, field="status"):
+            # order[0] dipindah proses lain ke SHIPPED setelah dibaca
+            Order.objects.filter(pk=self.orders[0].pk).update(status="SHIPPED")
+            return can_transition(order, new_status, field)
+
+        with mock.patch.object(Order, "can_transition_to", moved_by_other_process):
+            with self.captureOnCommitCallbacks(execute=True):
+                updated, skipped = bulk_ubah_status(ids, "SHIPPED")
+        self.assertEqual(len(updated), 3)
+        self.assertEqual([o.id for o in skipped], [self.orders[0].id])
+        self.assertFalse(OrderStatusLog.objects.filter(order=self.orders[0]).exists())
+        self.assertEqual(mock_email.call_count, 3)
+
+    def test_unknown_status_rejected(self, mock_email, mock_wa):
+        with self.assertRaises(ValueError):
+            bulk_ubah_status([self.pending.id], "LOST")
+
+    def test_management_view_bulk_post(self, mock_email, mock_wa):
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post(reverse("shop:management_order_list"), {
+            "action": "bulk",
+            "bulk_status": "SHIPPED",
+            "order_ids": [o.id for o in self.orders],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(status="SHIPPED").count(), 4)
+
+
+# =========================
+# STATE MACHINE
+# =========================
+@mock.patch("shop.signals.kirim_wa_otomatis")
+@mock.patch("shop.signals.kirim_email_notifikasi")
+class OrderStateMachineTests(TestCase):
+    def setUp(self):
+        self.order = buat_order()
+        self.staff = User.objects.create_user("staff", is_staff=True)
+
+    def test_invalid_transition_rejected_without_query(self, mock_email, mock_wa):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = "SHIPPED"
+        with self.assertNumQueries(0):
+            with self.assertRaises(InvalidStatusTransition):
+                order.save()
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "PENDING")
+
+    def test_unknown_status_rejected(self, mock_email, mock_wa):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = "HILANG"
+        with self.assertRaises(InvalidStatusTransition):
+            order.save()
+
+    def test_transition_logged_with_actor_and_duration(self, mock_email, mock_wa):
+        order = Order.objects.get(pk=self.order.pk)
+        order.transition_to("PAID", actor=self.staff, source="test")
+        order.save()
+        order.transition_to("PROCESSING")
+        order.save(update_fields=["status"])
+        logs = list(OrderStatusLog.objects.filter(order=order))
+        self.assertEqual([(l.from_status, l.to_status) for l in logs],
+                        [("PENDING", "PAID"), ("PAID", "PROCESSING")])
+        self.assertEqual(logs[0].actor, self.staff)
+        self.assertIsNone(logs[1].actor)
+        self.assertIsNotNone(Order.objects.get(pk=order.pk).status_changed_at)
+        avg = OrderStatusLog.objects.filter(from_status="PAID").aggregate(avg=Avg("duration"))
+        self.assertIsNotNone(avg["avg"])
+
+    def test_log_is_append_only(self, mock_email, mock_wa):
+        order = Order.objects.get(pk=self.order.pk)
+        order.transition_to("CANCELLED").save()
+        log = OrderStatusLog.objects.get(order=order)
+        with self.assertRaises(ValueError):
+            log.save()
+
+    def test_bulk_transition_writes_logs(self, mock_email, mock_wa):
+        bulk_ubah_status([self.order.id], "PAID", actor=self.staff)
+        log = OrderStatusLog.objects.get(order=self.order)
+        self.assertEqual((log.from_status, log.to_status, log.source), ("PENDING", "PAID", "bulk"))
+
+
+# =========================
+# MASTER DATA WILAYAH
+# =========================
+def fake_region_api(data):
+    return mock.Mock(side_effect=lambda *args: {"data": data[args] if args else data[()]})
+
+
+class RegionSyncTests(TestCase):
+    DATA = {
+        (): [{"id": 1, "name": "KALIMANTAN BARAT"}],
+        (1,): [{"id": 10, "name": "PONTIANAK"}],
+        (10,): [{"id": 100, "name": "PONTIANAK KOTA", "zip_code": "78111"}],
+    }
+
+    def sync(self, *args):
+        with mock.patch("shop.management.commands.sync_regions.get_provinces", fake_region_api(self.DATA)) as p, \
+             mock.patch("shop.management.commands.sync_regions.get_cities", fake_region_api(self.DATA)) as c, \
+             mock.patch("shop.management.commands.sync_regions.get_subdistricts", fake_region_api(self.DATA)) as d:
+            call_command("sync_regions", *args, stdout=mock.Mock())
+        return p.call_count + c.call_count + d.call_count
+
+    def test_sync_is_incremental(self):
+        self.assertEqual(self.sync(), 3)
+        self.assertEqual(District.objects.get(pk=100).city.province.name, "KALIMANTAN BARAT")
+        # data masih segar: hanya daftar provinsi yang diambil ulang
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual(self.sync("--full"), 3)
+
+    def test_sync_removes_vanished_regions(self):
+        self.sync()
+        City.objects.create(id=11, province_id=1, name="KOTA LAMA")
+        self.sync("--full")
+        self.assertFalse(City.objects.filter(pk=11).exists())
+
+    def test_stale_or_empty_response_keeps_regions(self):
+        self.sync()
+        synced_at = City.objects.get(pk=10).synced_at
+        for response in ({"data": [], "success": True}, {"data": self.DATA[(1,)], "stale": True}):
+            with mock.patch("shop.management.commands.sync_regions.get_provinces", fake_region_api(self.DATA)), \
+                 mock.patch("shop.management.commands.sync_regions.get_cities", return_value=response), \
+                 mock.patch("shop.management.commands.sync_regions.get_subdistricts", return_value=response):
+                call_command("sync_regions", "--full", stdout=mock.Mock())
+        self.assertEqual(City.objects.get(pk=10).synced_at, synced_at)
+        self.assertTrue(District.objects.filter(pk=100).exists())
+
+    @mock.patch("shop.views.get_cities")
+    def test_api_serves_from_local_tables(self, upstream):
+        self.sync()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("shop:city_api"), {"province_id": 1})
+        upstream.assert_not_called()
+        self.assertEqual(response.json(), {"data": [{"id": 10, "name": "PONTIANAK"}]})
+        self.assertIn("max-age=86400", response["Cache-Control"])
+
+    @mock.patch("shop.views.get_provinces", return_value={"data": [{"id": 9, "name": "BALI"}]})
+    def test_api_falls_back_before_first_sync(self, upstream):
+        response = self.client.get(reverse("shop:province_api"))
+        self.assertEqual(response.json()["data"][0]["name"], "BALI")
+        self.assertNotIn("Cache-Control", response)
+
+
+# =========================
+# CACHE ONGKIR
+# =========================
+ONGKIR_OK = {"success": True, "data": {"data": [{"service": "REG", "cost": 12000, "etd": "2 day"}]}}
+
+
+@mock.patch("shop.shipping_quotes.get_shipping_cost", return_value=ONGKIR_OK)
+class ShippingQuoteCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_weight_bucket(self, upstream):
+        self.assertEqual(get_weight_bucket(1), 1000)
+        self.assertEqual(get_weight_bucket(1000), 1000)
+        self.assertEqual(get_weight_bucket(1001), 2000)
+
+    def test_hit_after_miss_within_bucket(self, upstream):
+        self.assertEqual(get_cached_shipping_cost(100, 1200, "jne")["cache"], "miss")
+        self.assertEqual(get_cached_shipping_cost(100, 1900, "JNE")["cache"], "hit")
+        upstream.assert_called_once_with(destination=100, weight=2000, courier="jne")
+        metrics = get_quote_metrics()
+        self.assertEqual((metrics["hit"], metrics["miss"], metrics["upstream_call"]), (1, 1, 1))
+        self.assertEqual(metrics["hit_ratio"], 0.5)
+
+    def test_failed_quote_not_cached(self, upstream):
+        upstream.return_value = {"success": False, "message": "timeout"}
+        get_cached_shipping_cost(100, 1000, "jne")
+        get_cached_shipping_cost(100, 1000, "jne")
+        self.assertEqual(upstream.call_count, 2)
+        self.assertEqual(get_quote_metrics()["upstream_error"], 2)
+
+    @mock.patch("shop.shipping_quotes.threading.Thread")
+    def test_stale_served_while_refreshing(self, thread, upstream):
+        get_cached_shipping_cost(100, 1000, "jne")
+        with self.settings(ONGKIR_CACHE_TTL=0):
+            result = get_cached_shipping_cost(100, 1000, "jne")
+        self.assertEqual(result["cache"], "stale")
+        thread.assert_called_once()
+        self.assertEqual(upstream.call_count, 1)
+
+    def test_concurrent_misses_make_one_upstream_call(self, upstream):
+        def slow(**kwargs):
+            time.sleep(0.1)
+            return ONGKIR_OK
+        upstream.side_effect = slow
+        results = []
+        workers = [
+            threading.Thread(target=lambda: results.append(get_cached_shipping_cost(200, 1000, "jne")))
+            for _ in range(5)
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual(upstream.call_count, 1)
+        self.assertTrue(all(r["success"] for r in results))
+
+    def test_api_check_ongkir_uses_cache(self, upstream):
+        url = reverse("shop:api_check_ongkir")
+        params = {"destination": 100, "courier": "jne", "weight": 1000}
+        self.client.get(url, params)
+        response = self.client.get(url, params)
+        self.assertEqual(response.json()["cache"], "hit")
+        upstream.assert_called_once()
+
+
+# =========================
+# FAN-OUT SEMUA KURIR
+# =========================
+def fake_courier_quote(delays):
+    def quote(destination, weight, courier):
+        time.sleep(delays.get(courier, 0))
+        return {"success": True, "data": {"data": [
+            {"service": f"{courier.upper()}-REG", "cost": 10000 + len(courier), "etd": "2-3 day"},
+            {"service": f"{courier.upper()}-YES", "cost": 20000, "etd": "1 day"},
+        ]}}
+    return quote
+
+
+class CourierFanOutTests(TestCase):
+    @mock.patch("shop.shipping_quotes.get_cached_shipping_cost",
+                side_effect=fake_courier_quote({"jne": 0.2, "jnt": 0.2, "sicepat": 0.2}))
+    def test_couriers_queried_in_parallel_and_sorted(self, _quote):
+        started = time.perf_counter()
+        result = get_all_courier_quotes(100, 1000, couriers=["jne", "jnt", "sicepat"], timeout=2)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(result["couriers"], {"jne": "ok", "jnt": "ok", "sicepat": "ok"})
+        costs = [s["cost"] for s in result["data"]]
+        self.assertEqual(costs, sorted(costs))
+        self.assertEqual(result["data"][0]["courier"], "jne")
+
+    @mock.patch("shop.shipping_quotes.get_cached_shipping_cost",
+                side_effect=fake_courier_quote({"sicepat": 1}))
+    def test_slow_courier_returns_partial(self, _quote):
+        result = get_all_courier_quotes(100, 1000, couriers=["jne", "sicepat"], timeout=0.3)
+        self.assertTrue(result["success"])
+        self.assertTrue(result["partial"])
+        self.assertEqual(result["couriers"]["sicepat"], "timeout")
+        self.assertEqual({s["courier"] for s in result["data"]}, {"jne"})
+
+    @mock.patch("shop.shipping_quotes.close_old_connections")
+    @mock.patch("shop.shipping_quotes.get_cached_shipping_cost",
+                side_effect=fake_courier_quote({}))
+    def test_worker_refreshes_db_connection(self, _quote, close_old):
+        get_all_courier_quotes(100, 1000, couriers=["jne"], timeout=2)
+        # sebelum dan sesudah lookup di thread executor
+        self.assertEqual(close_old.call_count, 2)
+
+    def test_endpoint_requires_destination(self):
+        response = self.client.get(reverse("shop:api_check_ongkir_all"))
+        self.assertEqual(response.status_code, 400)
+
+
+# =========================
+# HTTP CLIENT + CIRCUIT BREAKER
+# =========================
+class LatencyServer:
+    """Server HTTP lokal; tiap request membaca (delay, status) berikutnya dari ``plan``."""
+
+    def __init__(self):
+        self.plan = []
+        self.hits = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                server.hits += 1
+                delay, status = server.plan.pop(0) if server.plan else (0, 200)
+                time.sleep(delay)
+                body = json.dumps({"data": [{"id": 1, "name": "BALI"}]}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client sudah timeout
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.block_on_close = False
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ResilientClientTests(TestCase):
+    def setUp(self):
+        self.server = LatencyServer()
+        self.addCleanup(self.server.close)
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        return ResilientClient("fake", self.server.url, read_timeout=0.2, backoff=0, **kwargs)
+
+    def test_read_timeout_fails_fast(self):
+        self.server.plan = [(1, 200)]
+        started = time.perf_counter()
+        with self.assertRaises(requests.Timeout):
+            self.make_client(max_retries=0).get("/destination/province")
+        self.assertLess(time.perf_counter() - started, 0.8)
+
+    def test_idempotent_request_retried(self):
+        self.server.plan = [(0, 503)]
+        response = self.make_client(max_retries=2).get("/destination/province")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_post_not_retried_unless_idempotent(self):
+        self.server.plan = [(0, 503)]
+        with self.assertRaises(requests.HTTPError):
+            self.make_client(max_retries=2).post("/shipment")
+        self.assertEqual(self.server.hits, 1)
+
+    def test_breaker_opens_and_short_circuits(self):
+        client = self.make_client(max_retries=0)
+        self.server.plan = [(0, 503), (0, 503)]
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.get("/x")
+        with self.assertRaises(CircuitOpenError):
+            client.get("/x")
+        self.assertEqual(self.server.hits, 2)
+        metrics = client.get_metrics()
+        self.assertEqual(metrics["breaker_state"], "open")
+        self.assertEqual(metrics["short_circuited"], 1)
+
+    def test_half_open_probe_closes_breaker(self):
+        clock = FakeClock()
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(1, reset_timeout=10, clock=clock))
+        self.server.plan = [(0, 503)]
+        with self.assertRaises(requests.HTTPError):
+            client.get("/x")
+        clock.now = 11
+        self.assertEqual(client.get("/x").status_code, 200)
+        self.assertEqual(client.breaker.state, "closed")
+
+    def test_500_counts_as_failure_but_is_not_retried(self):
+        client = self.make_client(max_retries=2)
+        self.server.plan = [(0, 500)]
+        with self.assertRaises(requests.HTTPError):
+            client.get("/x")
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(client.breaker.failures, 1)
+
+    def test_unexpected_error_releases_half_open_probe(self):
+        clock = FakeClock()
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(1, reset_timeout=10, clock=clock))
+        self.server.plan = [(0, 503)]
+        with self.assertRaises(requests.HTTPError):
+            client.get("/x")
+        clock.now = 11
+        with mock.patch.object(client.session, "request", side_effect=requests.TooManyRedirects):
+            with self.assertRaises(requests.TooManyRedirects):
+                client.get("/x")
+        # RequestException lain dihitung gagal: breaker terbuka lagi
+        self.assertEqual(client.breaker.state, "open")
+        clock.now = 22
+        with mock.patch.object(client.session, "request", side_effect=KeyError):
+            with self.assertRaises(KeyError):
+                client.get("/x")
+        self.assertFalse(client.breaker.probe_in_flight)
+        self.assertEqual(client.get("/x").status_code, 200)
+        self.assertEqual(client.breaker.state, "closed")
+
+    def test_region_lookup_falls_back_to_last_good_response(self):
+        from . import shipping
+        cache.clear()
+        client = self.make_client(max_retries=0)
+        with mock.patch.object(shipping, "rajaongkir", client):
+            self.assertEqual(shipping.get_provinces()["data"][0]["name"], "BALI")
+            self.server.plan = [(0, 503), (0, 503)]
+            shipping.get_provinces()
+            fallback = shipping.get_provinces()
+        self.assertEqual(client.breaker.state, "open")
+        self.assertTrue(fallback["stale"])
+        self.assertEqual(fallback["data"][0]["name"], "BALI")
+
+
+# =========================
+# VERIFIKASI ONGKIR CHECKOUT
+# =========================
+def buat_keranjang(customer, quantity=2, stock=10):
+    category = ProductCategory.objects.create(name="KAOS POLOS")
+    product = Product.objects.create(category=category, name="Kaos Combed 30s", description="-", price=42000)
+    variant = ProductVariant.objects.create(
+        product=product, color=Color.objects.create(name="Hitam", hex_code="#000000"),
+        size=Size.objects.create(name="L"), stock=stock,
+    )
+    return CartItem.objects.create(customer=customer, product=product, variant=variant, quantity=quantity)
+
+
+@mock.patch("shop.shipping_quotes.get_shipping_cost", return_value=ONGKIR_OK)
+class CheckoutShippingVerificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("pembeli", email="pembeli@mail.com")
+        self.customer = Customer.objects.create(user=user, subdistrict_id="100")
+        buat_keranjang(self.customer)
+        self.client.force_login(user)
+
+    def post_checkout(self, cost="12000", service="REG"):
+        return self.client.post(reverse("shop:checkout"), {
+            "shipping_name": "Budi", "shipping_phone": "0812", "shipping_address": "Jl. A",
+            "shipping_city": "Pontianak", "shipping_province": "Kalbar", "shipping_postal_code": "78111",
+            "courier_code": "jne", "courier_service": service, "shipping_cost": cost,
+        })
+
+    def test_cached_quote_accepted_without_upstream_call(self, upstream):
+        get_cached_shipping_cost(100, 2000, "jne")
+        upstream.reset_mock()
+        self.post_checkout()
+        upstream.assert_not_called()
+        order = Order.objects.get()
+        self.assertEqual(order.shipping_cost, 12000)
+        self.assertEqual(order.total, 42000 * 2 + 12000)
+        self.assertEqual(order.shipping_estimation, "2 day")
+        item = order.items.get()
+        cart_variant = ProductVariant.objects.get()
+        self.assertEqual(
+            (item.product_name, item.variant_key, item.line_revenue),
+            ("Kaos Combed 30s", f"P{item.product_id}-V{cart_variant.pk}", 42000 * 2),
+        )
+
+    def test_tampered_cost_rejected(self, upstream):
+        get_cached_shipping_cost(100, 2000, "jne")
+        self.post_checkout(cost="1")
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_quote_requoted_once(self, upstream):
+        self.post_checkout()
+        upstream.assert_called_once()
+        self.assertTrue(Order.objects.exists())
+
+    def test_unknown_service_and_bad_cost(self, upstream):
+        get_cached_shipping_cost(100, 2000, "jne")
+        self.assertFalse(verify_shipping_cost(100, 2000, "jne", "OKE", "12000")["success"])
+        self.assertFalse(verify_shipping_cost(100, 2000, "jne", "REG", "abc")["success"])
+
+
+# =========================
+# POLLER TRACKING
+# =========================
+def fake_track_many(status):
+    return lambda waybills: {
+        awb: {"success": True, "awb": awb, "status": status} for _, awb in waybills
+    }
+
+
+class TrackingPollerTests(TestCase):
+    def setUp(self):
+        self.shipped = [
+            buat_order(f"kirim{i}", status="SHIPPED", shipping_status="PROCESSING",
+                    courier_code=courier, tracking_number=f"AWB{i}")
+            for i, courier in enumerate(["jne", "jne", "sicepat"])
+        ]
+        buat_order("belum", status="PAID", tracking_number="AWB-X")
+
+    def test_dummy_provider_marks_orders_shipped(self):
+        events = []
+        handler = lambda sender, order, old_status, new_status, **kw: events.append(new_status)
+        shipping_status_changed.connect(handler)
+        self.addCleanup(shipping_status_changed.disconnect, handler)
+        with CaptureQueriesContext(connection) as ctx:
+            summary = poll_tracking()
+        self.assertEqual(summary, {"polled": 3, "changed": 3, "failed": 0})
+        self.assertEqual(events, ["SHIPPED"] * 3)
+        self.assertEqual(Order.objects.filter(shipping_status="SHIPPED").count(), 3)
+        self.assertEqual(OrderStatusLog.objects.filter(source="tracking").count(), 3)
+        # SELECT + SELECT FOR UPDATE + 1 UPDATE per transisi + bulk_update
+        # + bulk_create (+ savepoint), tidak per order
+        self.assertLessEqual(len(ctx.captured_queries), 7)
+
+    def test_concurrent_edit_is_not_overwritten(self):
+        def due_then_edit(now, limit):
+            orders = due_orders(now, limit)
+            # staff mengubah shipping_status setelah order dibaca poller
+            Order.objects.filter(pk=self.shipped[0].pk).update(shipping_status="CANCELLED")
+            return orders
+        with mock.patch("shop.tracking.due_orders", side_effect=due_then_edit), \
+                mock.patch("shop.tracking.track_many", side_effect=fake_track_many("IN_TRANSIT")):
+            summary = poll_tracking()
+        self.assertEqual(summary["changed"], 2)
+        edited = Order.objects.get(pk=self.shipped[0].pk)
+        self.assertEqual(edited.shipping_status, "CANCELLED")
+        self.assertEqual(edited.tracking_status, "IN_TRANSIT")
+        self.assertFalse(OrderStatusLog.objects.filter(order=edited, source="tracking").exists())
+
+    def test_not_due_orders_skipped_and_interval_backs_off(self):
+        poll_tracking()
+        self.assertEqual(poll_tracking()["polled"], 0)
+        later = timezone.now() + timedelta(days=1)
+        with mock.patch("shop.tracking.track_many", side_effect=fake_track_many("IN_TRANSIT")):
+            poll_tracking(now=later)
+        order = Order.objects.get(pk=self.shipped[0].pk)
+        self.assertEqual(order.tracking_poll_interval, next_interval(next_interval(0, True), False))
+
+    @mock.patch("shop.tracking.track_many", side_effect=fake_track_many("DELIVERED"))
+    def test_delivered_stops_polling(self, _track):
+        poll_tracking()
+        self.assertEqual(Order.objects.filter(shipping_status="COMPLETED").count(), 3)
+        self.assertEqual(poll_tracking(now=timezone.now() + timedelta(days=2))["polled"], 0)
+
+    @mock.patch("shop.tracking.track_many", side_effect=requests.Timeout("lambat"))
+    def test_provider_failure_is_counted(self, _track):
+        summary = poll_tracking()
+        self.assertEqual(summary["failed"], 3)
+        self.assertEqual(Order.objects.filter(shipping_status="PROCESSING").count(), 3)
+
+
+# =========================
+# SHIPMENT PROVIDER REGISTRY
+# =========================
+class CountingProvider(DummyShipmentProvider):
+    calls = []
+
+    def create_shipments(self, orders):
+        self.calls.append(len(orders))
+        return super().create_shipments(orders)
+
+
+class ShipmentProviderTests(TestCase):
+    def setUp(self):
+        CountingProvider.calls = []
+
+    def test_default_provider_and_unknown_name(self):
+        self.assertIsInstance(get_shipment_provider(), DummyShipmentProvider)
+        with self.settings(SHIPMENT_PROVIDER="tidak-ada"):
+            with self.assertRaises(ValueError):
+                get_shipment_provider()
+
+    @override_settings(
+        SHIPMENT_PROVIDER="hitung",
+        SHIPMENT_PROVIDERS={"hitung": "shop.tests.CountingProvider"},
+    )
+    def test_bulk_buat_resi_uses_single_batch_call(self):
+        orders = [buat_order(f"resi{i}", status="PAID") for i in range(3)]
+        orders.append(buat_order("sudah", status="PAID", tracking_number="ADA"))
+        created, failed = bulk_buat_resi(orders)
+        self.assertEqual((len(created), failed), (3, []))
+        self.assertEqual(CountingProvider.calls, [3])
+        order = Order.objects.get(pk=orders[0].pk)
+        self.assertEqual(order.tracking_number, f"DUMMY-AWB-{order.pk}")
+        self.assertEqual(order.shipping_status, "PROCESSING")
+        self.assertEqual(OrderStatusLog.objects.filter(field="shipping_status").count(), 3)
+
+    def test_fixture_provider_replays_recording(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fp:
+            json.dump({"track": {"AWB1": {"success": True, "awb": "AWB1", "status": "DELIVERED"}}}, fp)
+        self.addCleanup(os.remove, fp.name)
+        provider = RecordedFixtureShipmentProvider(path=fp.name)
+        found = provider.track_many([("jne", "AWB1"), ("jne", "AWB2")])
+        self.assertEqual(found["AWB1"]["status"], "DELIVERED")
+        self.assertEqual(found["AWB2"]["status"], "IN_TRANSIT")
+
+    def test_async_track_many_matches_sync(self):
+        provider = RecordedFixtureShipmentProvider(latency_ms=50)
+        waybills = [("jne", f"AWB{i}") for i in range(8)]
+        start = time.monotonic()
+        found = asyncio.run(provider.atrack_many(waybills))
+        # 8 panggilan @50ms berjalan paralel, bukan 400ms berurutan
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(found, provider.track_many(waybills))
+
+    def test_fixture_batch_calls_do_not_change_shared_latency(self):
+        provider = RecordedFixtureShipmentProvider(latency_ms=20)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: provider.track_many([("jne", f"AWB{i}")]), range(8)))
+        self.assertEqual(provider.latency, 0.02)
+
+
+# =========================
+# FAKE EXTERNAL SERVICES
+# =========================
+class FakeServicesTests(TestCase):
+    def setUp(self):
+        self.fake = FakeServices(seed=1).start()
+        self.addCleanup(self.fake.close)
+
+    def test_rajaongkir_and_fonnte_shapes(self):
+        client = ResilientClient("fake", f"{self.fake.url}/rajaongkir")
+        response = client.post("/calculate/domestic-cost",
+                            data={"destination": 100, "weight": 2500, "courier": "jne"})
+        services = extract_services({"success": True, "data": response.json()})
+        self.assertEqual([s["service"] for s in services], ["REG", "YES"])
+        self.assertEqual(services[0]["cost"], 3 * (COURIER_RATES["jne"] + 100 % 7 * 500))
+        wa = FonnteClient(token="x", url=f"{self.fake.url}/fonnte/send", max_retries=0)
+        self.assertTrue(wa.send("0812", "halo")["status"])
+
+    def test_komship_provider_round_trip(self):
+        with self.settings(SHIPMENT_PROVIDER="komship", KOMSHIP_BASE_URL=f"{self.fake.url}/komship"):
+            order = buat_order(status="PAID", courier_code="jne", destination_subdistrict_id="100")
+            created = get_shipment_provider().create_shipment(order)
+            self.assertTrue(created["success"])
+            found = get_shipment_provider().track_many([("jne", created["awb"])])
+        self.assertEqual(found[created["awb"]]["status"], "IN_TRANSIT")
+
+    def test_injected_errors(self):
+        self.fake.overrides = {"fonnte": {"error_rate": 1.0}}
+        wa = FonnteClient(token="x", url=f"{self.fake.url}/fonnte/send", max_retries=0)
+        self.assertIsNone(wa.send("0812", "halo"))
+        self.assertEqual(self.fake.hits["fonnte"], 1)
+
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    def test_signed_notification_accepted_by_callback(self, _wa):
+        order = buat_order(total=150000)
+        server_key = settings.MIDTRANS_SERVER_KEY.strip()
+        notification = build_midtrans_notification(f"NEW-AF-{order.id}-abc123", 150000,
+                                                server_key=server_key)
+        tampered = {**notification, "gross_amount": "1.00"}
+        url = reverse("shop:midtrans_callback")
+        self.assertEqual(self.client.post(url, tampered, content_type="application/json").status_code, 403)
+        self.client.post(url, notification, content_type="application/json")
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "PAID")
+
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    def test_settlement_after_expire_is_not_shipped(self, _wa):
+        order = buat_order(total=150000)
+        Payment.objects.create(order=order, amount=150000, external_id=f"ORDER-1-{order.id}")
+        url = reverse("shop:midtrans_callback")
+        for status in ("expire", "settlement"):
+            self.client.post(url, {"order_id": f"ORDER-1-{order.id}", "transaction_status": status},
+                            content_type="application/json")
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual(order.status, "CANCELLED")
+        self.assertFalse(order.tracking_number)
+        self.assertNotEqual(order.shipping_status, "PROCESSING")
+        self.assertEqual(Payment.objects.get(order=order).status, "REFUND_PENDING")
+
+
+# =========================
+# MATRIX ONGKIR
+# =========================
+@mock.patch("shop.ongkir_matrix.get_shipping_cost", return_value=ONGKIR_OK)
+class OngkirMatrixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, (dest, weight) in enumerate([("100", 900), ("100", 1500), ("100", 1800), ("200", 1200)]):
+            buat_order(f"matrix{i}", destination_subdistrict_id=dest, total_weight=weight)
+
+    def test_top_destinations_and_weights(self, upstream):
+        self.assertEqual(top_destinations(limit=1), [100])
+        self.assertEqual(top_weight_buckets(limit=1), [2000])
+        # halaman keyset kecil memberi hasil yang sama
+        self.assertEqual(top_weight_buckets(limit=1, batch_size=1), [2000])
+
+    def test_precompute_is_incremental_and_served_from_table(self, upstream):
+        summary = precompute_matrix([100, 200], [1000, 2000], couriers=["jne", "pos"], rate=100)
+        self.assertEqual((summary["stored"], summary["failed"]), (8, 0))
+        again = precompute_matrix([100, 200], [1000, 2000], couriers=["jne", "pos"], rate=100)
+        self.assertEqual((again["skipped"], again["stored"]), (8, 0))
+        self.assertEqual(upstream.call_count, 8)
+        cache.clear()
+        with mock.patch("shop.shipping_quotes.get_shipping_cost") as live:
+            result = get_cached_shipping_cost(100, 1500, "jne")
+            self.assertEqual(get_cached_shipping_cost(100, 1500, "jne")["cache"], "hit")
+        live.assert_not_called()
+        self.assertEqual(result["cache"], "table")
+        self.assertEqual(extract_services(result)[0]["cost"], 12000)
+
+    def test_expired_rows_are_ignored(self, upstream):
+        precompute_matrix([100], [1000], couriers=["jne"], rate=100)
+        ShippingQuote.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+        cache.clear()
+        with mock.patch("shop.shipping_quotes.get_shipping_cost", return_value=ONGKIR_OK) as live:
+            self.assertEqual(get_cached_shipping_cost(100, 1000, "jne")["cache"], "miss")
+        live.assert_called_once()
+
+
+# =========================
+# MULTI-PARCEL
+# =========================
+def tiered_quote(destination, weight, courier):
+    # tarif per kg naik 50% untuk paket di atas 20 kg
+    kg = weight // 1000
+    rate = 10000 if kg <= 20 else 15000
+    return {"success": True, "data": {"data": [
+        {"service": "REG", "description": "Reguler", "cost": kg * rate, "etd": "2 day"},
+    ]}}
+
+
+@mock.patch("shop.shipping_quotes.get_shipping_cost", side_effect=tiered_quote)
+class ParcelSplitTests(TestCase):
+    LINES = [{"key": "1:v1", "name": "Kaos", "weight": 1000, "quantity": 35}]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cheapest_split_found(self, upstream):
+        plan = plan_shipping(self.LINES, 100, "jne")
+        best = plan["data"][0]
+        # 18 + 17 kg lebih murah daripada 30 + 5 kg
+        self.assertEqual(best["cost"], 350000)
+        self.assertEqual([p["weight"] for p in best["parcels"]], [18000, 17000])
+        self.assertEqual(sum(i["quantity"] for p in best["parcels"] for i in p["items"]), 35)
+
+    def test_oversized_item_and_budget(self, upstream):
+        heavy = [{"key": "2:v1", "name": "Mesin", "weight": 31000, "quantity": 1}]
+        self.assertFalse(plan_shipping(heavy, 100, "jne")["success"])
+        plan = plan_shipping(self.LINES, 100, "jne", budget=0)
+        self.assertTrue(plan["timed_out"])
+        self.assertFalse(plan["success"])
+
+    def test_large_line_is_packed_without_per_unit_work(self, upstream):
+        lines = [{"key": "3:v1", "name": "Stiker", "weight": 10, "quantity": 2_000_000}]
+        started = time.perf_counter()
+        plan = plan_shipping(lines, 100, "jne", budget=1)
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertTrue(plan["success"])
+        parcels = plan["data"][0]["parcels"]
+        self.assertEqual(sum(i["quantity"] for p in parcels for i in p["items"]), 2_000_000)
+        self.assertTrue(all(p["weight"] <= 30000 for p in parcels))
+
+    def test_checkout_stores_parcel_plan(self, upstream):
+        user = User.objects.create_user("grosir", email="grosir@mail.com")
+        customer = Customer.objects.create(user=user, subdistrict_id="100")
+        buat_keranjang(customer, quantity=35, stock=50)
+        self.client.force_login(user)
+        quote = self.client.get(reverse("shop:api_check_ongkir_split"), {"courier": "jne"}).json()
+        self.assertTrue(quote["split"])
+        cost = quote["data"]["data"][0]["cost"]
+        self.client.post(reverse("shop:checkout"), {
+            "shipping_name": "Budi", "shipping_phone": "0812", "shipping_address": "Jl. A",
+            "shipping_city": "Pontianak", "shipping_province": "Kalbar", "shipping_postal_code": "78111",
+            "courier_code": "jne", "courier_service": "REG", "shipping_cost": cost,
+        })
+        order = Order.objects.get()
+        self.assertEqual(order.shipping_cost, 350000)
+        self.assertEqual(len(order.parcel_plan), 2)
+
+
+# =========================
+# ROLLUP PENJUALAN HARIAN
+# =========================
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name="KAOS")
+        self.product = Product.objects.create(category=category, name="Kaos Polos", description="-", price=50000)
+        self.today = timezone.localdate()
+        # fixture dianggap sudah di-commit: delta rollup-nya dijalankan di sini
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orders = [
+                self.order_on(self.today - timedelta(days=3), "PAID", qty=2),
+                self.order_on(self.today - timedelta(days=3), "CANCELLED", qty=1),
+                self.order_on(self.today - timedelta(days=1), "COMPLETED", qty=4),
+                self.order_on(self.today, "PAID", qty=1),
+            ]
+
+    def order_on(self, day, status, qty):
+        order = buat_order(f"rollup{Order.objects.count()}", status=status, total=50000 * qty)
+        OrderItem.objects.create(order=order, product=self.product, quantity=qty, unit_price=50000)
+        Order.objects.filter(pk=order.pk).update(created_at=day_bounds(day)[0] + timedelta(hours=10))
+        return order
+
+    def test_backfill_and_summary(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        self.assertEqual(DailySalesRollup.objects.filter(product_key=0).count(), 4)
+        summary = sales_summary(self.today - timedelta(days=365), self.today)
+        self.assertEqual(summary["total_orders"], 4)
+        self.assertEqual(summary["total_revenue"], 50000 * 7)
+        self.assertEqual(
+            [(p["product_name"], p["qty"], p["revenue"]) for p in summary["top_products"]],
+            [("Kaos Polos", 7, 50000 * 7)],
+        )
+        past = sales_summary(self.today - timedelta(days=3), self.today - timedelta(days=3))
+        self.assertEqual((past["total_orders"], past["paid_orders_count"]), (2, 1))
+
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    def test_transition_refreshes_day(self, _wa):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        order = Order.objects.get(pk=self.orders[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.transition_to("CANCELLED")
+            order.save()
+        row = DailySalesRollup.objects.get(date=self.today - timedelta(days=3), status="CANCELLED", product_key=0)
+        self.assertEqual(row.order_count, 2)
+        self.assertEqual(sales_summary()["total_revenue"], 50000 * 5)
+
+    def rollup_rows(self):
+        return sorted(DailySalesRollup.objects.values_list(
+            "date", "status", "product_key", "variant_key",
+            "order_count", "item_quantity", "revenue",
+        ))
+
+    @override_settings(NOTIFICATION_ASYNC=False)
+    @mock.patch("shop.signals.kirim_wa_otomatis")
+    def test_deltas_match_full_rebuild(self, _wa):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                order = buat_order("checkout", total=0)
+                OrderItem.objects.create(order=order, product=self.product, quantity=3, unit_price=50000)
+                order.total = 50000 * 3
+                order.save()
+        # satu checkout -> satu callback rollup, tidak ada hitung ulang hari
+        self.assertEqual(len(callbacks), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            callbacks[0]()
+        self.assertFalse(any(q["sql"].startswith("DELETE") for q in ctx.captured_queries))
+        with self.captureOnCommitCallbacks(execute=True):
+            past = Order.objects.get(pk=self.orders[0].pk)
+            past.transition_to("PROCESSING")
+            past.save()
+            bulk_ubah_status([self.orders[2].pk], "CANCELLED")
+            Order.objects.get(pk=self.orders[1].pk).delete()
+        incremental = self.rollup_rows()
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_migration_builds_rollups_for_existing_orders(self):
+        migration = importlib.import_module("shop.migrations.0035_build_sales_rollup")
+        DailySalesRollup.objects.all().delete()
+        # batch kecil: order & item dibaca lintas beberapa halaman keyset
+        migration.build_sales_rollup(django_apps, None, batch_size=3)
+        built = self.rollup_rows()
+        self.assertTrue(built)
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        self.assertEqual(built, self.rollup_rows())
+
+    def test_delta_runs_robust_on_commit(self):
+        with self.captureOnCommitCallbacks():
+            buat_order("robust")
+        self.assertTrue(connection.run_on_commit[-1][2])
+
+    def test_rolled_back_transaction_drops_delta(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    buat_order("batal", total=10000)
+                    raise ValueError("checkout gagal")
+            except ValueError:
+                pass
+            buat_order("jadi", total=20000)
+        incremental = self.rollup_rows()
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_concurrent_first_insert_is_not_lost(self):
+        day = self.today - timedelta(days=10)
+        delta = RollupDelta()
+        delta.add_order(day, "PAID", 30000)
+        update = QuerySet.update
+        def racing_update(qs, **kwargs):
+            # transaksi lain membuat baris yang sama setelah UPDATE pertama
+            if qs.model is DailySalesRollup and not DailySalesRollup.objects.filter(date=day).exists():
+                DailySalesRollup.objects.create(date=day, status="PAID", order_count=1, revenue=10000)
+                return 0
+            return update(qs, **kwargs)
+        with mock.patch.object(QuerySet, "update", racing_update):
+            delta.apply()
+        row = DailySalesRollup.objects.get(date=day, status="PAID", product_key=0)
+        self.assertEqual((row.order_count, row.revenue), (2, 40000))
+
+    def test_revenue_only_delta_creates_row(self):
+        day = self.today - timedelta(days=10)
+        delta = RollupDelta()
+        delta.add(day, "PAID", revenue=5000)
+        delta.apply()
+        row = DailySalesRollup.objects.get(date=day, status="PAID", product_key=0)
+        self.assertEqual((row.order_count, row.revenue), (0, 5000))
+
+    def test_report_reads_rollups(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        start = (self.today - timedelta(days=365)).isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("shop:management_sales_report"),
+                                    {"start": start, "end": self.today.isoformat()})
+        self.assertEqual(response.context["total_revenue"], 50000 * 7)
+        # rollup (2) + hari ini (2) + daftar order, bukan per order
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+    def test_dashboard_single_query_cached_and_invalidated(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        cache.clear()
+        with self.assertNumQueries(1):
+            stats = dashboard_stats()
+        with self.assertNumQueries(0):
+            dashboard_stats()
+        self.assertEqual((stats["total_orders"], stats["paid_orders_count"]), (4, 3))
+        self.assertEqual(stats["cancelled_orders_count"], 1)
+        order = Order.objects.get(pk=self.orders[3].pk)
+        with mock.patch("shop.signals.kirim_wa_otomatis"), self.captureOnCommitCallbacks(execute=True):
+            order.transition_to("CANCELLED")
+            order.save()
+        self.assertEqual(dashboard_stats()["cancelled_orders_count"], 2)
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("shop:management_dashboard"))
+        self.assertEqual(response.context["total_revenue"], 50000 * 6)
+
+    def test_variant_analytics_from_rollups_and_today(self):
+        other = Product.objects.create(category=self.product.category, name="Hoodie", description="-", price=150000)
+        for day, qty in ((self.today - timedelta(days=2), 2), (self.today, 2)):
+            order = self.order_on(day, "PAID", qty=1)
+            OrderItem.objects.create(
+                order=order, product=other, quantity=qty, unit_price=150000,
+                variant_key=f"P{other.pk}-V9", variant_label="Hitam - XL",
+            )
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        start = self.today - timedelta(days=30)
+        by_units = product_analytics(start, self.today)
+        self.assertEqual([(r["product_name"], r["qty"]) for r in by_units], [("Kaos Polos", 9), ("Hoodie", 4)])
+        by_revenue = product_analytics(start, self.today, sort="revenue", top=1)
+        self.assertEqual([(r["product_name"], r["revenue"]) for r in by_revenue], [("Hoodie", 600000)])
+        variants = product_analytics(start, self.today, by="variant")
+        self.assertEqual(
+            [(r["variant_key"], r["variant_label"], r["qty"]) for r in variants],
+            [(f"P{self.product.pk}", "", 9), (f"P{other.pk}-V9", "Hitam - XL", 4)],
+        )
+        # rollup tidak menyimpan JOIN ke Product: nama tetap snapshot
+        Product.objects.filter(pk=other.pk).update(name="Hoodie Baru")
+        names = {r["product_name"] for r in product_analytics(start, self.today)}
+        self.assertEqual(names, {"Kaos Polos", "Hoodie"})
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("shop:management_product_analytics"),
+                                   {"by": "variant", "sort": "revenue", "top": "abc"})
+        self.assertEqual(response.context["rows"][0]["variant_label"], "Hitam - XL")
+        self.assertEqual(response.context["top"], 20)
+
+    def test_revenue_series_gap_filled_and_cached(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        start = self.today - timedelta(days=4)
+        series = revenue_series(start, self.today)
+        self.assertEqual([p["label"] for p in series], [
+            (start + timedelta(days=i)).isoformat() for i in range(5)
+        ])
+        self.assertEqual([p["revenue"] for p in series], [0, 100000, 0, 200000, 50000])
+        self.assertEqual([p["orders"] for p in series], [0, 1, 0, 1, 1])
+        # hari lalu dari cache, hanya hari ini yang dihitung langsung
+        with self.assertNumQueries(1):
+            revenue_series(start, self.today)
+        revenue_series(start, self.today - timedelta(days=1))
+        with self.assertNumQueries(0):
+            revenue_series(start, self.today - timedelta(days=1))
+        # order baru hari ini tidak mengganti versi cache hari lalu
+        version = cache.get("rollup:version")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order_on(self.today, "PAID", qty=2)
+        self.assertEqual(cache.get("rollup:version"), version)
+        self.assertEqual(revenue_series(start, self.today)[-1]["revenue"], 150000)
+        self.assertEqual(revenue_series(start, self.today)[-1]["avg_order_value"], 75000)
+        months = revenue_series(self.today - timedelta(days=40), self.today, "month")
+        self.assertTrue(all(len(p["label"]) == 7 for p in months))
+        self.assertEqual(sum(p["revenue"] for p in months), 450000)
+        # pindah antar status omzet tidak mengubah deret, versi tetap
+        order = Order.objects.get(pk=self.orders[0].pk)
+        version = cache.get("rollup:version")
+        with mock.patch("shop.signals.kirim_wa_otomatis"), self.captureOnCommitCallbacks(execute=True):
+            order.transition_to("PROCESSING")
+            order.save()
+        self.assertEqual(cache.get("rollup:version"), version)
+        # keluar dari status omzet pada hari lalu mengganti versi cache
+        with mock.patch("shop.signals.kirim_wa_otomatis"), self.captureOnCommitCallbacks(execute=True):
+            order.transition_to("CANCELLED")
+            order.save()
+        self.assertNotEqual(cache.get("rollup:version"), version)
+        self.assertEqual(revenue_series(start, self.today)[1]["revenue"], 0)
+
+    def test_revenue_series_api(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("shop:api_revenue_series")
+        data = self.client.get(url, {"bucket": "week"}).json()
+        self.assertTrue(data["success"])
+        self.assertIn(len(data["data"]), (12, 13))
+        self.assertRegex(data["data"][-1]["label"], r"^\d{4}-W\d{2}$")
+        self.assertEqual(sum(p["revenue"] for p in data["data"]), 350000)
+        self.assertEqual(self.client.get(url, {"bucket": "year"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "2000-01-01"}).status_code, 400)
+
+    def test_streaming_csv_export(self):
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("shop:management_sales_report_export")
+        start = (self.today - timedelta(days=1)).isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"start": start, "end": self.today.isoformat()})
+            rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertTrue(response.streaming)
+        self.assertEqual([r[0] for r in rows[1:]], [str(self.orders[3].pk), str(self.orders[2].pk)])
+        self.assertEqual(rows[1][3], "Sudah Dibayar")
+        # sesi + user + satu query export, tidak ada query per baris
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+        response = self.client.get(url, {"detail": "items"})
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][4], "Kaos Polos")
+        self.assertEqual(rows[1][-1], "50000.00")
+
+    def test_export_pages_by_keyset(self):
+        # created_at sama untuk dua order: urutan tetap ditentukan id
+        Order.objects.filter(pk=self.orders[1].pk).update(created_at=self.orders[0].created_at)
+        full = list(iter_order_rows(chunk_size=100))
+        with CaptureQueriesContext(connection) as ctx:
+            paged = list(iter_order_rows(chunk_size=1))
+        self.assertEqual(paged, full)
+        self.assertEqual(len(ctx.captured_queries), 5)
+        self.assertNotIn("OFFSET", ctx.captured_queries[-1]["sql"])
+        self.assertEqual(list(iter_item_rows(chunk_size=3)), list(iter_item_rows(chunk_size=100)))
+
+    def test_xlsx_export_typed_sheets(self):
+        call_command("backfill_sales_rollup", stdout=mock.Mock())
+        staff = User.objects.create_user("admin", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("shop:management_sales_report_xlsx"))
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ["Pesanan", "Item", "Produk Terlaris"])
+        orders = workbook["Pesanan"]
+        self.assertEqual(orders.max_row, 5)
+        self.assertIsInstance(orders["B2"].value, datetime)
+        self.assertEqual(orders["E2"].value, 50000)
+        self.assertEqual(orders["E2"].number_format, "#,##0")
+        self.assertEqual(workbook["Produk Terlaris"]["B2"].value, 7)
+        response = self.client.get(reverse("shop:management_sales_report_xlsx"), {"sheets": "items"})
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ["Item"])
+
+
+# =========================
+# DAFTAR ORDER MANAJEMEN (KEYSET)
+# =========================
+class ManagementOrderListTests(TestCase):
+    def setUp(self):
+        base = timezone.now() - timedelta(days=2)
+        self.orders = []
+        for i in range(7):
+            order = buat_order(
+                f"list{i}",
+                status="PAID" if i % 2 else "PENDING",
+                courier_code="jne" if i < 4 else "jnt",
+                shipping_city="Pontianak" if i % 3 else "Singkawang",
+            )
+            # dua order berbagi created_at agar id ikut menentukan urutan
+            Order.objects.filter(pk=order.pk).update(created_at=base + timedelta(minutes=i // 2 * 10))
+            self.orders.append(order)
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        self.url = reverse("shop:management_order_list")
+
+    def ids(self, response):
+        return [o.pk for o in response.context["orders"]]
+
+    def expected(self, orders):
+        orders = sorted(orders, key=lambda o: (Order.objects.get(pk=o.pk).created_at, o.pk), reverse=True)
+        return [o.pk for o in orders]
+
+    def test_pages_forward_and_back(self):
+        with mock.patch("shop.views.ORDER_LIST_PAGE_SIZE", 3):
+            first = self.client.get(self.url)
+            page = first.context["page"]
+            self.assertFalse(page.has_previous)
+            second = self.client.get(self.url, {"after": page.next_cursor})
+            third = self.client.get(self.url, {"after": second.context["page"].next_cursor})
+            back = self.client.get(self.url, {"before": second.context["page"].previous_cursor})
+        seen = self.ids(first) + self.ids(second) + self.ids(third)
+        self.assertEqual(seen, self.expected(self.orders))
+        self.assertIsNone(third.context["page"].next_cursor)
+        self.assertEqual(self.ids(back), self.ids(first))
+        self.assertFalse(back.context["page"].has_previous)
+
+    def test_filters_and_facets(self):
+        response = self.client.get(self.url, {"courier": "jne", "city": "Pontianak"})
+        matching = [o for o in self.orders if o.courier_code == "jne" and o.shipping_city == "Pontianak"]
+        self.assertEqual(self.ids(response), self.expected(matching))
+        counts = {f["code"]: f["count"] for f in response.context["facets"]}
+        self.assertEqual((counts["PAID"], counts["PENDING"], counts["SHIPPED"]), (1, 1, 0))
+        response = self.client.get(self.url, {"courier": "jne", "city": "Pontianak", "status": "PAID"})
+        self.assertEqual(self.ids(response), [self.orders[1].pk])
+        # hitungan per status tetap atas filter lain, tanpa filter status
+        self.assertEqual(response.context["facet_total"], 2)
+        self.assertIn("courier=jne", response.context["filter_query"])
+
+    def test_date_facets_count_only(self):
+        day = timezone.localdate().isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {"start": day, "end": day})
+        self.assertEqual(response.context["facet_total"], 0)
+        # hitungan per status saja, tanpa analitik produk dari OrderItem
+        self.assertFalse(any("shop_orderitem" in q["sql"] for q in ctx.captured_queries))
+
+    def test_query_count_independent_of_page(self):
+        with mock.patch("shop.views.ORDER_LIST_PAGE_SIZE", 2):
+            with CaptureQueriesContext(connection) as small:
+                response = self.client.get(self.url, {"courier": "jnt"})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url, {"courier": "jnt", "after": response.context["page"].next_cursor})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertFalse(any("OFFSET" in q["sql"] for q in large.captured_queries))
+
+
+# =========================
+# RENTANG TANGGAL & INDEX
+# =========================
+class DateRangeIndexTests(TestCase):
+    def test_day_bounds_are_local_half_open(self):
+        start, end = day_bounds(datetime(2025, 1, 31).date())
+        self.assertEqual(str(start.tzinfo), "Asia/Pontianak")
+        self.assertEqual(start.isoformat(), "2025-01-31T00:00:00+07:00")
+        self.assertEqual(end - start, timedelta(days=1))
+        order = buat_order()
+        Order.objects.filter(pk=order.pk).update(created_at=end - timedelta(microseconds=1))
+        in_day = created_range_q(start.date(), start.date())
+        self.assertEqual(list(Order.objects.filter(in_day)), [order])
+        Order.objects.filter(pk=order.pk).update(created_at=end)
+        self.assertFalse(Order.objects.filter(in_day).exists())
+
+    def plan(self, queryset):
+        # SQLite: EXPLAIN QUERY PLAN menyebut nama index yang dipakai
+        return queryset.explain()
+
+    def test_report_queries_use_composite_indexes(self):
+        day = timezone.localdate()
+        in_range = created_range_q(day - timedelta(days=30), day)
+        self.assertIn("shop_order_created_idx", self.plan(
+            Order.objects.filter(in_range).order_by("-created_at")
+        ))
+        self.assertIn("shop_order_status_created_idx", self.plan(
+            Order.objects.filter(in_range, status="PAID")
+        ))
+        customer = buat_order().customer
+        self.assertIn("shop_order_customer_idx", self.plan(
+            Order.objects.filter(customer=customer).order_by("-created_at")
+        ))
+        self.assertIn("shop_payment_status_idx", self.plan(
+            Payment.objects.filter(created_range_q(day, day), status="PAID")
+        ))
+        self.assertIn("shop_payment_external_idx", self.plan(
+            Payment.objects.filter(external_id="AF-1-123")
+        ))
+
+
+# =========================
+# ADMIN TABEL BESAR
+# =========================
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("root", "root@mail.com", "x")
+        self.client.force_login(self.admin)
+
+    def make_orders(self, count, start=0):
+        orders = []
+        for i in range(start, start + count):
+            order = buat_order(f"adm{i}", shipping_phone=f"0812000{i:04d}")
+            Payment.objects.create(order=order, amount=order.total, external_id=f"AF-{order.pk}-1")
+            orders.append(order)
+        return orders
+
+    def changelist_queries(self, model):
+        url = reverse(f"admin:shop_{model}_changelist")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_query_count_constant(self):
+        self.make_orders(2)
+        small = {m: self.changelist_queries(m) for m in ("order", "customer", "payment")}
+        self.make_orders(20, start=2)
+        large = {m: self.changelist_queries(m) for m in ("order", "customer", "payment")}
+        self.assertEqual(small, large)
+
+    def test_exact_search_by_id_and_phone(self):
+        orders = self.make_orders(3)
+        url = reverse("admin:shop_order_changelist")
+        response = self.client.get(url, {"q": f"#{orders[1].pk}"})
+        self.assertEqual(list(response.context["cl"].result_list), [orders[1]])
+        response = self.client.get(url, {"q": "08120000002"})
+        self.assertEqual(list(response.context["cl"].result_list), [orders[2]])
+        response = self.client.get(url, {"q": "adm"})
+        self.assertEqual(response.context["cl"].result_count, 3)
+        Order.objects.filter(pk=orders[0].pk).update(shipping_name="Siti Aminah")
+        response = self.client.get(url, {"q": "siti"})
+        self.assertEqual(list(response.context["cl"].result_list), [orders[0]])
+        response = self.client.get(reverse("admin:shop_payment_changelist"), {"q": f"AF-{orders[0].pk}-1"})
+        self.assertEqual([p.order_id for p in response.context["cl"].result_list], [orders[0].pk])
+
+    def test_estimated_count_for_unfiltered_changelist(self):
+        self.make_orders(2)
+        with mock.patch("shop.pagination.estimated_row_count", return_value=250000):
+            response = self.client.get(reverse("admin:shop_order_changelist"))
+            self.assertEqual(response.context["cl"].result_count, 250000)
+            response = self.client.get(reverse("admin:shop_order_changelist"), {"status__exact": "PENDING"})
+            self.assertEqual(response.context["cl"].result_count, 2)
+
+
+# =========================
+# MATRIKS STOK VARIAN
+# =========================
+class StockMatrixTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name="KAOS")
+        self.product = Product.objects.create(category=category, name="Kaos 24s", description="-", price=52000)
+        self.colors = [Color.objects.create(name=n, hex_code="#000000") for n in ("Hitam", "Putih", "Merah")]
+        self.sizes = [Size.objects.create(name=n) for n in ("S", "M", "L")]
+        self.variants = {
+            (c.pk, s.pk): ProductVariant.objects.create(product=self.product, color=c, size=s, stock=5)
+            for c in self.colors[:2] for s in self.sizes[:2]
+        }
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        self.url = reverse("shop:management_stock_matrix", args=[self.product.pk])
+
+    def cell(self, color, size):
+        return f"{color.pk}-{size.pk}"
+
+    def test_matrix_lists_existing_colours_and_sizes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["sizes"], self.sizes[:2])
+        self.assertEqual([color for color, _ in response.context["rows"]], self.colors[:2])
+        response = self.client.get(self.url, {"all": "1"})
+        self.assertEqual(len(response.context["rows"]), 3)
+        self.client.force_login(User.objects.create_superuser("root", "root@mail.com", "x"))
+        response = self.client.get(reverse("admin:shop_product_change", args=[self.product.pk]))
+        self.assertContains(response, self.url)
+
+    def test_restock_in_one_request(self):
+        black_s, white_m = self.cell(self.colors[0], self.sizes[0]), self.cell(self.colors[1], self.sizes[1])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(self.url, {
+                f"stock-{black_s}": "20", f"version-{black_s}": "5",
+                f"stock-{white_m}": "+10", f"price-{white_m}": "60000",
+            })
+        # sesi + user + SELECT FOR UPDATE + bulk_update + savepoint, tanpa query per sel
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        stocks = {(v.color_id, v.size_id): (v.stock, v.price_override) for v in ProductVariant.objects.all()}
+        self.assertEqual(stocks[(self.colors[0].pk, self.sizes[0].pk)], (20, None))
+        self.assertEqual(stocks[(self.colors[1].pk, self.sizes[1].pk)], (15, 60000))
+        self.assertEqual(stocks[(self.colors[0].pk, self.sizes[1].pk)], (5, None))
+
+    def test_stale_version_rejected_after_checkout_decrement(self):
+        variant = self.variants[(self.colors[0].pk, self.sizes[0].pk)]
+        decrement_stock(variant, 2)
+        cell = self.cell(self.colors[0], self.sizes[0])
+        other = self.cell(self.colors[1], self.sizes[0])
+        response = self.client.post(self.url, {
+            f"stock-{cell}": "30", f"version-{cell}": "5",
+            f"stock-{other}": "30", f"version-{other}": "5",
+        }, follow=True)
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 3)
+        self.assertEqual(ProductVariant.objects.filter(stock=30).count(), 0)
+        self.assertIn("stok berubah dari 5 menjadi 3", str(list(response.context["messages"])[0]))
+
+    def test_new_combination_created_and_invalid_value_rejected(self):
+        cell = self.cell(self.colors[2], self.sizes[2])
+        self.client.post(self.url, {f"stock-{cell}": "7"})
+        self.assertEqual(ProductVariant.objects.get(color=self.colors[2], size=self.sizes[2]).stock, 7)
+        self.client.post(self.url, {f"stock-{cell}": "-1", f"version-{cell}": "7"})
+        self.assertEqual(ProductVariant.objects.get(color=self.colors[2], size=self.sizes[2]).stock, 7)
+
+    def test_decrement_stock_is_conditional(self):
+        variant = self.variants[(self.colors[0].pk, self.sizes[0].pk)]
+        with self.assertRaises(InsufficientStock):
+            decrement_stock(variant, 6)
+        self.assertEqual(ProductVariant.objects.get(pk=variant.pk).stock, 5)
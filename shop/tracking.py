@@ -0,0 +1,159 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings  # type: ignore
+from django.db import transaction  # type: ignore
+from django.db.models import Q  # type: ignore
+from django.dispatch import Signal  # type: ignore
+from django.utils import timezone  # type: ignore
+from .http_client import TokenBucket
+from .models import Order, OrderStatusLog
+from .shipping import track_many
+
+logger = logging.getLogger(__name__)
+# Dikirim setelah poller mengubah shipping_status; argumen: order, old_status, new_status
+shipping_status_changed = Signal()
+# =========================
+# MAPPING STATUS PROVIDER
+# =========================
+# Status mentah dari provider -> Order.shipping_status
+TRACKING_STATUS_MAP = {
+    "PICKED_UP": "SHIPPED",
+    "IN_TRANSIT": "SHIPPED",
+    "ON_PROCESS": "SHIPPED",
+    "OUT_FOR_DELIVERY": "SHIPPED",
+    "DELIVERED": "COMPLETED",
+    "RETURNED": "CANCELLED",
+    "CANCELLED": "CANCELLED",
+}
+def _min_interval():
+    return getattr(settings, "TRACKING_POLL_MIN_INTERVAL", 60 * 30)
+def _max_interval():
+    return getattr(settings, "TRACKING_POLL_MAX_INTERVAL", 60 * 60 * 12)
+def next_interval(current, changed):
+    """Interval adaptif: kembali ke minimum saat ada perubahan, dobel saat tetap."""
+    if changed or not current:
+        return _min_interval()
+    return min(current * 2, _max_interval())
+def due_orders(now=None, limit=None):
+    now = now or timezone.now()
+    # memakai index (status, next_tracking_poll_at)
+    qs = (
+        Order.objects
+        .filter(status="SHIPPED")
+        .filter(Q(next_tracking_poll_at__isnull=True) | Q(next_tracking_poll_at__lte=now))
+        .exclude(tracking_number__isnull=True)
+        .exclude(tracking_number="")
+        .exclude(shipping_status__in=["COMPLETED", "CANCELLED"])
+        .only(
+            "id", "status", "shipping_status", "courier_code", "tracking_number",
+            "tracking_status", "tracking_poll_interval", "status_changed_at", "created_at",
+        )
+        .order_by("next_tracking_poll_at", "id")
+    )
+    return list(qs[:limit] if limit else qs)
+def _track_courier(courier, orders, rate, concurrency):
+    """Tracking satu kurir lewat ``track_many``; tiap batch memakai satu token."""
+    bucket = TokenBucket(rate, capacity=rate)
+    size = getattr(settings, "TRACKING_BATCH_SIZE", 50)
+    batches = [orders[i:i + size] for i in range(0, len(orders), size)]
+    def track(batch):
+        bucket.acquire()
+        try:
+            found = track_many((courier, order.tracking_number) for order in batch)
+        except Exception as e:
+            logger.warning("Tracking batch %s gagal: %s", courier, e)
+            found = {}
+        missing = {"success": False, "message": "Tidak ada hasil tracking"}
+        return [(order, found.get(order.tracking_number, missing)) for order in batch]
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch_results in pool.map(track, batches):
+            results.extend(batch_results)
+    return results
+def poll_tracking(limit=None, concurrency=None, rate=None, now=None):
+    """
+    Poll tracking semua order SHIPPED yang sudah jatuh tempo, dikelompokkan
+    per kurir (rate limit per kurir, concurrency terbatas), lalu simpan
+    hasilnya dengan satu ``bulk_update`` (perubahan shipping_status ditulis
+    bersyarat per transisi). Return ringkasan hitungan.
+    """
+    now = now or timezone.now()
+    concurrency = concurrency or getattr(settings, "TRACKING_CONCURRENCY", 4)
+    rate = rate or getattr(settings, "TRACKING_RATE_PER_COURIER", 5)
+    by_courier = defaultdict(list)
+    for order in due_orders(now, limit):
+        by_courier[(order.courier_code or "").lower()].append(order)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, len(by_courier))) as pool:
+        for courier_results in pool.map(
+            lambda item: _track_courier(item[0], item[1], rate, concurrency),
+            by_courier.items(),
+        ):
+            results.extend(courier_results)
+    changed, logs, to_update = [], [], []
+    summary = {"polled": len(results), "changed": 0, "failed": 0}
+    for order, result in results:
+        order.tracking_checked_at = now
+        raw_status = (result.get("status") or "").upper() if result.get("success") else None
+        if raw_status is None:
+            summary["failed"] += 1
+        new_shipping = TRACKING_STATUS_MAP.get(raw_status)
+        old_shipping = order.shipping_status
+        is_changed = bool(
+            new_shipping
+            and new_shipping != old_shipping
+            and Order.is_valid_transition(old_shipping, new_shipping, field="shipping_status")
+        )
+        raw_changed = raw_status is not None and raw_status != order.tracking_status
+        if raw_status is not None:
+            order.tracking_status = raw_status
+        order.tracking_poll_interval = next_interval(
+            order.tracking_poll_interval, is_changed or raw_changed
+        )
+        order.next_tracking_poll_at = now + timedelta(seconds=order.tracking_poll_interval)
+        if is_changed:
+            order.shipping_status = new_shipping
+            changed.append((order, old_shipping, new_shipping))
+            logs.append(OrderStatusLog(
+                order=order, field="shipping_status", from_status=old_shipping,
+                to_status=new_shipping, source="tracking", created_at=now,
+            ))
+        to_update.append(order)
+    with transaction.atomic():
+        # Nilai order dibaca sebelum panggilan kurir yang lambat: shipping_status
+        # hanya ditulis bila di DB masih sama dengan nilai lama (edit staff /
+        # callback di tengah jalan tidak tertimpa), kolom lain cukup bulk_update.
+        if changed:
+            current = dict(
+                Order.objects.select_for_update()
+                .filter(pk__in=[order.pk for order, _, _ in changed])
+                .values_list("id", "shipping_status")
+            )
+            changed = [item for item in changed if current.get(item[0].pk) == item[1]]
+            by_transition = defaultdict(list)
+            for order, old_status, new_status in changed:
+                by_transition[(old_status, new_status)].append(order.pk)
+            for (old_status, new_status), ids in by_transition.items():
+                Order.objects.filter(pk__in=ids, shipping_status=old_status).update(
+                    shipping_status=new_status
+                )
+            applied = {order.pk for order, _, _ in changed}
+            logs = [log for log in logs if log.order.pk in applied]
+        Order.objects.bulk_update(
+            to_update,
+            [
+                "tracking_status", "tracking_checked_at",
+                "next_tracking_poll_at", "tracking_poll_interval",
+            ],
+            batch_size=500,
+        )
+        OrderStatusLog.objects.bulk_create(logs)
+    for order, old_status, new_status in changed:
+        order._snapshot_tracked_fields(["shipping_status"])
+        shipping_status_changed.send(
+            sender=Order, order=order, old_status=old_status, new_status=new_status
+        )
+    summary["changed"] = len(changed)
+    return summary
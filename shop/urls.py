@@ -26,6 +26,9 @@ urlpatterns = [
     path('payment/success/<int:order_id>/',     views.payment_success,      name='payment_success'),
     path('check-shipping/',                     views.check_shipping_cost,  name='check_shipping_cost'),
     path('api/check-ongkir/',                   views.api_check_ongkir,     name='api_check_ongkir'),
+    path('api/check-ongkir/all/',               views.api_check_ongkir_all, name='api_check_ongkir_all'),
+    path('api/check-ongkir/split/',             views.api_check_ongkir_split, name='api_check_ongkir_split'),
+    path('api/ongkir-metrics/',                 views.ongkir_metrics_api,   name='ongkir_metrics_api'),
     path('api/provinces/',                      views.province_api,         name='province_api'),
     path('api/cities/',                         views.city_api,             name='city_api'),
     path('api/subdistricts/',                   views.subdistrict_api,      name='subdistrict_api'),
@@ -44,4 +47,8 @@ urlpatterns = [
     path('management/orders/<int:order_id>/update/',        views.management_order_update,          name='management_order_update'),
     path('management/sales-report/',                        views.management_sales_report,          name='management_sales_report'),
     path('management/sales-report/export/',                 views.management_sales_report_export,   name='management_sales_report_export'),
+    path('management/sales-report/export.xlsx',             views.management_sales_report_xlsx,     name='management_sales_report_xlsx'),
+    path('management/analytics/products/',                  views.management_product_analytics,     name='management_product_analytics'),
+    path('management/api/revenue-series/',                  views.api_revenue_series,               name='api_revenue_series'),
+    path('management/products/<int:product_id>/stock/',     views.management_stock_matrix,          name='management_stock_matrix'),
 ]
\ No newline at end of file
@@ -1,52 +1,91 @@
-import requests  # type: ignore
+import hashlib
+import threading
 from django.conf import settings  # type: ignore
-from django.core.mail import send_mail  # type: ignore
-from django.template.loader import render_to_string, TemplateDoesNotExist  # type: ignore
+from django.core.mail import EmailMultiAlternatives, get_connection  # type: ignore
+from django.template.loader import get_template, TemplateDoesNotExist  # type: ignore
 from django.utils.html import strip_tags  # type: ignore
+from .whatsapp import get_active_wa_batch, get_wa_client
 
 # =========================
 # WHATSAPP SENDER
 # =========================
 def kirim_wa_otomatis(phone, message):
-    phone = str(phone).replace(" ", "").replace("-", "").replace("+", "")
-    # =========================
-    # FORMAT NOMOR
-    # =========================
-    if phone.startswith('0'):
-        phone = '62' + phone[1:]
-    elif phone.startswith('8'):
-        phone = '62' + phone
-    elif not phone.startswith('62'):
-        phone = '62' + phone
-    url     = "https://api.fonnte.com/send"
-    payload = {'target': phone, 'message': message, 'countryCode': '62'}
-    headers = {'Authorization': settings.FONNTE_TOKEN}
-    try:
-        response = requests.post(url, data=payload, headers=headers, timeout=10)
-        result   = response.json()
-        if result.get('status'):
-            print(f"✅ WA TERKIRIM ke {phone}: {message[:30]}...")
-        else:
-            print(f"❌ WA GAGAL ke {phone}. Pesan: {result.get('reason')}")
-        return result
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ ERROR KONEKSI API WA: {e}")
-        return None
+    # Di dalam WhatsAppBatch pesan ditampung dan digabung per nomor.
+    batch = get_active_wa_batch()
+    if batch is not None:
+        return batch.add(phone, message)
+    return get_wa_client().send(phone, message)
 # =========================
 # EMAIL SENDER
 # =========================
+# Template email di-compile sekali per proses oleh cached.Loader bawaan
+# Django (aktif default sejak 4.1; reload otomatis saat DEBUG).
+def buat_email_notifikasi(subject, template, context, recipient_email):
+    html_message  = get_template(template).render(context)
+    plain_message = strip_tags(html_message)
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=plain_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient_email],
+    )
+    email.attach_alternative(html_message, "text/html")
+    return email
+class EmailDispatcher:
+    """
+    Kumpulkan beberapa email lalu kirim sekaligus lewat satu koneksi SMTP.
+
+    Dipakai sebagai context manager; semua email yang ditambahkan di dalam
+    blok ``with`` dikirim dengan ``send_messages`` saat blok selesai.
+    """
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.messages = []
+    def add(self, subject, template, context, recipient_email):
+        try:
+            self.messages.append(
+                buat_email_notifikasi(subject, template, context, recipient_email)
+            )
+            return True
+        except TemplateDoesNotExist:
+            print(f"❌ TEMPLATE EMAIL {template} TIDAK DITEMUKAN")
+            return False
+    def send(self):
+        if not self.messages:
+            return 0
+        messages, self.messages = self.messages, []
+        connection = self.connection or get_connection(fail_silently=False)
+        try:
+            sent = connection.send_messages(messages) or 0
+            print(f"✅ {sent} EMAIL terkirim (1 koneksi)")
+            return sent
+        except Exception as e:
+            print(f"❌ GAGAL KIRIM EMAIL BATCH: {e}")
+            return 0
+    def __enter__(self):
+        _email_batch.stack = getattr(_email_batch, "stack", []) + [self]
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        _email_batch.stack = _email_batch.stack[:-1]
+        self.send()
+        return False
+_email_batch = threading.local()
+def get_active_email_dispatcher():
+    stack = getattr(_email_batch, "stack", None)
+    return stack[-1] if stack else None
 def kirim_email_notifikasi(subject, template, context, recipient_email):
+    # =========================
+    # MODE BATCH
+    # =========================
+    dispatcher = get_active_email_dispatcher()
+    if dispatcher is not None:
+        return dispatcher.add(subject, template, context, recipient_email)
+    # =========================
+    # KIRIM LANGSUNG
+    # =========================
     try:
-        html_message  = render_to_string(template, context)
-        plain_message = strip_tags(html_message)
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[recipient_email],
-            html_message=html_message,
-            fail_silently=False
-        )
+        email = buat_email_notifikasi(subject, template, context, recipient_email)
+        email.send(fail_silently=False)
         print(f"✅ EMAIL terkirim ke {recipient_email}")
         return True
     except TemplateDoesNotExist:
@@ -54,4 +93,12 @@ def kirim_email_notifikasi(subject, template, context, recipient_email):
         return False
     except Exception as e:
         print(f"❌ GAGAL KIRIM EMAIL: {e}")
-        return False
\ No newline at end of file
+        return False
+# =========================================================
+# MIDTRANS SIGNATURE
+# =========================================================
+def midtrans_signature(order_id, status_code, gross_amount, server_key=None):
+    """SHA512(order_id + status_code + gross_amount + server_key) milik Midtrans."""
+    server_key = server_key if server_key is not None else settings.MIDTRANS_SERVER_KEY.strip()
+    raw = f"{order_id}{status_code}{gross_amount}{server_key}"
+    return hashlib.sha512(raw.encode()).hexdigest()
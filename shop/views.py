@@ -9,9 +9,7 @@ from django.utils import timezone # type: ignore
 from django.contrib.auth import login as auth_login# type: ignore
 from django.contrib.auth import logout as auth_logout# type: ignore
 from django.contrib.admin.views.decorators import staff_member_required# type: ignore
-from django.db.models import Sum, Count# type: ignore
-from django.utils.dateparse import parse_date# type: ignore
-from django.http import HttpResponse# type: ignore
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse# type: ignore
 from django.utils.html import strip_tags # type: ignore
 from django.core.mail import send_mail # type: ignore
 from django.template.loader import render_to_string # type: ignore
@@ -20,24 +18,51 @@ import requests # type: ignore
 import uuid # type: ignore
 import base64 # type: ignore
 import urllib3 # type: ignore
-import hashlib # type: ignore
 from django.http import JsonResponse # type: ignore
-import csv
+from django.utils.cache import patch_cache_control # type: ignore
 import json
+import tempfile
+from datetime import timedelta
 import midtransclient      # type: ignore
 from django.conf import settings # type: ignore
 from django.urls import reverse # type: ignore
+from django.utils.http import urlencode # type: ignore
+from django.db.models import Count # type: ignore
 from .models import (
     Product, ProductCategory, CartItem, Customer, CustomProductVariant,
-    Order, OrderItem, Payment, ProductVariant, Color, Size, CustomProduct, CustomService 
+    Order, OrderItem, Payment, ProductVariant, Color, Size, CustomProduct, CustomService,
+    InvalidStatusTransition, Province, City, District
 )
 from .forms import ProfileForm, RegisterForm
+from .orders import bulk_ubah_status
+from .exports import XLSX_SHEETS, item_csv_chunks, order_csv_chunks, write_sales_xlsx
+from .inventory import apply_matrix_changes, decrement_stock, parse_matrix_changes, stock_matrix
+from .pagination import KeysetPage
+from .date_ranges import created_range_q, parse_day
+from .rollups import (
+    ANALYTICS_GROUPS, ANALYTICS_SORTS, dashboard_stats, product_analytics, revenue_series,
+    sales_summary, status_totals,
+)
+from .parcels import (
+    cart_parcel_lines,
+    get_split_quote,
+    needs_split,
+    single_parcel_plan,
+    verify_split_shipping_cost
+)
+from .utils import midtrans_signature
+from .shipping_quotes import (
+    get_cached_shipping_cost,
+    get_all_courier_quotes,
+    get_quote_metrics,
+    verify_shipping_cost
+)
 from .shipping import (
     get_provinces,
     get_cities,
     get_subdistricts,
-    get_shipping_cost,
-    create_shipment
+    create_shipment,
+    rajaongkir
 )
 # =====================
 # HELPER
@@ -194,20 +219,11 @@ def checkout(request):
         total_weight += (
             weight * item.quantity
         )
+    parcel_lines = cart_parcel_lines(cart_items)
     # =========================
     # POST / CREATE ORDER
     # =========================
     if request.method == "POST":
-        try:
-            raw_shipping_cost = request.POST.get(
-                "shipping_cost",
-                "0"
-            )
-            shipping_cost = Decimal(
-                raw_shipping_cost.replace(',', '')
-            )
-        except:
-            shipping_cost = Decimal("0")
         # =========================
         # VALIDASI SHIPPING
         # =========================
@@ -217,9 +233,8 @@ def checkout(request):
         courier_service = request.POST.get(
             "courier_service"
         )
-        destination_subdistrict_id = request.POST.get(
-            "destination_subdistrict_id"
-        )
+        # tujuan diambil dari profil, bukan dari input browser
+        destination_subdistrict_id = customer.subdistrict_id
         if not courier_code or not courier_service:
             messages.error(
                 request,
@@ -228,6 +243,44 @@ def checkout(request):
             return redirect(
                 "shop:checkout"
             )
+        # =========================
+        # VERIFIKASI ONGKIR (CACHE)
+        # =========================
+        # Dilakukan sebelum transaksi DB agar tidak ada panggilan
+        # RajaOngkir di dalam transaksi pembuatan order.
+        # Order melebihi batas berat per paket kurir dipecah
+        # menjadi beberapa paket (lihat shop/parcels.py).
+        if needs_split(total_weight, courier_code):
+            verification = verify_split_shipping_cost(
+                lines=parcel_lines,
+                destination=destination_subdistrict_id,
+                courier=courier_code,
+                service=courier_service,
+                posted_cost=request.POST.get(
+                    "shipping_cost",
+                    "0"
+                )
+            )
+        else:
+            verification = verify_shipping_cost(
+                destination=destination_subdistrict_id,
+                weight=total_weight,
+                courier=courier_code,
+                service=courier_service,
+                posted_cost=request.POST.get(
+                    "shipping_cost",
+                    "0"
+                )
+            )
+        if not verification["success"]:
+            messages.error(
+                request,
+                verification["message"]
+            )
+            return redirect(
+                "shop:checkout"
+            )
+        shipping_cost = verification["cost"]
         try:
             with transaction.atomic():
                 # =========================
@@ -286,9 +339,18 @@ def checkout(request):
                     courier_code=courier_code,
                     courier_service=
                     courier_service,
+                    shipping_estimation=
+                    verification["etd"],
                     # SHIPPING
                     shipping_cost=shipping_cost,
                     total_weight=total_weight,
+                    parcel_plan=(
+                        verification.get("parcels")
+                        or single_parcel_plan(
+                            parcel_lines,
+                            total_weight
+                        )
+                    ),
                 )
                 subtotal = Decimal("0")
                 # =========================
@@ -309,11 +371,15 @@ def checkout(request):
                             f"Custom: "
                             f"{item.custom_variant.size.name}"
                         )
-                        # REDUCE STOCK
-                        item.custom_variant.stock -= (
+                        variant_key = OrderItem.build_variant_key(
+                            item.product,
+                            custom_variant=item.custom_variant
+                        )
+                        # REDUCE STOCK (UPDATE bersyarat)
+                        decrement_stock(
+                            item.custom_variant,
                             item.quantity
                         )
-                        item.custom_variant.save()
                     # NORMAL PRODUCT
                     else:
                         unit_price = (
@@ -330,12 +396,16 @@ def checkout(request):
                             if item.variant
                             else "Standard"
                         )
-                        # REDUCE STOCK
+                        variant_key = OrderItem.build_variant_key(
+                            item.product,
+                            variant=item.variant
+                        )
+                        # REDUCE STOCK (UPDATE bersyarat)
                         if item.variant:
-                            item.variant.stock -= (
+                            decrement_stock(
+                                item.variant,
                                 item.quantity
                             )
-                            item.variant.save()
                     # TOTAL
                     line_total = (
                         unit_price + service_price
@@ -350,6 +420,10 @@ def checkout(request):
                         custom_price=service_price,
                         is_custom=item.is_custom,
                         variant_label=variant_label,
+                        # snapshot untuk laporan
+                        product_name=item.product.name,
+                        variant_key=variant_key,
+                        line_revenue=line_total,
                         custom_image=(
                             item.custom_image
                             if item.is_custom
@@ -431,6 +505,10 @@ def checkout(request):
         "items": cart_items,
         "subtotal": grand_total,
         "total_weight": total_weight,
+        "split_shipping": any(
+            needs_split(total_weight, courier)
+            for courier in getattr(settings, "ONGKIR_COURIERS", [])
+        ),
         "shipping_cost": Decimal("0"),
         "total": grand_total,
     }
@@ -471,6 +549,11 @@ def order_pay(request, order_id):
             is_production=settings.MIDTRANS_IS_PRODUCTION,
             server_key=settings.MIDTRANS_SERVER_KEY.strip()
         )
+        # server Midtrans lokal (profil core.settings_fake)
+        snap_base_url = getattr(settings, "MIDTRANS_SNAP_BASE_URL", "")
+        if snap_base_url:
+            snap.api_config.SNAP_SANDBOX_BASE_URL = snap_base_url
+            snap.api_config.SNAP_PRODUCTION_BASE_URL = snap_base_url
         # =========================
         # UNIQUE TRANSACTION ID
         # =========================
@@ -623,16 +706,11 @@ def midtrans_callback(request):
         # VALIDASI SIGNATURE
         # =========================
         if status_code and gross_amount and signature_key:
-            server_key = settings.MIDTRANS_SERVER_KEY.strip()
-            raw_signature = (
-                str(order_id_full)
-                + str(status_code)
-                + str(gross_amount)
-                + str(server_key)
+            generated_signature = midtrans_signature(
+                order_id_full,
+                status_code,
+                gross_amount
             )
-            generated_signature = hashlib.sha512(
-                raw_signature.encode()
-            ).hexdigest()
             if signature_key != generated_signature:
                 print("SIGNATURE INVALID!")
                 return HttpResponse(status=403)
@@ -653,30 +731,46 @@ def midtrans_callback(request):
             # PAYMENT UPDATE
             # =========================
             if payment:
-                if payment.status != "PAID":
+                if payment.status not in ("PAID", "REFUND_PENDING"):
                     payment.status = "PAID"
                     payment.paid_at = timezone.now()
                     payment.save(update_fields=["status", "paid_at"])
             # =========================
             # ORDER UPDATE
             # =========================
-            if order.status != "PAID":
-                order.status = "PAID"
+            if order.status == "PENDING":
+                order.transition_to("PAID", source="midtrans")
                 order.save(update_fields=["status"])
                 print(f"ORDER #{order.id} PAID")
             else:
-                print(f"ORDER #{order.id} already PAID")
+                print(f"ORDER #{order.id} already {order.status}")
+            # ==================================================
+            # DIBAYAR SETELAH DIBATALKAN
+            # ==================================================
+            # mis. expire lalu settlement terlambat: barang tidak
+            # dikirim, pembayaran ditandai untuk refund
+            if order.status == "CANCELLED":
+                if payment and payment.status != "REFUND_PENDING":
+                    payment.status = "REFUND_PENDING"
+                    payment.save(update_fields=["status"])
+                print(f"ORDER #{order.id} CANCELLED tapi dibayar: REFUND_PENDING")
             # ==================================================
             # CREATE SHIPMENT (ONLY ONCE)
             # ==================================================
-            if not order.tracking_number:
+            elif order.status not in Order.SHIPPABLE_STATUSES:
+                print(f"ORDER #{order.id} {order.status}: shipment dilewati")
+            elif not order.tracking_number:
                 shipment_result = create_shipment(order)
                 print("SHIPMENT RESULT:", shipment_result)
                 if shipment_result.get("success"):
                     awb = shipment_result.get("awb")
-                    if awb:
+                    if awb and order.can_transition_to("PROCESSING", field="shipping_status"):
                         order.tracking_number = awb
-                        order.shipping_status = "PROCESSING"
+                        order.transition_to(
+                            "PROCESSING",
+                            source="midtrans",
+                            field="shipping_status"
+                        )
                         order.save(update_fields=[
                             "tracking_number",
                             "shipping_status"
@@ -692,8 +786,8 @@ def midtrans_callback(request):
         # FAILED PAYMENT
         # ==================================================
         elif transaction_status in ["deny", "expire", "cancel"]:
-            if order.status != "CANCELLED":
-                order.status = "CANCELLED"
+            if order.can_transition_to("CANCELLED") and order.status != "CANCELLED":
+                order.transition_to("CANCELLED", source="midtrans")
                 order.save(update_fields=["status"])
             if payment:
                 if payment.status != "FAILED":
@@ -832,41 +926,66 @@ def logout_view(request):
 # =====================
 # MANAGEMENT (ADMIN)
 # =====================
-VALID_REVENUE_STATUSES = [
-    "PAID",
-    "PROCESSING",
-    "SHIPPED",
-    "COMPLETED"
-]
 @staff_member_required
 def management_dashboard(request):
-    revenue_orders = Order.objects.filter(
-        status__in=VALID_REVENUE_STATUSES
-    )
+    # 1 query agregasi (di-cache beberapa detik) + 1 query order terbaru
     return render(request, "shop/management_dashboard.html", {
-        "total_orders": Order.objects.count(),
-        "total_revenue":
-            revenue_orders.aggregate(
-                total=Sum("total")
-            )["total"] or 0,
-        "paid_orders_count":
-            revenue_orders.count(),
-        "pending_orders_count":
-            Order.objects.filter(status="PENDING").count(),
-        "cancelled_orders_count":
-            Order.objects.filter(status="CANCELLED").count(),
-        "by_status":
-            Order.objects.values("status")
-            .annotate(count=Count("id")),
+        **dashboard_stats(),
+        "status_choices": dict(Order.STATUS_CHOICES),
         "recent_orders":
             Order.objects.select_related("customer__user")
             .order_by("-created_at")[:5],
     })
+# Ukuran halaman daftar order (keyset pada created_at, id).
+ORDER_LIST_PAGE_SIZE = 50
 @staff_member_required
 def management_order_list(request):
     # =========================
     # UPDATE STATUS
     # =========================
+    if request.method == "POST" and request.POST.get("action") == "bulk":
+        order_ids = request.POST.getlist(
+            "order_ids"
+        )
+        new_status = request.POST.get(
+            "bulk_status"
+        )
+        if not order_ids or not new_status:
+            messages.warning(
+                request,
+                "Pilih pesanan dan status tujuan terlebih dahulu."
+            )
+            return redirect(
+                "shop:management_order_list"
+            )
+        try:
+            updated, skipped = bulk_ubah_status(
+                order_ids,
+                new_status,
+                actor=request.user
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect(
+                "shop:management_order_list"
+            )
+        label = dict(Order.STATUS_CHOICES)[new_status]
+        if updated:
+            messages.success(
+                request,
+                f"{len(updated)} pesanan "
+                f"berhasil diubah ke {label}."
+            )
+        if skipped:
+            messages.warning(
+                request,
+                f"{len(skipped)} pesanan dilewati "
+                f"(transisi ke {label} tidak diizinkan): "
+                + ", ".join(f"#{o.id}" for o in skipped)
+            )
+        return redirect(
+            "shop:management_order_list"
+        )
     if request.method == "POST":
         order_id = request.POST.get(
             "order_id"
@@ -884,7 +1003,17 @@ def management_order_list(request):
             # UPDATE STATUS
             # =========================
             if old_status != new_status:
-                order.status = new_status
+                try:
+                    order.transition_to(
+                        new_status,
+                        actor=request.user,
+                        source="management"
+                    )
+                except InvalidStatusTransition as e:
+                    messages.error(request, e.messages[0])
+                    return redirect(
+                        "shop:management_order_list"
+                    )
                 # save -> trigger signal
                 order.save()
                 messages.success(
@@ -906,31 +1035,83 @@ def management_order_list(request):
     # =========================
     # FILTER LIST
     # =========================
-    status_filter = request.GET.get(
-        "status"
+    status_filter = request.GET.get("status") or ""
+    courier_filter = request.GET.get("courier") or ""
+    city_filter = (request.GET.get("city") or "").strip()
+    start_date, end_date, parsed_start, parsed_end = parse_report_range(request)
+    # filter selain status; dipakai juga untuk hitungan per status
+    base = Order.objects.filter(
+        created_range_q(parsed_start, parsed_end)
     )
-    orders = (
-        Order.objects
-        .select_related(
-            "customer__user"
-        )
-        .prefetch_related(
-            "items"
-        )
-        .order_by(
-            "-created_at"
-        )
+    if courier_filter:
+        base = base.filter(courier_code=courier_filter)
+    if city_filter:
+        base = base.filter(shipping_city=city_filter)
+    orders = base.select_related("customer__user").only(
+        "id", "created_at", "status", "total",
+        "customer__user__username",
+        "customer__user__first_name",
+        "customer__user__last_name",
     )
     if status_filter:
-        orders = orders.filter(
-            status=status_filter
+        orders = orders.filter(status=status_filter)
+    page = KeysetPage(
+        orders,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        size=ORDER_LIST_PAGE_SIZE,
+    )
+    # =========================
+    # HITUNGAN PER STATUS
+    # =========================
+    # Tanpa filter kurir/kota: rollup harian (cache); selain itu
+    # satu query GROUP BY status atas filter yang sama.
+    if courier_filter or city_filter:
+        counts = dict(
+            base.order_by()
+            .values_list("status")
+            .annotate(count=Count("id"))
         )
+    elif parsed_start or parsed_end:
+        counts = {
+            status: row["count"]
+            for status, row in status_totals(parsed_start, parsed_end).items()
+        }
+    else:
+        counts = {
+            row["status"]: row["count"]
+            for row in dashboard_stats()["by_status"]
+        }
+    facets = [
+        {"code": code, "label": label, "count": counts.get(code, 0)}
+        for code, label in Order.STATUS_CHOICES
+    ]
+    filters = {
+        key: value for key, value in {
+            "status": status_filter,
+            "courier": courier_filter,
+            "city": city_filter,
+            "start": start_date or "",
+            "end": end_date or "",
+        }.items() if value
+    }
     context = {
-        "orders": orders,
+        "orders": page,
+        "page": page,
+        "facets": facets,
+        "facet_total": sum(counts.values()),
+        "filter_query": urlencode(
+            {k: v for k, v in filters.items() if k != "status"}
+        ),
+        "page_query": urlencode(filters),
         "order_status_choices":
             Order.SHIPPING_STATUS_CHOICES,
-        "status_filter":
-            status_filter,
+        "courier_choices": getattr(settings, "ONGKIR_COURIERS", []),
+        "status_filter": status_filter,
+        "courier_filter": courier_filter,
+        "city_filter": city_filter,
+        "start": start_date or "",
+        "end": end_date or "",
     }
     return render(
         request,
@@ -953,8 +1134,21 @@ def management_order_detail(request, order_id):
 def management_order_update(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     if request.method == "POST":
-        order.status = request.POST.get("status")
-        order.shipping_status = request.POST.get("shipping_status")
+        try:
+            order.transition_to(
+                request.POST.get("status", order.status),
+                actor=request.user,
+                source="management"
+            )
+            order.transition_to(
+                request.POST.get("shipping_status", order.shipping_status),
+                actor=request.user,
+                source="management",
+                field="shipping_status"
+            )
+        except InvalidStatusTransition as e:
+            messages.error(request, e.messages[0])
+            return redirect("shop:management_order_detail", order_id=order.id)
         order.tracking_number = request.POST.get("tracking_number")
         order.save()
         messages.success(
@@ -971,113 +1165,193 @@ def management_order_update(request, order_id):
             "shipping_status_choices": Order.SHIPPING_STATUS_CHOICES,
         }
     )
-@staff_member_required
-def management_sales_report(request):
-    # =========================
-    # FILTER DATE
-    # =========================
+# Jumlah order terbaru yang ditampilkan di tabel laporan;
+# daftar lengkap tersedia lewat export CSV.
+SALES_REPORT_ORDER_LIMIT = 100
+def parse_report_range(request):
     start_date = request.GET.get("start")
     end_date = request.GET.get("end")
-    orders = Order.objects.all().order_by("-created_at")
-    # START DATE
-    if start_date and start_date != "None" and start_date != "":
-        parsed_start = parse_date(start_date)
-        if parsed_start:
-            orders = orders.filter(
-                created_at__date__gte=parsed_start
-            )
-    # END DATE
-    if end_date and end_date != "None" and end_date != "":
-        parsed_end = parse_date(end_date)
-        if parsed_end:
-            orders = orders.filter(
-                created_at__date__lte=parsed_end
-            )
-    # =========================
-    # VALID REVENUE ORDERS
-    # =========================
-    revenue_orders = orders.filter(
-        status__in=VALID_REVENUE_STATUSES
+    parsed_start = parse_day(start_date)
+    parsed_end = parse_day(end_date)
+    return start_date, end_date, parsed_start, parsed_end
+def filter_orders_by_day(orders, parsed_start, parsed_end):
+    # rentang setengah terbuka agar index created_at terpakai
+    return orders.filter(
+        created_range_q(parsed_start, parsed_end)
     )
+@staff_member_required
+def management_sales_report(request):
     # =========================
-    # STATS
+    # FILTER DATE
     # =========================
-    total_orders = orders.count()
-    total_revenue = (
-        revenue_orders.aggregate(
-            total=Sum("total")
-        )["total"] or 0
-    )
-    avg_order_value = (
-        total_revenue / revenue_orders.count()
-        if revenue_orders.count() > 0
-        else 0
+    start_date, end_date, parsed_start, parsed_end = parse_report_range(request)
+    orders = filter_orders_by_day(
+        Order.objects.select_related("customer__user").order_by("-created_at"),
+        parsed_start,
+        parsed_end,
     )
     # =========================
-    # TOP PRODUCTS
+    # STATS (ROLLUP HARIAN)
     # =========================
-    top_products = (
-        OrderItem.objects
-        .filter(order__in=revenue_orders)
-        .values("product__name")
-        .annotate(qty=Sum("quantity"))
-        .order_by("-qty")[:5]
-    )
+    summary = sales_summary(parsed_start, parsed_end)
     return render(
         request,
         "shop/management_sales_report.html",
         {
-            "orders": orders,
+            "orders": orders[:SALES_REPORT_ORDER_LIMIT],
+            "orders_limit": SALES_REPORT_ORDER_LIMIT,
             "start": start_date,
             "end": end_date,
-            "total_orders": total_orders,
-            "total_revenue": total_revenue,
-            "avg_order_value": avg_order_value,
-            "top_products": top_products,
+            "total_orders": summary["total_orders"],
+            "total_revenue": summary["total_revenue"],
+            "avg_order_value": summary["avg_order_value"],
+            "orders_per_status": summary["by_status"],
+            "top_products": summary["top_products"],
             "status_choices":
-                dict(Order.SHIPPING_STATUS_CHOICES),
+                dict(Order.STATUS_CHOICES),
         }
     )
 @staff_member_required
 def management_sales_report_export(request):
-    start = request.GET.get("start")
-    end = request.GET.get("end")
-    orders = Order.objects.all().order_by("-created_at")
-    # START DATE
-    if start and start != "None" and start != "":
-        parsed_start = parse_date(start)
-        if parsed_start:
-            orders = orders.filter(
-                created_at__date__gte=parsed_start
-            )
-    # END DATE
-    if end and end != "None" and end != "":
-        parsed_end = parse_date(end)
-        if parsed_end:
-            orders = orders.filter(
-                created_at__date__lte=parsed_end
-            )
-    response = HttpResponse(content_type="text/csv")
+    # ?detail=items -> satu baris per item pesanan
+    _, _, parsed_start, parsed_end = parse_report_range(request)
+    if request.GET.get("detail") == "items":
+        chunks = item_csv_chunks(parsed_start, parsed_end)
+        filename = "sales_report_items_af_promotion.csv"
+    else:
+        chunks = order_csv_chunks(parsed_start, parsed_end)
+        filename = "sales_report_af_promotion.csv"
+    response = StreamingHttpResponse(
+        chunks,
+        content_type="text/csv"
+    )
     response["Content-Disposition"] = (
-        'attachment; filename="sales_report_af_promotion.csv"'
+        f'attachment; filename="{filename}"'
     )
-    writer = csv.writer(response)
-    writer.writerow([
-        "Order ID",
-        "Tanggal",
-        "Customer",
-        "Status",
-        "Total"
-    ])
-    for order in orders:
-        writer.writerow([
-            order.id,
-            order.created_at.strftime("%Y-%m-%d %H:%M"),
-            order.customer.user.username,
-            order.get_status_display(),
-            float(order.total)
-        ])
     return response
+@staff_member_required
+def management_sales_report_xlsx(request):
+    # ?sheets=orders,items,products (default semua)
+    _, _, parsed_start, parsed_end = parse_report_range(request)
+    sheets = [
+        name for name in request.GET.get("sheets", "").split(",")
+        if name in XLSX_SHEETS
+    ] or XLSX_SHEETS
+    # file sementara di disk; workbook write-only tidak ditahan di memori
+    tmp = tempfile.TemporaryFile()
+    write_sales_xlsx(tmp, parsed_start, parsed_end, sheets)
+    tmp.seek(0)
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename="sales_report_af_promotion.xlsx",
+        content_type=(
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        ),
+    )
+# Rentang bawaan deret omzet bila ?start= kosong (hari ke belakang).
+REVENUE_SERIES_DEFAULT_SPAN = {"day": 30, "week": 7 * 12, "month": 365}
+@staff_member_required
+def api_revenue_series(request):
+    # ?bucket=day|week|month &start= &end= (tanggal lokal, inklusif)
+    bucket = request.GET.get("bucket") or "day"
+    _, _, parsed_start, parsed_end = parse_report_range(request)
+    end_day = parsed_end or timezone.localdate()
+    start_day = parsed_start or end_day - timedelta(
+        days=REVENUE_SERIES_DEFAULT_SPAN.get(bucket, 30) - 1
+    )
+    if start_day > end_day:
+        return JsonResponse({
+            "success": False,
+            "message": "Tanggal awal melewati tanggal akhir."
+        }, status=400)
+    try:
+        series = revenue_series(start_day, end_day, bucket)
+    except ValueError as e:
+        return JsonResponse({
+            "success": False,
+            "message": str(e)
+        }, status=400)
+    return JsonResponse({
+        "success": True,
+        "bucket": bucket,
+        "start": start_day.isoformat(),
+        "end": end_day.isoformat(),
+        "data": [
+            {
+                "period": point["period"].isoformat(),
+                "label": point["label"],
+                "orders": point["orders"],
+                "revenue": float(point["revenue"]),
+                "avg_order_value": float(point["avg_order_value"]),
+            }
+            for point in series
+        ],
+    })
+# Batas atas ?top= pada halaman analitik produk.
+PRODUCT_ANALYTICS_MAX_TOP = 100
+@staff_member_required
+def management_product_analytics(request):
+    # ?by=product|variant &sort=units|revenue &top=N + filter tanggal
+    start_date, end_date, parsed_start, parsed_end = parse_report_range(request)
+    by = request.GET.get("by")
+    by = by if by in ANALYTICS_GROUPS else "product"
+    sort = request.GET.get("sort")
+    sort = sort if sort in ANALYTICS_SORTS else "units"
+    try:
+        top = min(max(int(request.GET.get("top", 20)), 1), PRODUCT_ANALYTICS_MAX_TOP)
+    except ValueError:
+        top = 20
+    return render(
+        request,
+        "shop/management_product_analytics.html",
+        {
+            "rows": product_analytics(parsed_start, parsed_end, by=by, sort=sort, top=top),
+            "start": start_date or "",
+            "end": end_date or "",
+            "by": by,
+            "sort": sort,
+            "top": top,
+        }
+    )
+@staff_member_required
+def management_stock_matrix(request, product_id):
+    # Editor stok warna x ukuran; hanya sel yang berubah yang dikirim
+    product = get_object_or_404(Product, id=product_id)
+    include_all = request.GET.get("all") == "1"
+    if request.method == "POST":
+        changes, errors = parse_matrix_changes(request.POST)
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+        else:
+            result = apply_matrix_changes(product, changes)
+            if result["conflicts"]:
+                for variant, expected in result["conflicts"]:
+                    messages.error(
+                        request,
+                        f"{variant.color} / {variant.size}: stok berubah dari "
+                        f"{expected} menjadi {variant.stock}. Tidak ada yang disimpan, "
+                        f"silakan periksa lalu simpan ulang."
+                    )
+            else:
+                messages.success(
+                    request,
+                    f"{result['updated']} varian diperbarui, "
+                    f"{result['created']} varian baru."
+                )
+        return redirect(request.get_full_path())
+    colors, sizes, rows = stock_matrix(product, include_all=include_all)
+    return render(
+        request,
+        "shop/management_stock_matrix.html",
+        {
+            "product": product,
+            "sizes": sizes,
+            "rows": rows,
+            "include_all": include_all,
+        }
+    )
 # =====================
 # CUSTOM KATALOG
 # =====================
@@ -1110,7 +1384,7 @@ def api_check_ongkir(request):
             "message": "Courier wajib."
         }, status=400)
     try:
-        result = get_shipping_cost(
+        result = get_cached_shipping_cost(
             destination=destination,
             weight=weight,
             courier=courier
@@ -1127,6 +1401,68 @@ def api_check_ongkir(request):
             "message": str(e)
         }, status=500)
     
+# =========================
+# API ONGKIR SEMUA KURIR
+# =========================
+def api_check_ongkir_all(request):
+    destination = request.GET.get("destination")
+    weight = request.GET.get("weight", 1000)
+    if not destination or not str(destination).isdigit():
+        return JsonResponse({
+            "success": False,
+            "message": "Destination wajib."
+        }, status=400)
+    try:
+        return JsonResponse(
+            get_all_courier_quotes(
+                destination=destination,
+                weight=weight
+            )
+        )
+    except Exception as e:
+        print("ONGKIR ALL ERROR:", str(e))
+        return JsonResponse({
+            "success": False,
+            "message": str(e)
+        }, status=500)
+# =========================
+# API ONGKIR MULTI-PARCEL
+# =========================
+@login_required
+def api_check_ongkir_split(request):
+    """Ongkir untuk keranjang user; dipecah per paket jika melebihi batas kurir."""
+    courier = request.GET.get("courier")
+    customer = get_customer(request)
+    if not courier or not customer.subdistrict_id:
+        return JsonResponse({
+            "success": False,
+            "message": "Courier dan alamat wajib."
+        }, status=400)
+    cart_items = customer.cart_items.select_related("product")
+    lines = cart_parcel_lines(cart_items)
+    total_weight = sum(
+        line["weight"] * line["quantity"]
+        for line in lines
+    )
+    if not needs_split(total_weight, courier):
+        return JsonResponse(
+            get_cached_shipping_cost(
+                destination=customer.subdistrict_id,
+                weight=total_weight,
+                courier=courier
+            )
+        )
+    plan = get_split_quote(
+        lines,
+        customer.subdistrict_id,
+        courier
+    )
+    return JsonResponse({
+        "success": plan.get("success", False),
+        "message": plan.get("message", ""),
+        "split": True,
+        "data": {"data": plan.get("data", [])},
+    })
 @require_POST
 def check_shipping_cost(request):
     try:
@@ -1134,7 +1470,7 @@ def check_shipping_cost(request):
         destination = data.get("destination")
         weight = data.get("weight")
         courier = data.get("courier")
-        result = get_shipping_cost(
+        result = get_cached_shipping_cost(
             destination=destination,
             weight=weight,
             courier=courier
@@ -1145,12 +1481,30 @@ def check_shipping_cost(request):
             "success": False,
             "message": str(e)
         }, status=400)
+@staff_member_required
+def ongkir_metrics_api(request):
+    return JsonResponse({
+        "quote_cache": get_quote_metrics(),
+        "rajaongkir": rajaongkir.get_metrics(),
+    })
 # =========================
-# PROVINCES API
+# WILAYAH API
 # =========================
-def province_api(request):
+# Dilayani dari tabel lokal (isi dengan: manage.py sync_regions).
+# RajaOngkir hanya dipanggil bila tabel belum pernah disinkron.
+REGION_CACHE_MAX_AGE = 60 * 60 * 24
+def region_response(queryset, fallback, *args):
+    rows = list(queryset.values("id", "name"))
+    if rows:
+        response = JsonResponse({"data": rows})
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=REGION_CACHE_MAX_AGE
+        )
+        return response
     try:
-        response = get_provinces()
+        response = fallback(*args)
         return JsonResponse({
             "data": response.get("data", [])
         })
@@ -1160,42 +1514,40 @@ def province_api(request):
             "error": str(e)
         }, status=500)
 # =========================
+# PROVINCES API
+# =========================
+def province_api(request):
+    return region_response(
+        Province.objects.all(),
+        get_provinces
+    )
+# =========================
 # CITIES API
 # =========================
 def city_api(request):
     province_id = request.GET.get("province_id")
-    if not province_id:
+    if not province_id or not province_id.isdigit():
         return JsonResponse({
             "data": [],
             "error": "province_id required"
         }, status=400)
-    try:
-        response = get_cities(province_id)
-        return JsonResponse({
-            "data": response.get("data", [])
-        })
-    except Exception as e:
-        return JsonResponse({
-            "data": [],
-            "error": str(e)
-        }, status=500)
+    return region_response(
+        City.objects.filter(province_id=province_id),
+        get_cities,
+        province_id
+    )
 # =========================
 # SUBDISTRICTS API
 # =========================
 def subdistrict_api(request):
     city_id = request.GET.get("city_id")
-    if not city_id:
+    if not city_id or not city_id.isdigit():
         return JsonResponse({
             "data": [],
             "error": "city_id required"
         }, status=400)
-    try:
-        response = get_subdistricts(city_id)
-        return JsonResponse({
-            "data": response.get("data", [])
-        })
-    except Exception as e:
-        return JsonResponse({
-            "data": [],
-            "error": str(e)
-        }, status=500)
\ No newline at end of file
+    return region_response(
+        District.objects.filter(city_id=city_id),
+        get_subdistricts,
+        city_id
+    )
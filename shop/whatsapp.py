@@ -0,0 +1,137 @@
+import logging
+import random
+import threading
+import time
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+from django.conf import settings  # type: ignore
+from .http_client import TokenBucket
+
+logger = logging.getLogger(__name__)
+FONNTE_URL = "https://api.fonnte.com/send"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+COALESCE_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+# =========================
+# FORMAT NOMOR
+# =========================
+def format_nomor_wa(phone):
+    phone = str(phone).replace(" ", "").replace("-", "").replace("+", "")
+    if phone.startswith('0'):
+        phone = '62' + phone[1:]
+    elif phone.startswith('8'):
+        phone = '62' + phone
+    elif not phone.startswith('62'):
+        phone = '62' + phone
+    return phone
+# =========================
+# FONNTE CLIENT
+# =========================
+class FonnteClient:
+    """
+    Client WhatsApp Fonnte dengan koneksi HTTP yang dipakai ulang,
+    rate limit token bucket, dan retry ber-jitter untuk error sementara.
+    """
+    def __init__(self, token=None, url=None, rate=None, burst=None,
+                max_retries=None, backoff=0.5, timeout=10, session=None):
+        self.token = token if token is not None else settings.FONNTE_TOKEN
+        self.url = url or getattr(settings, "FONNTE_API_URL", FONNTE_URL)
+        self.max_retries = (
+            max_retries if max_retries is not None
+            else getattr(settings, "FONNTE_MAX_RETRIES", 3)
+        )
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(
+            rate or getattr(settings, "FONNTE_RATE_PER_SECOND", 2),
+            burst or getattr(settings, "FONNTE_BURST", 5),
+        )
+        self.session = session or self._build_session()
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Authorization": self.token})
+        return session
+    def _sleep_backoff(self, attempt):
+        # full jitter: acak antara 0 dan backoff * 2^attempt
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+    def send(self, phone, message):
+        phone = format_nomor_wa(phone)
+        payload = {'target': phone, 'message': message, 'countryCode': '62'}
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                response = self.session.post(self.url, data=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning("Koneksi Fonnte gagal (percobaan %s): %s", attempt + 1, e)
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        result = {"status": False, "reason": response.text[:200]}
+                    if result.get('status'):
+                        logger.info("WA terkirim ke %s: %s...", phone, message[:30])
+                    else:
+                        logger.error("WA gagal ke %s: %s", phone, result.get('reason'))
+                    return result
+                logger.warning("Fonnte HTTP %s (percobaan %s)", response.status_code, attempt + 1)
+            if attempt < self.max_retries:
+                self._sleep_backoff(attempt)
+        logger.error("WA ke %s gagal setelah %s percobaan", phone, self.max_retries + 1)
+        return None
+_client = None
+_client_lock = threading.Lock()
+def get_wa_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FonnteClient()
+    return _client
+# =========================
+# COALESCING BATCH
+# =========================
+class WhatsAppBatch:
+    """
+    Tampung pesan WA selama blok ``with``; pesan untuk nomor yang sama yang
+    masuk dalam ``window`` detik digabung menjadi satu pesan saat flush.
+    """
+    def __init__(self, client=None, window=None, clock=time.monotonic):
+        self.client = client
+        self.window = (
+            window if window is not None
+            else getattr(settings, "FONNTE_COALESCE_WINDOW", 30)
+        )
+        self.clock = clock
+        self.pending = {}
+    def add(self, phone, message):
+        phone = format_nomor_wa(phone)
+        now = self.clock()
+        entry = self.pending.get(phone)
+        if entry and now - entry["first_at"] > self.window:
+            self._send(phone, self.pending.pop(phone))
+            entry = None
+        if entry is None:
+            self.pending[phone] = {"first_at": now, "messages": [message]}
+        else:
+            entry["messages"].append(message)
+        return True
+    def _send(self, phone, entry):
+        client = self.client or get_wa_client()
+        return client.send(phone, COALESCE_SEPARATOR.join(entry["messages"]))
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        return [self._send(phone, entry) for phone, entry in pending.items()]
+    def __enter__(self):
+        _wa_batch.stack = getattr(_wa_batch, "stack", []) + [self]
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        _wa_batch.stack = _wa_batch.stack[:-1]
+        self.flush()
+        return False
+_wa_batch = threading.local()
+def get_active_wa_batch():
+    stack = getattr(_wa_batch, "stack", None)
+    return stack[-1] if stack else None